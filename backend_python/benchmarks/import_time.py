@@ -0,0 +1,92 @@
+"""Import-time benchmark guarding the backend's cold start.
+
+Runs ``python -X importtime -c "import api"`` in a fresh interpreter (from
+``src/``), reports the slowest modules by cumulative time and fails when:
+
+- the total import time exceeds ``--budget-ms`` (median of ``--runs``), or
+- a module that must load lazily (the OpenAI SDK, pyarrow) is imported eagerly.
+
+Usage (from ``backend_python/``):
+    python benchmarks/import_time.py [--budget-ms 1500] [--runs 5] [--top 15]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+
+# Heavy dependencies that must only be imported on first use
+LAZY_MODULES = ('openai', 'pyarrow')
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def measure(module: str) -> Tuple[int, Dict[str, Tuple[int, int]]]:
+    """Import ``module`` once in a fresh interpreter.
+
+    Returns the total cumulative time (microseconds) of top-level imports and
+    ``{module: (self_us, cumulative_us)}``.
+    """
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        errors = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+        raise SystemExit(f'import {module} failed:\n' + '\n'.join(errors))
+
+    modules: Dict[str, Tuple[int, int]] = {}
+    total = 0
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules[name] = (int(self_us), int(cumulative_us))
+        if len(indent) == 1:  # top-level import
+            total += int(cumulative_us)
+    return total, modules
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='api', help='module to import (default: api)')
+    parser.add_argument('--budget-ms', type=float, default=1500.0, help='fail above this median total')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to report')
+    args = parser.parse_args(argv)
+
+    totals = []
+    modules: Dict[str, Tuple[int, int]] = {}
+    for _ in range(args.runs):
+        total, modules = measure(args.module)
+        totals.append(total)
+    median_ms = statistics.median(totals) / 1000
+
+    print(f'import {args.module}: median {median_ms:.1f} ms over {args.runs} runs '
+          f'(min {min(totals) / 1000:.1f} ms, budget {args.budget_ms:.0f} ms)')
+    print(f'{"cumulative ms":>14} {"self ms":>9}  module')
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f'{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}')
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in modules]
+    if eager:
+        failures.append(f'imported eagerly (should load on first use): {", ".join(eager)}')
+    if median_ms > args.budget_ms:
+        failures.append(f'median import time {median_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms')
+
+    for failure in failures:
+        print(f'FAIL: {failure}', file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
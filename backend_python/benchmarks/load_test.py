@@ -0,0 +1,352 @@
+"""Load generator for the NL query API.
+
+Drives the app with a mix of ``POST /api/nl-queries``, polling
+``GET /api/nl-queries/{id}`` (revalidating with ``If-None-Match`` like the
+dashboard) and ``GET /api/nl-queries``, and reports throughput, latency
+percentiles per endpoint, error rates and event-loop lag.
+
+The target is either the app itself, built with ``api.create_app()`` and
+served in-process over ``httpx.ASGITransport`` (the default; loop lag is the
+app's own), or a running server such as a local uvicorn (``--target URL``;
+loop lag is then the client's). LLM calls go to a stub OpenAI-compatible
+server (``stub_openai.py``) with injectable latency and error rates.
+
+Load is closed-loop (``--concurrency`` users issuing requests back to back)
+or open-loop (``--rate`` requests per second, Poisson arrivals). Both accept
+comma-separated lists; each value runs as one step, so a ramp such as
+``--rate 5,10,20,40`` shows where throughput stops following the offered
+load and latency climbs: the worker's saturation point.
+
+Usage (from ``backend_python/``):
+    python benchmarks/load_test.py --concurrency 1,8,32 --duration 20
+    python benchmarks/load_test.py --rate 5,10,20,40 --llm-latency lognormal:800,0.5 --llm-error-rate 0.05
+    python benchmarks/load_test.py --target http://127.0.0.1:8000 --llm off --concurrency 16
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from stub_openai import StubOpenAIServer  # noqa: E402
+
+SRC_DIR = Path(__file__).resolve().parent.parent / 'src'
+
+# Questions the local intent parser answers without the LLM
+RULE_QUESTIONS = [
+    'top 10 selling electronics',
+    'low stock items',
+    'out of stock items in the main warehouse',
+    'show all clothing',
+    'slow moving items',
+    'items with stock above 50',
+    'top 5 selling items',
+    'total stock by location',
+]
+
+# Questions that need the LLM (or its keyword fallback)
+LLM_QUESTIONS = [
+    'quarterly audit summary for the board',
+    'which products should we discount before the season ends',
+    'anything unusual about how the garden range is moving',
+    'what should purchasing focus on next week',
+]
+
+ENDPOINTS = ('POST /api/nl-queries', 'GET /api/nl-queries/{id}', 'GET /api/nl-queries')
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``values`` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint for one step."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.statuses: Dict[str, Counter] = {name: Counter() for name in ENDPOINTS}
+        self.errors: Dict[str, int] = Counter()
+        self.dropped = 0
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int]) -> None:
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status if status is not None else 'exception'] += 1
+        if status is None or status >= 400:
+            self.errors[endpoint] += 1
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        total = sum(len(values) for values in self.latencies.values())
+        errors = sum(self.errors.values())
+        return {
+            'requests': total,
+            'throughputRps': round((total - errors) / duration, 2) if duration else 0.0,
+            'errorRate': round(errors / total, 4) if total else 0.0,
+            'dropped': self.dropped,
+            'endpoints': {
+                name: {
+                    'count': len(values),
+                    'errors': self.errors[name],
+                    'p50Ms': round(percentile(values, 0.50) * 1000, 1),
+                    'p90Ms': round(percentile(values, 0.90) * 1000, 1),
+                    'p99Ms': round(percentile(values, 0.99) * 1000, 1),
+                    'maxMs': round(max(values, default=0.0) * 1000, 1),
+                    'statuses': {str(key): count for key, count in self.statuses[name].items()},
+                }
+                for name, values in self.latencies.items()
+            },
+        }
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that sleeps ``interval`` seconds."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Dict[str, float]:
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        return {
+            'p50Ms': round(percentile(self.samples, 0.50) * 1000, 2),
+            'p99Ms': round(percentile(self.samples, 0.99) * 1000, 2),
+            'maxMs': round(max(self.samples, default=0.0) * 1000, 2),
+        }
+
+
+class Workload:
+    """Picks and issues requests according to the configured mix."""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, mix: Dict[str, float],
+                 llm_share: float, poll_etags: bool):
+        self.client = client
+        self.recorder = recorder
+        self.ops = list(mix)
+        self.weights = [mix[op] for op in self.ops]
+        self.llm_share = llm_share
+        self.poll_etags = poll_etags
+        self.sessions: Deque[str] = deque(maxlen=200)
+        self.etags: Dict[str, str] = {}
+
+    async def _timed(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, time.perf_counter() - started, None)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def submit(self) -> None:
+        questions = LLM_QUESTIONS if random.random() < self.llm_share else RULE_QUESTIONS
+        response = await self._timed('POST /api/nl-queries', 'POST', '/api/nl-queries',
+                                     json={'query': random.choice(questions)})
+        if response is not None and response.status_code == 200:
+            self.sessions.append(response.json()['sessionId'])
+
+    async def poll(self) -> None:
+        if not self.sessions:
+            await self.submit()
+            return
+        session_id = random.choice(self.sessions)
+        headers = {}
+        if self.poll_etags and session_id in self.etags:
+            headers['If-None-Match'] = self.etags[session_id]
+        response = await self._timed('GET /api/nl-queries/{id}', 'GET',
+                                     f'/api/nl-queries/{session_id}', headers=headers)
+        if response is not None and 'etag' in response.headers:
+            self.etags[session_id] = response.headers['etag']
+
+    async def list_sessions(self) -> None:
+        await self._timed('GET /api/nl-queries', 'GET', '/api/nl-queries')
+
+    async def step(self) -> None:
+        op = random.choices(self.ops, self.weights)[0]
+        await {'submit': self.submit, 'poll': self.poll, 'list': self.list_sessions}[op]()
+
+
+async def run_closed(workload: Workload, users: int, duration: float, think: float) -> None:
+    """``users`` virtual users issuing requests back to back (plus think time)."""
+    deadline = time.perf_counter() + duration
+
+    async def user() -> None:
+        while time.perf_counter() < deadline:
+            await workload.step()
+            if think:
+                await asyncio.sleep(random.expovariate(1 / think))
+
+    await asyncio.gather(*(user() for _ in range(users)))
+
+
+async def run_open(workload: Workload, rate: float, duration: float, max_in_flight: int) -> None:
+    """Poisson arrivals at ``rate`` per second; arrivals beyond ``max_in_flight`` are dropped."""
+    deadline = time.perf_counter() + duration
+    in_flight = set()
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(random.expovariate(rate))
+        if len(in_flight) >= max_in_flight:
+            workload.recorder.dropped += 1
+            continue
+        task = asyncio.create_task(workload.step())
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+
+async def run(args: argparse.Namespace, stub: Optional[StubOpenAIServer]) -> List[Dict[str, Any]]:
+    headers = {'Authorization': f'Bearer {args.token}'}
+    lifespan = contextlib.AsyncExitStack()
+    if args.target == 'inprocess':
+        from api import create_app
+
+        app = create_app()
+        await lifespan.enter_async_context(app.router.lifespan_context(app))
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url='http://loadtest', headers=headers,
+                                   timeout=args.timeout)
+        for _ in range(100):  # Wait for the background database initialization
+            if getattr(app.state, 'ready', False):
+                break
+            await asyncio.sleep(0.05)
+    else:
+        client = httpx.AsyncClient(base_url=args.target, headers=headers, timeout=args.timeout,
+                                   limits=httpx.Limits(max_connections=args.max_in_flight))
+
+    mix = {name: float(weight) for name, weight in
+           (part.split('=') for part in args.mix.split(','))}
+    steps = ([('rate', float(value)) for value in args.rate.split(',')] if args.rate
+             else [('concurrency', int(value)) for value in args.concurrency.split(',')])
+
+    reports = []
+    async with lifespan, client:
+        for kind, value in steps:
+            recorder = Recorder()
+            workload = Workload(client, recorder, mix, args.llm_share, not args.no_etags)
+            if args.warmup:
+                warmup = Workload(client, Recorder(), mix, args.llm_share, not args.no_etags)
+                await run_closed(warmup, max(1, int(value)), args.warmup, 0)
+                workload.sessions.extend(warmup.sessions)
+
+            monitor = LoopLagMonitor()
+            monitor.start()
+            started = time.perf_counter()
+            if kind == 'rate':
+                await run_open(workload, value, args.duration, args.max_in_flight)
+            else:
+                await run_closed(workload, value, args.duration, args.think)
+            elapsed = time.perf_counter() - started
+            lag = await monitor.stop()
+
+            report = {kind: value, 'durationS': round(elapsed, 2), **recorder.summary(elapsed),
+                      'loopLag': lag, 'loopLagOf': 'app' if args.target == 'inprocess' else 'client'}
+            if stub is not None:
+                report['llmStub'] = dict(stub.calls)
+            reports.append(report)
+            print_report(report)
+    return reports
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    load = f'rate {report["rate"]}/s' if 'rate' in report else f'concurrency {report["concurrency"]}'
+    print(f'\n== {load}: {report["requests"]} requests in {report["durationS"]}s, '
+          f'{report["throughputRps"]} ok req/s, error rate {report["errorRate"]:.2%}'
+          + (f', dropped {report["dropped"]}' if report['dropped'] else ''))
+    print(f'{"endpoint":<28} {"count":>6} {"errors":>6} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    for name, stats in report['endpoints'].items():
+        print(f'{name:<28} {stats["count"]:>6} {stats["errors"]:>6} {stats["p50Ms"]:>8} '
+              f'{stats["p90Ms"]:>8} {stats["p99Ms"]:>8} {stats["maxMs"]:>8}')
+    lag = report['loopLag']
+    print(f'event loop lag ({report["loopLagOf"]}): p50 {lag["p50Ms"]} ms, '
+          f'p99 {lag["p99Ms"]} ms, max {lag["maxMs"]} ms')
+    if 'llmStub' in report:
+        print(f'LLM stub calls: {report["llmStub"]}')
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', default='inprocess', help='"inprocess" or a base URL')
+    parser.add_argument('--concurrency', default='8', help='closed-loop users, comma-separated steps')
+    parser.add_argument('--rate', default=None, help='open-loop requests/s, comma-separated steps')
+    parser.add_argument('--duration', type=float, default=15.0, help='seconds per step')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds before each step')
+    parser.add_argument('--think', type=float, default=0.0, help='mean think time per user (s)')
+    parser.add_argument('--mix', default='submit=1,poll=4,list=1', help='request mix weights')
+    parser.add_argument('--llm-share', type=float, default=0.3, help='share of questions needing the LLM')
+    parser.add_argument('--no-etags', action='store_true', help='poll without If-None-Match')
+    parser.add_argument('--max-in-flight', type=int, default=256)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--token', default='mock-token')
+    parser.add_argument('--llm', choices=('stub', 'off', 'env'), default='stub',
+                        help='stub server, LLM disabled, or the configured provider (in-process only)')
+    parser.add_argument('--llm-latency', default='lognormal:800,0.5', help='stub latency spec')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--stub-port', type=int, default=0)
+    parser.add_argument('--db-path', default=None, help='in-process database (default: a temp file)')
+    parser.add_argument('--json', default=None, help='write the step reports to this file')
+    args = parser.parse_args(argv)
+
+    stub = None
+    if args.llm == 'stub':
+        stub = StubOpenAIServer(port=args.stub_port, latency=args.llm_latency,
+                                error_rate=args.llm_error_rate,
+                                rate_limit_rate=args.llm_rate_limit_rate).start()
+        print(f'LLM stub at {stub.base_url} (latency {args.llm_latency}, '
+              f'errors {args.llm_error_rate:.0%}, 429s {args.llm_rate_limit_rate:.0%})')
+
+    if args.target == 'inprocess':
+        # Configure the app before it is imported
+        os.environ.setdefault('LOG_LEVEL', 'warning')
+        # All load comes from the one mock user; per-user rate limits would cap it
+        os.environ.setdefault('ADMISSION_ENABLED', 'false')
+        os.environ['DB_PATH'] = args.db_path or os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+        if stub is not None:
+            os.environ.update(OPENAI_API_KEY='stub', OPENAI_BASE_URL=stub.base_url, OPENAI_ENABLED='true')
+            os.environ.pop('AZURE_OPENAI_ENDPOINT', None)
+        elif args.llm == 'off':
+            os.environ['OPENAI_ENABLED'] = 'false'
+        sys.path.insert(0, str(SRC_DIR))
+    elif stub is not None:
+        print(f'Start the server with OPENAI_API_KEY=stub OPENAI_BASE_URL={stub.base_url}')
+
+    try:
+        reports = asyncio.run(run(args, stub))
+    finally:
+        if stub is not None:
+            stub.stop()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(reports, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
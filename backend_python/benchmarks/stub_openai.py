@@ -0,0 +1,182 @@
+"""Stub OpenAI-compatible chat completions server for load tests.
+
+Answers ``POST /v1/chat/completions`` (and the Azure-style
+``/openai/deployments/{name}/chat/completions``) with canned JSON that the
+draft service understands: a SELECT over ``inventory_items`` for draft and
+revision prompts and a clean review for critique prompts. Latency follows a
+configurable distribution; a share of calls fails with 500 or 429.
+
+Latency specs: ``fixed:MS``, ``uniform:MIN_MS,MAX_MS``, ``exp:MEAN_MS`` or
+``lognormal:MEDIAN_MS,SIGMA``.
+
+Usage (from ``backend_python/``):
+    python benchmarks/stub_openai.py --port 8099 --latency lognormal:800,0.5 --error-rate 0.02
+
+Point the app at it with ``OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8099/v1``.
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+# Drafts returned for SQL generation prompts (all pass the static review)
+DRAFT_SQL = [
+    'SELECT i.id, i.sku, i.name, i.current_stock, i.reorder_threshold, i.recent_sales_volume '
+    'FROM inventory_items i ORDER BY i.recent_sales_volume DESC LIMIT 20',
+    'SELECT i.id, i.sku, i.name, i.current_stock, i.reorder_threshold, i.recent_sales_volume '
+    'FROM inventory_items i WHERE i.current_stock <= i.reorder_threshold ORDER BY i.current_stock LIMIT 50',
+    'SELECT i.id, i.sku, i.name, i.current_stock, i.reorder_threshold, i.recent_sales_volume '
+    'FROM inventory_items i WHERE i.current_stock > 0 ORDER BY i.current_stock DESC LIMIT 25',
+]
+
+
+def parse_latency(spec: str) -> Callable[[], float]:
+    """Return a sampler of latencies in seconds for a ``kind:args`` spec."""
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(',') if value]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda: values[0] / 1000
+    if kind == 'uniform' and len(values) == 2:
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'exp' and len(values) == 1:
+        return lambda: random.expovariate(1000 / values[0])
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0] / 1000)
+        return lambda: random.lognormvariate(mu, values[1])
+    raise ValueError(f'Invalid latency spec "{spec}"')
+
+
+class StubOpenAIServer:
+    """Threaded HTTP server imitating the chat completions API."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: str = 'fixed:0',
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0):
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.calls: Dict[str, int] = {'draft': 0, 'review': 0, 'errors': 0, 'rateLimited': 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self) -> 'StubOpenAIServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        """Stop a server started with ``start()``."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.calls[key] += 1
+
+    def completion(self, request: Dict) -> Dict:
+        """Canned chat completion for a request body."""
+        messages: List[Dict] = request.get('messages') or []
+        system = messages[0].get('content', '') if messages else ''
+        if 'reviewer' in system:
+            self._count('review')
+            content = {'needsRevision': False, 'issues': [], 'suggestions': []}
+        else:
+            self._count('draft')
+            content = {
+                'sql': random.choice(DRAFT_SQL),
+                'intent': 'list_items',
+                'filters': {},
+                'reasoning': 'Stub response',
+            }
+        return {
+            'id': f'chatcmpl-stub-{random.getrandbits(32):08x}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': json.dumps(content)},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):  # noqa: A002 - silence per-request logs
+                pass
+
+            def _send(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if not self.path.split('?')[0].endswith('/chat/completions'):
+                    self._send(404, {'error': {'message': 'Not found', 'type': 'invalid_request_error'}})
+                    return
+
+                time.sleep(stub.sample_latency())
+                roll = random.random()
+                if roll < stub.error_rate:
+                    stub._count('errors')
+                    self._send(500, {'error': {'message': 'Injected failure', 'type': 'server_error'}})
+                elif roll < stub.error_rate + stub.rate_limit_rate:
+                    stub._count('rateLimited')
+                    self._send(429, {'error': {'message': 'Injected rate limit', 'type': 'rate_limit_error'}},
+                               {'Retry-After': '1'})
+                else:
+                    self._send(200, stub.completion(body))
+
+        return Handler
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', default='lognormal:800,0.5', help='latency distribution spec')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of calls failing with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='share of calls failing with 429')
+    args = parser.parse_args(argv)
+
+    server = StubOpenAIServer(args.host, args.port, args.latency, args.error_rate, args.rate_limit_rate)
+    print(f'Stub OpenAI server listening on {server.base_url} (latency {args.latency})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f'calls: {server.calls}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
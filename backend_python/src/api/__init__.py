@@ -1,20 +1,72 @@
 """API package."""
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-import sys
-from pathlib import Path
-
-# Add src to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import config
+from services.db.connection import test_connection
+from services.db.shard_executor import shard_executor
 from services.logging.logger import logger_instance as logger
+from api.middleware.compression_middleware import CompressionMiddleware
+from api.middleware.profiling_middleware import PROFILE_ID_HEADER, ProfilingMiddleware
 from api.routes.nl_queries import router as nl_queries_router
+from api.routes.metrics import router as metrics_router
+from api.routes.health import router as health_router
+from api.routes.saved_queries import router as saved_queries_router
+from api.routes.admin_profiling import router as admin_profiling_router
+from services.profiling import loop_lag_monitor
+from services.saved_queries import saved_query_refresher
+from services.snapshot_publisher import snapshot_publisher
+
+
+async def _initialize_database(app: FastAPI, retries: int = 3, delay_seconds: float = 2.0) -> None:
+    """Create the schema / seed data off the event loop and mark the app ready."""
+    while retries > 0:
+        try:
+            connected = await asyncio.to_thread(test_connection)
+        except Exception as e:
+            logger.error('Database initialization failed', {'error': str(e)})
+            connected = False
+        if connected:
+            app.state.ready = True
+            logger.info('Database connection successful')
+            return
+        retries -= 1
+        if retries > 0:
+            logger.warn(f'Database connection failed, retrying... ({retries} attempts left)')
+            await asyncio.sleep(delay_seconds)
+
+    app.state.startup_error = 'Database connection failed after retries'
+    logger.error('Database connection failed after retries - readiness stays false')
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serving immediately; database initialization and the saved query
+    scheduler run in the background."""
+    app.state.ready = False
+    app.state.startup_error = None
+    background = [
+        asyncio.create_task(_initialize_database(app)),
+        asyncio.create_task(saved_query_refresher.run()),
+    ]
+    if config.LOOP_LAG_MONITOR:
+        background.append(asyncio.create_task(loop_lag_monitor.run()))
+    if config.SNAPSHOT_ENABLED and config.SNAPSHOT_PUBLISH:
+        background.append(asyncio.create_task(snapshot_publisher.run()))
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        shard_executor.shutdown()
 
 
 def create_app() -> FastAPI:
     """Create and configure FastAPI application."""
-    app = FastAPI(title="Natural Language Inventory Dashboard API")
+    app = FastAPI(title="Natural Language Inventory Dashboard API", lifespan=lifespan)
     
     # CORS middleware
     app.add_middleware(
@@ -23,8 +75,15 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["ETag", "Retry-After", PROFILE_ID_HEADER],
     )
     
+    # Response compression (br/gzip above a size threshold)
+    app.add_middleware(CompressionMiddleware, minimum_size=config.COMPRESSION_MIN_SIZE)
+    
+    # Per-request cProfile capture (admin X-Profile header or armed sessions)
+    app.add_middleware(ProfilingMiddleware)
+    
     # Request logging middleware
     @app.middleware("http")
     async def log_requests(request, call_next):
@@ -37,5 +96,9 @@ def create_app() -> FastAPI:
     
     # Routes
     app.include_router(nl_queries_router, prefix="/api", tags=["nl-queries"])
+    app.include_router(metrics_router, prefix="/api", tags=["metrics"])
+    app.include_router(saved_queries_router, prefix="/api", tags=["saved-queries"])
+    app.include_router(health_router, prefix="/api", tags=["health"])
+    app.include_router(admin_profiling_router, prefix="/api", tags=["admin"])
     
     return app
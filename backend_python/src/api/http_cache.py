@@ -0,0 +1,34 @@
+"""HTTP validator helpers (ETag / If-None-Match)."""
+import hashlib
+from typing import Any
+
+from fastapi import Request
+from starlette.responses import Response
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a weak ETag from the parts that determine a response body.
+
+    Weak because equal parts only guarantee an equivalent body: per-run
+    tokens in it (e.g. the results ``version``) and the content coding the
+    compression middleware picks may differ between responses sharing it.
+    """
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Return True when the request's If-None-Match header covers ``etag``."""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Weak comparison, as required for If-None-Match (RFC 9110 13.1.2)
+    candidates = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag.removeprefix('W/') in candidates
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Build an empty 304 response carrying the current validators."""
+    return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': cache_control})
@@ -1,5 +1,7 @@
 """Authentication middleware."""
-from fastapi import HTTPException, Security
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 
@@ -13,13 +15,29 @@ class User(BaseModel):
 security = HTTPBearer()
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> User:
-    """Get current user from token (mock implementation)."""
+def authenticate_token(token: str) -> Optional[User]:
+    """Resolve a bearer token to its user (mock implementation)."""
     # Mock authentication - in production, validate JWT token
-    token = credentials.credentials
-    
     if token == 'mock-token':
         return User(id='user-1', role='Admin')
+    return None
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)) -> User:
+    """Get current user from token (mock implementation)."""
+    user = authenticate_token(credentials.credentials)
+    if user is not None:
+        return user
     
     raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
+
+async def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Current user, who must have the Admin role."""
+    if current_user.role != 'Admin':
+        raise HTTPException(
+            status_code=403,
+            detail={'error': 'Forbidden', 'message': 'Admin role required'}
+        )
+    return current_user
+
@@ -0,0 +1,129 @@
+"""Response compression middleware (brotli/gzip, negotiated by size)."""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+class _Compressor:
+    """Streaming compressor for a single content coding."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._impl = brotli.Compressor(quality=min(level, 11))
+        else:
+            # wbits 16+ produces a gzip container
+            self._impl = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._impl.process(data)
+        return self._impl.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == 'br':
+            return self._impl.finish()
+        return self._impl.flush()
+
+
+class CompressionMiddleware:
+    """Compress responses larger than ``minimum_size`` with br or gzip.
+
+    Brotli is preferred when the client accepts it and the ``brotli`` package
+    is installed; otherwise gzip is used. Small bodies, responses that already
+    carry a Content-Encoding and clients that accept neither are passed
+    through untouched. Streaming bodies are compressed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _negotiate(self, accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for part in accept_encoding.split(','):
+            name, _, params = part.partition(';')
+            quality = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            if quality > 0:
+                accepted.add(name.strip().lower())
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._negotiate(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, compressor, passthrough
+
+            if message['type'] == 'http.response.start':
+                start_message = message
+                headers = Headers(raw=message['headers'])
+                passthrough = 'content-encoding' in headers
+                if passthrough:
+                    await send(message)
+                return
+
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                level = self.brotli_quality if encoding == 'br' else self.gzip_level
+                compressor = _Compressor(encoding, level)
+                headers = MutableHeaders(raw=start_message['headers'])
+                headers['Content-Encoding'] = encoding
+                headers.add_vary_header('Accept-Encoding')
+                if 'content-length' in headers:
+                    del headers['content-length']
+                if not more_body:
+                    compressed = compressor.compress(body) + compressor.flush()
+                    headers['Content-Length'] = str(len(compressed))
+                    await send(start_message)
+                    await send({'type': 'http.response.body', 'body': compressed})
+                    return
+                await send(start_message)
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.flush()
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': more_body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,58 @@
+"""Per-request cProfile capture (see ``services.profiling``)."""
+import time
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.middleware.auth_middleware import authenticate_token
+from services.profiling import request_profiler
+
+PROFILE_HEADER = 'x-profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it with ``X-Profile`` or hit an armed session.
+
+    The header is honored only together with an admin bearer token. The
+    response carries ``X-Profile-Id``; the capture is read back from
+    ``/api/admin/profiling/requests/{id}`` once the response has finished.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER):
+            scheme, _, token = headers.get('authorization', '').partition(' ')
+            user = authenticate_token(token.strip()) if scheme.lower() == 'bearer' else None
+            if user is not None and user.role == 'Admin':
+                return 'header'
+        session_id = request_profiler.session_trigger(scope['path'])
+        return f'session:{session_id}' if session_id else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        started = request_profiler.start(scope['method'], scope['path'], trigger) if trigger else None
+        if started is None:
+            await self.app(scope, receive, send)
+            return
+
+        capture, profile = started
+
+        async def send_with_id(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                capture.status = message['status']
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = capture.id
+            await send(message)
+
+        began = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_profiler.finish(capture, profile, began)
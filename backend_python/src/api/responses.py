@@ -0,0 +1,80 @@
+"""Fast JSON responses for result-heavy endpoints."""
+import json
+import uuid
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class RawJSON:
+    """Already-serialized JSON fragment, embedded verbatim in the response body.
+
+    Only worth it for bodies serialized once and reused (e.g. saved query
+    results); per-request rows serialize faster as plain dicts.
+    """
+    __slots__ = ('text',)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FragmentCollector:
+    """``default`` hook that swaps RawJSON fragments for placeholders.
+
+    With orjson, fragments are embedded natively (``orjson.Fragment``).
+    Otherwise each gets a placeholder carrying a per-call random nonce, so
+    text in the payload itself can never match one.
+    """
+
+    def __init__(self):
+        self.fragments = []
+        self.nonce = uuid.uuid4().hex
+
+    def __call__(self, obj: Any) -> Any:
+        if isinstance(obj, RawJSON):
+            if orjson is not None:
+                return orjson.Fragment(obj.text)
+            self.fragments.append(obj.text)
+            return f'{self.nonce}:{len(self.fragments) - 1}'
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        if isinstance(obj, Enum):
+            return obj.value
+        if isinstance(obj, BaseModel):
+            return obj.model_dump()
+        raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize ``content`` to compact UTF-8 JSON.
+
+    Uses orjson when installed and the stdlib encoder otherwise. Datetimes,
+    enums and pydantic models are handled natively, and RawJSON fragments
+    are spliced in without being decoded or re-encoded.
+    """
+    collector = _FragmentCollector()
+    if orjson is not None:
+        return orjson.dumps(content, default=collector, option=orjson.OPT_NON_STR_KEYS)
+    body = json.dumps(content, default=collector, ensure_ascii=False, separators=(',', ':'))
+    for index, fragment in enumerate(collector.fragments):
+        body = body.replace(f'"{collector.nonce}:{index}"', fragment, 1)
+    return body.encode('utf-8')
+
+
+class FastJSONResponse(Response):
+    """JSON response that bypasses FastAPI's ``jsonable_encoder``.
+
+    Return it directly from a route so the payload is serialized exactly once.
+    """
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,166 @@
+"""Admin profiling API routes (request captures, sampling, memory)."""
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+
+from api.middleware.auth_middleware import require_admin, User
+from services.logging.logger import logger_instance as logger
+from services.profiling import (
+    ProfilerBusyError,
+    memory_profiler,
+    request_profiler,
+    sampling_profiler,
+)
+
+router = APIRouter()
+
+REQUEST_PROFILE_FORMATS = ('collapsed', 'text', 'pstats')
+MEMORY_GROUPINGS = ('lineno', 'filename', 'traceback')
+
+
+@router.get("/admin/profiling/requests")
+async def list_request_profiles(current_user: User = Depends(require_admin)):
+    """Recent per-request captures and the sessions armed for profiling."""
+    return {
+        'profiles': request_profiler.list(),
+        'armedSessions': request_profiler.armed_sessions(),
+    }
+
+
+@router.get("/admin/profiling/requests/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    format: str = 'collapsed',
+    sort: str = 'cumulative',
+    current_user: User = Depends(require_admin)
+):
+    """One capture as collapsed stacks (µs), a pstats text table or a pstats dump.
+
+    ``format=pstats`` downloads a file for ``pstats.Stats``/snakeviz;
+    ``format=collapsed`` feeds flamegraph.pl or speedscope directly.
+    """
+    capture = request_profiler.get(profile_id)
+    if capture is None:
+        raise HTTPException(
+            status_code=404,
+            detail={'error': 'Not Found', 'message': 'Profile not found'}
+        )
+    if format not in REQUEST_PROFILE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'error': 'Bad Request',
+                'message': f'Unsupported format "{format}" (use {", ".join(REQUEST_PROFILE_FORMATS)})',
+            }
+        )
+
+    if format == 'pstats':
+        return Response(
+            content=capture.pstats_dump(),
+            media_type='application/octet-stream',
+            headers={'Content-Disposition': f'attachment; filename="profile-{capture.id}.prof"'},
+        )
+    # Rendering walks every profiled function; keep it off the event loop
+    if format == 'text':
+        try:
+            return PlainTextResponse(await asyncio.to_thread(capture.text, sort))
+        except KeyError:
+            raise HTTPException(
+                status_code=400,
+                detail={'error': 'Bad Request', 'message': f'Unsupported sort key "{sort}"'}
+            )
+    return PlainTextResponse(await asyncio.to_thread(capture.collapsed))
+
+
+@router.post("/admin/profiling/sessions/{session_id}")
+async def arm_session_profiling(
+    session_id: str,
+    requests: int = 5,
+    current_user: User = Depends(require_admin)
+):
+    """Profile the next ``requests`` requests that touch ``session_id``."""
+    if requests < 1:
+        raise HTTPException(
+            status_code=400,
+            detail={'error': 'Bad Request', 'message': 'requests must be at least 1'}
+        )
+    request_profiler.arm_session(session_id, requests)
+    logger.info('Session armed for profiling', {
+        'sessionId': session_id,
+        'requests': requests,
+        'userId': current_user.id,
+    })
+    return {'sessionId': session_id, 'requests': requests}
+
+
+@router.delete("/admin/profiling/sessions/{session_id}", status_code=204)
+async def disarm_session_profiling(session_id: str, current_user: User = Depends(require_admin)):
+    """Stop profiling requests for a session."""
+    if not request_profiler.disarm_session(session_id):
+        raise HTTPException(
+            status_code=404,
+            detail={'error': 'Not Found', 'message': 'Session is not armed for profiling'}
+        )
+    return Response(status_code=204)
+
+
+@router.post("/admin/profiling/sample", response_class=PlainTextResponse)
+async def sample_profile(
+    seconds: float = 10.0,
+    interval_ms: float = 10.0,
+    current_user: User = Depends(require_admin)
+):
+    """Sample all thread stacks for a time window; returns collapsed stacks (sample counts)."""
+    if seconds <= 0:
+        raise HTTPException(
+            status_code=400,
+            detail={'error': 'Bad Request', 'message': 'seconds must be positive'}
+        )
+    try:
+        stacks, samples = await asyncio.to_thread(sampling_profiler.sample, seconds, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(
+            status_code=409,
+            detail={'error': 'Conflict', 'message': str(e)}
+        )
+    return PlainTextResponse(stacks, headers={'X-Profile-Samples': str(samples)})
+
+
+@router.post("/admin/profiling/memory")
+async def start_memory_tracing(current_user: User = Depends(require_admin)):
+    """Start ``tracemalloc`` (or reset its baseline when already tracing)."""
+    await asyncio.to_thread(memory_profiler.start)
+    return {'tracing': True, 'frames': memory_profiler.frames}
+
+
+@router.post("/admin/profiling/memory/snapshots")
+async def memory_snapshot(
+    against: str = 'previous',
+    group_by: str = 'lineno',
+    limit: int = 25,
+    current_user: User = Depends(require_admin)
+):
+    """Take a snapshot and diff it against the ``previous`` snapshot or the ``start``."""
+    if against not in ('previous', 'start') or group_by not in MEMORY_GROUPINGS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'error': 'Bad Request',
+                'message': 'against must be previous|start and group_by lineno|filename|traceback',
+            }
+        )
+    if not memory_profiler.tracing:
+        raise HTTPException(
+            status_code=409,
+            detail={'error': 'Conflict', 'message': 'Memory tracing is not running'}
+        )
+    # Snapshots walk every traced block; keep that off the event loop
+    return await asyncio.to_thread(memory_profiler.snapshot, against, group_by, limit)
+
+
+@router.delete("/admin/profiling/memory", status_code=204)
+async def stop_memory_tracing(current_user: User = Depends(require_admin)):
+    """Stop ``tracemalloc`` and drop its snapshots."""
+    memory_profiler.stop()
+    return Response(status_code=204)
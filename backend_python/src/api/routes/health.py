@@ -0,0 +1,23 @@
+"""Health API routes."""
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+
+@router.get("/health")
+async def liveness():
+    """Process is up and serving requests."""
+    return {'status': 'ok'}
+
+
+@router.get("/health/ready")
+async def readiness(request: Request):
+    """Database schema is in place and the app can serve queries (503 until then)."""
+    state = request.app.state
+    if getattr(state, 'ready', False):
+        return {'status': 'ready'}
+    return JSONResponse(
+        status_code=503,
+        content={'status': 'starting', 'error': getattr(state, 'startup_error', None)},
+    )
@@ -0,0 +1,17 @@
+"""Metrics API routes."""
+from typing import Optional
+from fastapi import APIRouter, Depends
+
+from api.middleware.auth_middleware import get_current_user, User
+from services.metrics.registry import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+async def get_metrics(
+    prefix: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Return a snapshot of in-process counters and gauges."""
+    return metrics.snapshot(prefix)
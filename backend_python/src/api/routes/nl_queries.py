@@ -1,18 +1,28 @@
 """NL Queries API routes."""
+import asyncio
 import os
-import sys
 import uuid
-from pathlib import Path
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from typing import AsyncIterator, Dict, Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-# Add src to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-
 from api.middleware.auth_middleware import get_current_user, User
-from services.nl_query_pipeline import nl_query_pipeline
+from api.http_cache import etag_matches, make_etag, not_modified
+from api.responses import FastJSONResponse
+from config import config
+from models.inventory_query_session import InventoryQuerySession
+from services.admission import INTERACTIVE, PRIORITIES, AdmissionRejected, admission_controller
+from services.db.connection import data_version
+from services.db.result_set import ResultSet
+from services.inventory_query_executor import inventory_query_executor
+from services.nl_query_draft_service import nl_query_draft_service
+from services.nl_query_pipeline import nl_query_pipeline, normalize_query
+from services.result_diff import ResultVersion, diff_result_sets, result_versions
+from services.result_export import EXPORT_FORMATS, available_formats, result_exporter
+from services.results_view import build_charts, columnar_payload, table_columns
 from services.logging.logger import logger_instance as logger
 
 router = APIRouter()
@@ -20,6 +30,132 @@ router = APIRouter()
 # In-memory session store (replace with database in production)
 sessions: Dict[str, Any] = {}
 
+# Bumped on every write to ``sessions``; backs the session list ETag
+_sessions_version = 0
+
+# Results must be revalidated on every use; the session list may be reused briefly
+RESULTS_CACHE_CONTROL = 'private, no-cache'
+SESSIONS_CACHE_CONTROL = 'private, max-age=5, must-revalidate'
+
+# Compact results representation (see results_view.columnar_payload)
+COLUMNAR_MEDIA_TYPE = 'application/vnd.inventory.columnar+json'
+
+
+def _store_session(session_data: Dict[str, Any]) -> None:
+    """Store a session and invalidate session list validators."""
+    global _sessions_version
+    sessions[session_data['id']] = session_data
+    _sessions_version += 1
+
+
+# Clients mark background refreshes with "X-Request-Priority: scheduled"
+PRIORITY_HEADER = 'X-Request-Priority'
+
+
+def _priority(request: Request) -> str:
+    priority = request.headers.get(PRIORITY_HEADER, INTERACTIVE).lower()
+    return priority if priority in PRIORITIES else INTERACTIVE
+
+
+@asynccontextmanager
+async def _admitted(current_user: User, priority: str, llm_calls: int = 0,
+                    sql_executions: int = 1) -> AsyncIterator[None]:
+    """Admission for a pipeline run; rejections become 429/503 with Retry-After."""
+    try:
+        async with admission_controller.admit(current_user.id, current_user.role, priority,
+                                              llm_calls, sql_executions):
+            yield
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail={
+                'error': 'Too Many Requests' if e.status_code == 429 else 'Service Unavailable',
+                'message': str(e),
+            },
+            headers={'Retry-After': e.retry_after_header},
+        )
+
+
+def _get_accessible_session(session_id: str, current_user: User) -> Dict[str, Any]:
+    """Load a session the current user may access (404/403 otherwise)."""
+    session_data = sessions.get(session_id)
+    
+    if not session_data:
+        raise HTTPException(
+            status_code=404,
+            detail={'error': 'Not Found', 'message': 'Session not found'}
+        )
+    
+    # Check user access
+    if session_data['userId'] != current_user.id and current_user.role != 'Admin':
+        raise HTTPException(
+            status_code=403,
+            detail={'error': 'Forbidden', 'message': 'Access denied to this session'}
+        )
+    return session_data
+
+
+def _results_etag(session_id: str, final_query: Optional[str],
+                  query_params: Optional[List[Any]] = None, columnar: bool = False) -> str:
+    """Results depend only on the session's final SQL, its parameters and the data it reads."""
+    return make_etag(session_id, final_query or '', query_params or [], data_version(), columnar)
+
+
+def _wants_columnar(request: Request, format: Optional[str]) -> bool:
+    """True when the client asked for the columnar format (``format=columnar`` or Accept)."""
+    if format is not None:
+        return format == 'columnar'
+    return COLUMNAR_MEDIA_TYPE in request.headers.get('accept', '')
+
+
+def _results_payload(session: InventoryQuerySession, result_set: Optional[ResultSet],
+                     version: Optional[str] = None, columnar: bool = False) -> Dict[str, Any]:
+    """Build the results body (table + charts) for an executed session."""
+    if columnar:
+        return {
+            'sessionId': session.id,
+            'status': session.status.value,
+            'mode': 'full',
+            'format': 'columnar',
+            'version': version,
+            'reviewSummary': session.reviewFindings or {},
+            **columnar_payload(result_set),
+            'message': 'Query executed successfully' if session.status.value == 'executed' else 'Query processing',
+        }
+    return {
+        'sessionId': session.id,
+        'status': session.status.value,
+        'mode': 'full',
+        'version': version,
+        'reviewSummary': session.reviewFindings or {},
+        'table': {
+            'columns': table_columns(result_set),
+            'rows': result_set.to_dicts() if result_set is not None else [],
+        },
+        'charts': build_charts(result_set),
+        'message': 'Query executed successfully' if session.status.value == 'executed' else 'Query processing',
+    }
+
+
+def _diff_payload(session: InventoryQuerySession, base: ResultVersion, current: ResultVersion,
+                  incremental: bool) -> Optional[Dict[str, Any]]:
+    """Build a diff body (row changes since ``base`` + charts), or None if rows cannot be diffed."""
+    changes = diff_result_sets(base.result_set, current.result_set)
+    if changes is None:
+        return None
+    return {
+        'sessionId': session.id,
+        'status': session.status.value,
+        'mode': 'diff',
+        'baseVersion': base.token,
+        'version': current.token,
+        'incremental': incremental,
+        'rowCount': len(current.result_set),
+        'changes': changes,
+        'charts': build_charts(current.result_set),
+        'message': 'Query executed successfully',
+    }
+
 
 class NLQueryRequest(BaseModel):
     """NL Query request model."""
@@ -27,9 +163,17 @@ class NLQueryRequest(BaseModel):
     context: Optional[Dict[str, Any]] = None
 
 
+class NLQueryBatchRequest(BaseModel):
+    """Batch NL Query request model."""
+    queries: List[str]
+    includeResults: bool = False
+    context: Optional[Dict[str, Any]] = None
+
+
 @router.post("/nl-queries")
 async def submit_nl_query(
     request: NLQueryRequest,
+    http_request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """Submit a natural language query."""
@@ -47,20 +191,24 @@ async def submit_nl_query(
         })
         
         # Process query through pipeline
-        result = await nl_query_pipeline.process_query(
-            request.query,
-            current_user.id,
-            session_id
-        )
+        async with _admitted(current_user, _priority(http_request),
+                             nl_query_draft_service.expected_llm_calls(request.query)):
+            result = await nl_query_pipeline.process_query(
+                request.query,
+                current_user.id,
+                session_id
+            )
         
         # Store session
-        sessions[session_id] = result.session.dict()
+        _store_session(result.session.dict())
         
         return {
             'sessionId': result.session.id,
             'status': result.session.status.value,
             'message': 'Query accepted and executing',
         }
+    except HTTPException:
+        raise
     except Exception as e:
         error_message = str(e)
         logger.error('Error processing NL query', {
@@ -95,190 +243,132 @@ async def submit_nl_query(
         )
 
 
-@router.get("/nl-queries/{session_id}")
+@router.post("/nl-queries/batch", response_class=FastJSONResponse)
+async def submit_nl_query_batch(
+    request: NLQueryBatchRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Submit several natural language queries (e.g. all tiles of a dashboard) at once.
+    
+    Duplicates share one session; all results come from one read snapshot.
+    With ``includeResults`` each item also carries its results payload.
+    """
+    queries = [q for q in request.queries if isinstance(q, str) and q.strip()]
+    if not queries or len(queries) != len(request.queries):
+        raise HTTPException(
+            status_code=400,
+            detail={'error': 'Bad Request', 'message': '"queries" must be a non-empty list of questions'}
+        )
+    if len(queries) > config.BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'error': 'Bad Request',
+                'message': f'At most {config.BATCH_MAX_QUERIES} queries per batch',
+            }
+        )
+    
+    unique = {normalize_query(query): query for query in queries}
+    llm_calls = sum(nl_query_draft_service.expected_llm_calls(query) for query in unique.values())
+    try:
+        async with _admitted(current_user, _priority(http_request), llm_calls, len(unique)):
+            outcomes = dict(await nl_query_pipeline.process_batch(queries, current_user.id))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error('Error processing NL query batch', {
+            'error': str(e),
+            'userId': current_user.id,
+        })
+        raise HTTPException(
+            status_code=500,
+            detail={'error': 'Internal Server Error', 'message': 'Failed to process query batch'}
+        )
+    
+    payloads: Dict[str, Dict[str, Any]] = {}
+    for key, outcome in outcomes.items():
+        if isinstance(outcome, Exception):
+            payloads[key] = {'status': 'failed', 'message': 'Failed to process query'}
+            continue
+        _store_session(outcome.session.dict())
+        payload = {
+            'sessionId': outcome.session.id,
+            'status': outcome.session.status.value,
+            'message': 'Query executed',
+        }
+        if request.includeResults:
+            payload['results'] = _results_payload(outcome.session, outcome.results['resultSet'])
+        payloads[key] = payload
+    
+    return FastJSONResponse({
+        'items': [
+            {'query': query, **payloads[normalize_query(query)]}
+            for query in queries
+        ],
+        'uniqueQueries': len(outcomes),
+    })
+
+
+@router.get("/nl-queries/{session_id}", response_class=FastJSONResponse)
 async def get_query_results(
     session_id: str,
+    request: Request,
+    since: Optional[str] = None,
+    format: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Retrieve query results."""
+    """Retrieve query results.
+    
+    Every full payload carries a ``version`` token. Passing it back as
+    ``since`` returns only the rows inserted, updated and removed since that
+    version (``mode: 'diff'``); when the version is no longer known the full
+    payload is returned instead.
+    
+    ``format=columnar`` (or ``Accept: application/vnd.inventory.columnar+json``)
+    returns typed column headers once, one value array per column, and charts
+    as row indices into the table instead of copied rows.
+    """
+    columnar = _wants_columnar(request, format)
     try:
-        session_data = sessions.get(session_id)
+        session_data = _get_accessible_session(session_id, current_user)
         
-        if not session_data:
-            raise HTTPException(
-                status_code=404,
-                detail={'error': 'Not Found', 'message': 'Session not found'}
-            )
+        # Conditional GET: unchanged SQL and data means an unchanged payload
+        if session_data.get('finalQuery'):
+            etag = _results_etag(session_id, session_data['finalQuery'],
+                                 session_data.get('queryParams'), columnar)
+            if etag_matches(request, etag):
+                return not_modified(etag, RESULTS_CACHE_CONTROL)
         
-        # Check user access
-        if session_data['userId'] != current_user.id and current_user.role != 'Admin':
-            raise HTTPException(
-                status_code=403,
-                detail={'error': 'Forbidden', 'message': 'Access denied to this session'}
-            )
+        if since is not None and session_data.get('finalQuery'):
+            async with _admitted(current_user, _priority(request)):
+                return await _get_query_results_since(session_data, since, columnar)
         
         # Re-execute query to get fresh results (in production, cache results)
-        result = await nl_query_pipeline.process_query(
-            session_data['naturalLanguageQuery'],
-            session_data['userId'],
-            session_id
-        )
-        
-        # Map results to API response format
-        table_columns = []
-        if result.results and result.results['rows'] and len(result.results['rows']) > 0:
-            first_row = result.results['rows'][0]
-            import re
-            table_columns = [
-                {
-                    'id': key,
-                    'label': key[0].upper() + re.sub(r'([A-Z])', r' \1', key[1:]),
-                    'type': 'string',
-                }
-                for key in first_row.keys()
-            ]
-        
-        # Generate multiple meaningful charts based on available data
-        charts = []
-        
-        if result.results and result.results['rows']:
-            rows = result.results['rows']
-            
-            # Chart 1: Stock Levels (Bar Chart)
-            if any(r.get('currentStock') is not None for r in rows):
-                charts.append({
-                    'type': 'bar',
-                    'title': 'Current Stock Levels',
-                    'xAxisKey': 'name',
-                    'data': sorted([
-                        {
-                            'name': (r.get('name') or r.get('sku') or 'Unknown')[:20],
-                            'stock': r.get('currentStock', 0),
-                            'threshold': r.get('reorderThreshold', 0),
-                        }
-                        for r in rows
-                    ], key=lambda x: x['stock'], reverse=True)[:15],
-                    'dataKeys': [
-                        {'key': 'stock', 'name': 'Current Stock', 'color': '#6366f1'},
-                        {'key': 'threshold', 'name': 'Reorder Threshold', 'color': '#ef4444'},
-                    ],
-                })
-            
-            # Chart 2: Sales Volume (Area Chart)
-            if any(r.get('recentSalesVolume') is not None for r in rows):
-                charts.append({
-                    'type': 'area',
-                    'title': 'Recent Sales Volume',
-                    'xAxisKey': 'name',
-                    'data': sorted([
-                        {
-                            'name': (r.get('name') or r.get('sku') or 'Unknown')[:20],
-                            'sales': r.get('recentSalesVolume', 0),
-                        }
-                        for r in rows
-                        if r.get('recentSalesVolume', 0) > 0
-                    ], key=lambda x: x['sales'], reverse=True)[:15],
-                    'dataKeys': [{'key': 'sales', 'name': 'Sales Volume', 'color': '#10b981'}],
-                })
-            
-            # Chart 3: Stock vs Sales Comparison (Line Chart)
-            if any(r.get('currentStock') is not None and r.get('recentSalesVolume') is not None for r in rows):
-                max_stock = max((r.get('currentStock', 0) for r in rows), default=1)
-                max_sales = max((r.get('recentSalesVolume', 0) for r in rows), default=1)
-                scale_factor = max_stock / max_sales if max_sales > 0 else 1
-                
-                charts.append({
-                    'type': 'line',
-                    'title': 'Stock vs Sales Comparison',
-                    'xAxisKey': 'name',
-                    'data': sorted([
-                        {
-                            'name': (r.get('name') or r.get('sku') or 'Unknown')[:15],
-                            'stock': r.get('currentStock', 0),
-                            'sales': r.get('recentSalesVolume', 0) * scale_factor,
-                            'salesOriginal': r.get('recentSalesVolume', 0),
-                        }
-                        for r in rows
-                    ], key=lambda x: x['stock'], reverse=True)[:12],
-                    'dataKeys': [
-                        {'key': 'stock', 'name': 'Current Stock', 'color': '#6366f1'},
-                        {'key': 'sales', 'name': 'Sales Volume (scaled)', 'color': '#10b981'},
-                    ],
-                })
-            
-            # Chart 4: Low Stock Alert
-            low_stock_items = [
-                r for r in rows
-                if r.get('reorderThreshold', 0) > 0 and r.get('currentStock', 0) <= r.get('reorderThreshold', 0)
-            ]
-            
-            if low_stock_items:
-                charts.append({
-                    'type': 'bar',
-                    'title': 'Low Stock Alert - Items Below Reorder Threshold',
-                    'xAxisKey': 'name',
-                    'data': sorted([
-                        {
-                            'name': (r.get('name') or r.get('sku') or 'Unknown')[:20],
-                            'stock': r.get('currentStock', 0),
-                            'threshold': r.get('reorderThreshold', 0),
-                            'deficit': max(0, r.get('reorderThreshold', 0) - r.get('currentStock', 0)),
-                        }
-                        for r in low_stock_items
-                    ], key=lambda x: x['stock']),
-                    'dataKeys': [
-                        {'key': 'stock', 'name': 'Current Stock', 'color': '#ef4444'},
-                        {'key': 'threshold', 'name': 'Reorder Threshold', 'color': '#f59e0b'},
-                        {'key': 'deficit', 'name': 'Stock Deficit', 'color': '#dc2626'},
-                    ],
-                })
-            
-            # Chart 5: Top Performers Pie Chart
-            if any(r.get('recentSalesVolume') is not None for r in rows):
-                top_performers = sorted([
-                    {
-                        'name': (r.get('name') or r.get('sku') or 'Unknown')[:20],
-                        'value': r.get('recentSalesVolume', 0),
-                    }
-                    for r in rows
-                    if r.get('recentSalesVolume', 0) > 0
-                ], key=lambda x: x['value'], reverse=True)[:8]
-                
-                if top_performers:
-                    charts.append({
-                        'type': 'pie',
-                        'title': 'Top Selling Products Distribution',
-                        'data': top_performers,
-                        'dataKeys': [{'key': 'value', 'name': 'Sales Volume', 'color': '#6366f1'}],
-                    })
-            
-            # Default chart if none created
-            if not charts and rows:
-                charts.append({
-                    'type': 'bar',
-                    'title': 'Inventory Overview',
-                    'xAxisKey': 'name',
-                    'data': [
-                        {
-                            'name': (r.get('name') or r.get('sku') or 'Unknown')[:20],
-                            'value': r.get('currentStock') or r.get('recentSalesVolume') or 0,
-                        }
-                        for r in rows[:15]
-                    ],
-                    'dataKeys': [{'key': 'value', 'name': 'Value', 'color': '#6366f1'}],
-                })
+        version = data_version()
+        watermark = inventory_query_executor.watermark()
+        question = session_data['naturalLanguageQuery']
+        async with _admitted(current_user, _priority(request),
+                             nl_query_draft_service.expected_llm_calls(question)):
+            result = await nl_query_pipeline.process_query(
+                question,
+                session_data['userId'],
+                session_id
+            )
+        if (result.session.finalQuery != session_data.get('finalQuery')
+                or result.session.queryParams != session_data.get('queryParams')):
+            _store_session({**result.session.dict(), 'createdAt': session_data['createdAt']})
         
-        return {
-            'sessionId': result.session.id,
-            'status': result.session.status.value,
-            'reviewSummary': result.session.reviewFindings.dict() if result.session.reviewFindings else {},
-            'table': {
-                'columns': table_columns,
-                'rows': result.results['rows'] if result.results else [],
-            },
-            'charts': charts,
-            'message': 'Query executed successfully' if result.session.status.value == 'executed' else 'Query processing',
-        }
+        result_set = result.results['resultSet'] if result.results else None
+        token = None
+        if result_set is not None:
+            token = uuid.uuid4().hex
+            result_versions.put(session_id, ResultVersion(token, result_set, version, watermark))
+        return _results_response(
+            _results_payload(result.session, result_set, token, columnar),
+            _results_etag(session_id, result.session.finalQuery, result.session.queryParams, columnar),
+            columnar,
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -289,10 +379,106 @@ async def get_query_results(
         )
 
 
-@router.get("/nl-queries")
-async def list_sessions(current_user: User = Depends(get_current_user)):
+def _results_response(payload: Dict[str, Any], etag: str, columnar: bool) -> FastJSONResponse:
+    """Results response with validators; the representation is negotiated on Accept."""
+    return FastJSONResponse(
+        payload,
+        media_type=COLUMNAR_MEDIA_TYPE if columnar else None,
+        headers={
+            'ETag': etag,
+            'Cache-Control': RESULTS_CACHE_CONTROL,
+            'Vary': 'Accept',
+        },
+    )
+
+
+async def _get_query_results_since(session_data: Dict[str, Any], since: str,
+                                   columnar: bool = False) -> FastJSONResponse:
+    """Re-run the session's final SQL and return the changes since version ``since``."""
+    session = InventoryQuerySession(**session_data)
+    previous = result_versions.get(session.id, since)
+    
+    result, current = await inventory_query_executor.execute_incremental(
+        session.finalQuery, session.queryParams, previous
+    )
+    result_versions.put(session.id, current)
+    
+    payload = _diff_payload(session, previous, current, result.incremental) if previous else None
+    if payload is None:
+        payload = _results_payload(session, result.result_set, current.token, columnar)
+    return _results_response(
+        payload,
+        _results_etag(session.id, session.finalQuery, session.queryParams, columnar),
+        columnar and payload['mode'] == 'full',
+    )
+
+
+@router.get("/nl-queries/{session_id}/export")
+async def export_query_results(
+    session_id: str,
+    request: Request,
+    format: str = 'csv',
+    current_user: User = Depends(get_current_user)
+):
+    """Download the complete result of a session (no row cap) as CSV, Parquet or Arrow.
+    
+    Rows are streamed from the SQLite cursor in batches with chunked
+    transfer encoding, so memory use does not grow with the result size.
+    """
+    session_data = _get_accessible_session(session_id, current_user)
+    if not session_data.get('finalQuery'):
+        raise HTTPException(
+            status_code=409,
+            detail={'error': 'Conflict', 'message': 'Session has no executed query to export'}
+        )
+    export_format = format.lower()
+    if export_format not in available_formats():
+        raise HTTPException(
+            status_code=400,
+            detail={
+                'error': 'Bad Request',
+                'message': f'Unsupported export format "{format}"; use one of: '
+                           + ', '.join(available_formats()),
+            }
+        )
+    
+    sql, params = result_exporter.uncapped(
+        session_data['finalQuery'],
+        session_data.get('queryParams') or [],
+        session_data.get('rowLimitRequested', False),
+    )
+    try:
+        # Admission covers running the query; the download itself holds no slot
+        async with _admitted(current_user, _priority(request)):
+            cursor = await asyncio.to_thread(result_exporter.open_cursor, sql, params)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error('Error exporting query results', {'sessionId': session_id, 'error': str(e)})
+        raise HTTPException(
+            status_code=500,
+            detail={'error': 'Internal Server Error', 'message': 'Failed to export results'}
+        )
+    
+    media_type, extension, _ = EXPORT_FORMATS[export_format]
+    return StreamingResponse(
+        result_exporter.stream(cursor, export_format),
+        media_type=media_type,
+        headers={
+            'Content-Disposition': f'attachment; filename="query-{session_id}.{extension}"',
+            'Cache-Control': 'no-store',
+        },
+    )
+
+
+@router.get("/nl-queries", response_class=FastJSONResponse)
+async def list_sessions(request: Request, current_user: User = Depends(get_current_user)):
     """List recent sessions."""
     try:
+        etag = make_etag(current_user.id, _sessions_version)
+        if etag_matches(request, etag):
+            return not_modified(etag, SESSIONS_CACHE_CONTROL)
+        
         # Filter sessions by user
         user_sessions = [
             {
@@ -307,7 +493,10 @@ async def list_sessions(current_user: User = Depends(get_current_user)):
         
         user_sessions.sort(key=lambda x: x['createdAt'], reverse=True)
         
-        return {'sessions': user_sessions[:20]}
+        return FastJSONResponse({'sessions': user_sessions[:20]}, headers={
+            'ETag': etag,
+            'Cache-Control': SESSIONS_CACHE_CONTROL,
+        })
     except Exception as e:
         logger.error('Error listing sessions', {'error': str(e)})
         raise HTTPException(
@@ -0,0 +1,157 @@
+"""Saved Queries API routes."""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from pydantic import BaseModel
+
+from api.middleware.auth_middleware import get_current_user, User
+from api.http_cache import etag_matches, make_etag, not_modified
+from api.responses import FastJSONResponse, RawJSON
+from api.routes.nl_queries import sessions
+from config import config
+from models.saved_query import SavedQuery
+from services.logging.logger import logger_instance as logger
+from services.saved_queries import saved_query_refresher, saved_query_store
+
+router = APIRouter()
+
+# Precomputed payloads change only on refresh; always revalidate
+SAVED_RESULTS_CACHE_CONTROL = 'private, no-cache'
+
+
+class SaveQueryRequest(BaseModel):
+    """Save query request model."""
+    sessionId: str
+    name: str
+    refreshIntervalSeconds: Optional[int] = None
+
+
+def _get_owned(saved_query_id: str, current_user: User) -> SavedQuery:
+    """Load a saved query the current user may access (404/403 otherwise)."""
+    saved = saved_query_store.get(saved_query_id)
+    if saved is None:
+        raise HTTPException(
+            status_code=404,
+            detail={'error': 'Not Found', 'message': 'Saved query not found'}
+        )
+    if saved.userId != current_user.id and current_user.role != 'Admin':
+        raise HTTPException(
+            status_code=403,
+            detail={'error': 'Forbidden', 'message': 'Access denied to this saved query'}
+        )
+    return saved
+
+
+@router.post("/saved-queries", status_code=201, response_class=FastJSONResponse)
+async def save_query(
+    request: SaveQueryRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Save the final SQL of an executed session under a name."""
+    session_data = sessions.get(request.sessionId)
+    if not session_data or not session_data.get('finalQuery'):
+        raise HTTPException(
+            status_code=404,
+            detail={'error': 'Not Found', 'message': 'Executed session not found'}
+        )
+    if session_data['userId'] != current_user.id and current_user.role != 'Admin':
+        raise HTTPException(
+            status_code=403,
+            detail={'error': 'Forbidden', 'message': 'Access denied to this session'}
+        )
+    if not request.name.strip():
+        raise HTTPException(
+            status_code=400,
+            detail={'error': 'Bad Request', 'message': 'Missing or invalid "name" field'}
+        )
+
+    interval = request.refreshIntervalSeconds or config.SAVED_QUERY_DEFAULT_REFRESH_SECONDS
+    interval = max(interval, config.SAVED_QUERY_MIN_REFRESH_SECONDS)
+
+    try:
+        saved = saved_query_store.create(
+            user_id=current_user.id,
+            name=request.name.strip(),
+            natural_language_query=session_data['naturalLanguageQuery'],
+            final_query=session_data['finalQuery'],
+            query_params=session_data.get('queryParams') or [],
+            refresh_interval_seconds=interval,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail={'error': 'Bad Request', 'message': str(e)}
+        )
+
+    # Precompute right away so the first open is already instant
+    result = await saved_query_refresher.ensure(saved)
+    return FastJSONResponse({
+        **saved.dict(),
+        'freshness': saved_query_refresher.freshness(saved, result),
+    }, status_code=201)
+
+
+@router.get("/saved-queries", response_class=FastJSONResponse)
+async def list_saved_queries(current_user: User = Depends(get_current_user)):
+    """List the current user's saved queries with freshness metadata."""
+    return FastJSONResponse({
+        'savedQueries': [
+            {
+                **saved.dict(),
+                'freshness': saved_query_refresher.freshness(saved, saved_query_refresher.get(saved.id)),
+            }
+            for saved in saved_query_store.list(current_user.id)
+        ]
+    })
+
+
+@router.get("/saved-queries/{saved_query_id}", response_class=FastJSONResponse)
+async def get_saved_query_results(
+    saved_query_id: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Return the precomputed table and charts of a saved query."""
+    saved = _get_owned(saved_query_id, current_user)
+
+    try:
+        result = await saved_query_refresher.ensure(saved)
+    except Exception as e:
+        logger.error('Error computing saved query results', {
+            'savedQueryId': saved_query_id,
+            'error': str(e),
+        })
+        result = None
+    if result is None:
+        raise HTTPException(
+            status_code=503,
+            detail={'error': 'Service Unavailable', 'message': 'Saved query results are not available yet'}
+        )
+
+    etag = make_etag(saved.id, result.refreshed_at)
+    if etag_matches(request, etag):
+        return not_modified(etag, SAVED_RESULTS_CACHE_CONTROL)
+
+    return FastJSONResponse({
+        'savedQuery': saved,
+        'freshness': saved_query_refresher.freshness(saved, result),
+        'table': {
+            'columns': result.columns,
+            'rows': RawJSON(result.rows_json),
+        },
+        'charts': result.charts,
+    }, headers={
+        'ETag': etag,
+        'Cache-Control': SAVED_RESULTS_CACHE_CONTROL,
+    })
+
+
+@router.delete("/saved-queries/{saved_query_id}", status_code=204)
+async def delete_saved_query(
+    saved_query_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a saved query."""
+    saved = _get_owned(saved_query_id, current_user)
+    saved_query_store.delete(saved.id)
+    saved_query_refresher.forget(saved.id)
+    return Response(status_code=204)
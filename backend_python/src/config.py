@@ -14,9 +14,113 @@ class Config:
     # Database Configuration
     DB_PATH = os.getenv('DB_PATH', 'inventory.db')
     
+    # Partitioned inventory_items: 'off', 'location' (one file per location)
+    # or 'hash' (PARTITION_COUNT files by item id). Shard files live in
+    # PARTITION_DIR (default: "<DB_PATH stem>_shards"); queries that can be
+    # merged run on PARTITION_WORKERS threads, the rest over ATTACHed shards
+    PARTITION_MODE = os.getenv('PARTITION_MODE', 'off')
+    PARTITION_COUNT = int(os.getenv('PARTITION_COUNT', '4'))
+    PARTITION_DIR = os.getenv('PARTITION_DIR', '')
+    PARTITION_WORKERS = int(os.getenv('PARTITION_WORKERS', '4'))
+    PARTITION_PARALLEL = os.getenv('PARTITION_PARALLEL', 'true').lower() != 'false'
+    
+    # Snapshot reads: a publisher VACUUMs the database INTO an immutable copy
+    # every SNAPSHOT_INTERVAL_S (when it changed) and inventory reads use the
+    # newest copy (immutable=1, memory-mapped). Workers that only read set
+    # SNAPSHOT_PUBLISH=false and follow the copies another process publishes
+    SNAPSHOT_ENABLED = os.getenv('SNAPSHOT_ENABLED', 'false').lower() == 'true'
+    SNAPSHOT_PUBLISH = os.getenv('SNAPSHOT_PUBLISH', 'true').lower() != 'false'
+    SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', '')
+    SNAPSHOT_INTERVAL_S = float(os.getenv('SNAPSHOT_INTERVAL_S', '30'))
+    SNAPSHOT_KEEP = int(os.getenv('SNAPSHOT_KEEP', '3'))
+    SNAPSHOT_MMAP_BYTES = int(os.getenv('SNAPSHOT_MMAP_BYTES', str(1024 * 1024 * 1024)))
+    
+    # Stock/sales history: daily rows are kept this long, then only the
+    # weekly rollups (kept HISTORY_WEEKLY_RETENTION_DAYS) and monthly rollups
+    HISTORY_DAILY_RETENTION_DAYS = int(os.getenv('HISTORY_DAILY_RETENTION_DAYS', '400'))
+    HISTORY_WEEKLY_RETENTION_DAYS = int(os.getenv('HISTORY_WEEKLY_RETENTION_DAYS', '1100'))
+    
     # CORS Configuration
     CORS_ORIGIN = os.getenv('CORS_ORIGIN', 'http://localhost:3000')
     
+    # Run drafts on a read-only connection while the LLM critique is in flight
+    SPECULATIVE_EXECUTION = os.getenv('SPECULATIVE_EXECUTION', 'true').lower() != 'false'
+    
+    # Rewrite drafted SQL before execution (inner joins, ids for names, LIMIT, pruning)
+    QUERY_REWRITE = os.getenv('QUERY_REWRITE', 'true').lower() != 'false'
+    
+    # Draft hedging: wait for the LLM up to this percentile of its observed
+    # latency, then race a keyword draft (and optionally a second LLM request)
+    DRAFT_HEDGE_PERCENTILE = float(os.getenv('DRAFT_HEDGE_PERCENTILE', '0.9'))
+    DRAFT_HEDGE_MIN_SAMPLES = int(os.getenv('DRAFT_HEDGE_MIN_SAMPLES', '20'))
+    DRAFT_HEDGE_DEFAULT_MS = int(os.getenv('DRAFT_HEDGE_DEFAULT_MS', '8000'))
+    DRAFT_HEDGE_MIN_MS = int(os.getenv('DRAFT_HEDGE_MIN_MS', '1000'))
+    DRAFT_HEDGE_LLM = os.getenv('DRAFT_HEDGE_LLM', 'false').lower() == 'true'
+    DRAFT_HEDGE_GRACE_MS = int(os.getenv('DRAFT_HEDGE_GRACE_MS', '1500'))
+    
+    # Batch submissions: maximum questions per request and concurrent drafts
+    BATCH_MAX_QUERIES = int(os.getenv('BATCH_MAX_QUERIES', '20'))
+    BATCH_DRAFT_CONCURRENCY = int(os.getenv('BATCH_DRAFT_CONCURRENCY', '4'))
+    
+    # Shared result cache for identical SQL + parameters (bytes are estimates)
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+    RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv('RESULT_CACHE_MAX_ENTRY_BYTES', str(8 * 1024 * 1024)))
+    
+    # Diff mode: sessions whose last result is kept, and the most changed rows
+    # an incremental refresh re-reads before falling back to a full run
+    RESULT_VERSIONS_MAX_SESSIONS = int(os.getenv('RESULT_VERSIONS_MAX_SESSIONS', '1000'))
+    # Versions kept per session, so each polling client's token stays valid
+    RESULT_VERSIONS_PER_SESSION = int(os.getenv('RESULT_VERSIONS_PER_SESSION', '4'))
+    INCREMENTAL_MAX_CHANGED_ROWS = int(os.getenv('INCREMENTAL_MAX_CHANGED_ROWS', '500'))
+    
+    # Streaming exports: rows fetched and written per batch (Parquet row group size)
+    EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '10000'))
+    
+    # Chart point budgets per chart type (LTTB for line/area, top-k + "other" for bar/pie)
+    CHART_BAR_POINTS = int(os.getenv('CHART_BAR_POINTS', '15'))
+    CHART_PIE_POINTS = int(os.getenv('CHART_PIE_POINTS', '8'))
+    CHART_LINE_POINTS = int(os.getenv('CHART_LINE_POINTS', '60'))
+    CHART_AREA_POINTS = int(os.getenv('CHART_AREA_POINTS', '60'))
+    
+    # Admission control ahead of the query pipeline: per-user and per-role
+    # token buckets (per minute, bursting up to ADMISSION_BURST_SECONDS worth),
+    # role limits/weights as "Role:value,*:default", and the fair queue
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'true').lower() != 'false'
+    ADMISSION_USER_LLM_PER_MINUTE = float(os.getenv('ADMISSION_USER_LLM_PER_MINUTE', '60'))
+    ADMISSION_USER_SQL_PER_MINUTE = float(os.getenv('ADMISSION_USER_SQL_PER_MINUTE', '240'))
+    ADMISSION_ROLE_LLM_PER_MINUTE = os.getenv('ADMISSION_ROLE_LLM_PER_MINUTE', '*:600')
+    ADMISSION_ROLE_SQL_PER_MINUTE = os.getenv('ADMISSION_ROLE_SQL_PER_MINUTE', '*:2400')
+    ADMISSION_BURST_SECONDS = float(os.getenv('ADMISSION_BURST_SECONDS', '15'))
+    ADMISSION_LLM_CALLS_PER_DRAFT = int(os.getenv('ADMISSION_LLM_CALLS_PER_DRAFT', '3'))
+    ADMISSION_ROLE_WEIGHTS = os.getenv('ADMISSION_ROLE_WEIGHTS', 'Admin:2,*:1')
+    ADMISSION_MAX_CONCURRENT = int(os.getenv('ADMISSION_MAX_CONCURRENT', '16'))
+    ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', '128'))
+    ADMISSION_QUEUE_TIMEOUT_S = float(os.getenv('ADMISSION_QUEUE_TIMEOUT_S', '15'))
+    
+    # Saved queries: default/minimum refresh interval and scheduler tick
+    SAVED_QUERY_DEFAULT_REFRESH_SECONDS = int(os.getenv('SAVED_QUERY_DEFAULT_REFRESH_SECONDS', '300'))
+    SAVED_QUERY_MIN_REFRESH_SECONDS = int(os.getenv('SAVED_QUERY_MIN_REFRESH_SECONDS', '30'))
+    SAVED_QUERY_TICK_SECONDS = float(os.getenv('SAVED_QUERY_TICK_SECONDS', '5'))
+    
+    # Local intent parser: drafts at or above this confidence skip the LLM
+    INTENT_CONFIDENCE_THRESHOLD = float(os.getenv('INTENT_CONFIDENCE_THRESHOLD', '0.85'))
+    
+    # Schema prompt: approximate token budget and how often to check for data changes
+    SCHEMA_PROMPT_TOKEN_BUDGET = int(os.getenv('SCHEMA_PROMPT_TOKEN_BUDGET', '600'))
+    SCHEMA_REFRESH_SECONDS = float(os.getenv('SCHEMA_REFRESH_SECONDS', '30'))
+    
+    # Profiling (admin only): kept request captures, longest sampling window,
+    # tracemalloc frames per trace and the event loop lag monitor
+    PROFILE_MAX_CAPTURES = int(os.getenv('PROFILE_MAX_CAPTURES', '20'))
+    PROFILE_SAMPLE_MAX_SECONDS = float(os.getenv('PROFILE_SAMPLE_MAX_SECONDS', '60'))
+    TRACEMALLOC_FRAMES = int(os.getenv('TRACEMALLOC_FRAMES', '10'))
+    LOOP_LAG_MONITOR = os.getenv('LOOP_LAG_MONITOR', 'true').lower() != 'false'
+    LOOP_LAG_INTERVAL_MS = float(os.getenv('LOOP_LAG_INTERVAL_MS', '50'))
+    LOOP_LAG_THRESHOLD_MS = float(os.getenv('LOOP_LAG_THRESHOLD_MS', '100'))
+    
+    # Response Compression Configuration
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    
     # Logging Configuration
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'info')
     
@@ -34,6 +138,21 @@ class Config:
         # Enable/disable
         ENABLED = os.getenv('OPENAI_ENABLED', 'true').lower() != 'false'
         
+        # Client retries per call (on top of the circuit breaker)
+        MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '1'))
+        
+        # Per-call timeouts: p99 of observed latency * multiplier, clamped
+        TIMEOUT_DEFAULT_S = float(os.getenv('OPENAI_TIMEOUT_DEFAULT_S', '30'))
+        TIMEOUT_MIN_S = float(os.getenv('OPENAI_TIMEOUT_MIN_S', '2'))
+        TIMEOUT_MAX_S = float(os.getenv('OPENAI_TIMEOUT_MAX_S', '60'))
+        TIMEOUT_P99_MULTIPLIER = float(os.getenv('OPENAI_TIMEOUT_P99_MULTIPLIER', '1.5'))
+        
+        # Circuit breaker over a rolling window of calls
+        BREAKER_WINDOW = int(os.getenv('OPENAI_BREAKER_WINDOW', '50'))
+        BREAKER_MIN_CALLS = int(os.getenv('OPENAI_BREAKER_MIN_CALLS', '10'))
+        BREAKER_ERROR_RATE = float(os.getenv('OPENAI_BREAKER_ERROR_RATE', '0.5'))
+        BREAKER_OPEN_SECONDS = float(os.getenv('OPENAI_BREAKER_OPEN_SECONDS', '30'))
+        
         # Determine if using Azure
         IS_AZURE = bool(os.getenv('AZURE_OPENAI_ENDPOINT'))
     
@@ -1,6 +1,7 @@
 """Models package."""
 from .inventory_item import InventoryItem
 from .inventory_query_session import InventoryQuerySession, QuerySessionStatus, ReviewFindings
+from .saved_query import SavedQuery
 
-__all__ = ['InventoryItem', 'InventoryQuerySession', 'QuerySessionStatus', 'ReviewFindings']
+__all__ = ['InventoryItem', 'InventoryQuerySession', 'QuerySessionStatus', 'ReviewFindings', 'SavedQuery']
 
@@ -25,6 +25,8 @@ class ReviewFindings(BaseModel):
         'hasRowLimit': False,
         'hasTimeFilter': False,
     }
+    # 'skipped' when the local static review passed, 'escalated' when the LLM critique ran
+    critiqueDecision: Optional[str] = None
 
 
 class InventoryQuerySession(BaseModel):
@@ -34,7 +36,12 @@ class InventoryQuerySession(BaseModel):
     naturalLanguageQuery: str
     draftQuery: Optional[str] = None
     reviewFindings: Optional[ReviewFindings] = None
+    draftSource: Optional[str] = None
     finalQuery: Optional[str] = None
+    # Values bound to the ``?`` placeholders of ``finalQuery``
+    queryParams: List[Any] = []
+    # True when the outer LIMIT of ``finalQuery`` was asked for ("top 5"); exports keep it
+    rowLimitRequested: bool = False
     status: QuerySessionStatus
     executedAt: Optional[datetime] = None
     resultSummary: Optional[Dict[str, Any]] = None
@@ -0,0 +1,23 @@
+"""Saved query model."""
+from typing import Any, List
+from datetime import datetime
+from pydantic import BaseModel
+
+
+class SavedQuery(BaseModel):
+    """Final SQL of a query session saved under a name."""
+    id: str
+    userId: str
+    name: str
+    naturalLanguageQuery: str
+    finalQuery: str
+    queryParams: List[Any] = []
+    refreshIntervalSeconds: int
+    createdAt: datetime
+    updatedAt: datetime
+    
+    class Config:
+        """Pydantic config."""
+        json_encoders = {
+            datetime: lambda v: v.isoformat() if v else None
+        }
@@ -0,0 +1,322 @@
+"""Admission control ahead of the NL query pipeline.
+
+Every pipeline run is admitted in two steps:
+
+1. Rate limits: token buckets per user and per role (``User.role``) for LLM
+   calls and SQL executions. A request takes all of its tokens or none; when
+   any bucket is short it is rejected with the time until it would fit. A
+   request costing more than a bucket holds (a large batch) is charged the
+   full bucket, so it runs once the bucket is full instead of never.
+2. Concurrency: at most ``ADMISSION_MAX_CONCURRENT`` runs execute at once.
+   Waiting runs are ordered by priority class (interactive before scheduled)
+   and, within a class, by weighted fair queuing between users: each run
+   gets a virtual finish time of ``max(virtual clock, user's last finish) +
+   cost / weight``, so a user flooding the queue only delays their own runs.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from config import config
+from services.logging.logger import logger_instance as logger
+from services.metrics.latency_window import LatencyWindow
+from services.metrics.registry import metrics
+
+INTERACTIVE = 'interactive'
+SCHEDULED = 'scheduled'
+PRIORITIES = (INTERACTIVE, SCHEDULED)
+
+LLM = 'llm'
+SQL = 'sql'
+
+
+class AdmissionRejected(Exception):
+    """Raised when a run is not admitted; ``retry_after`` is in seconds."""
+
+    def __init__(self, reason: str, message: str, retry_after: float, status_code: int):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+def parse_role_values(spec: str) -> Dict[str, float]:
+    """Parse ``"Admin:1200,*:600"`` into ``{'Admin': 1200.0, '*': 600.0}``."""
+    values = {}
+    for part in spec.split(','):
+        role, _, value = part.strip().rpartition(':')
+        if role and value:
+            values[role] = float(value)
+    return values
+
+
+def _for_role(values: Dict[str, float], role: str, default: float) -> float:
+    return values.get(role, values.get('*', default))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second up to ``capacity``."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 when they are now)."""
+        self._refill(now)
+        if amount <= self.tokens:
+            return 0.0
+        if amount > self.capacity or self.rate <= 0:
+            # Never fits; report a full refill
+            return self.capacity / self.rate if self.rate > 0 else float('inf')
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= amount
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Per-user and per-role token buckets for LLM calls and SQL executions.
+
+    Rates are per minute; buckets hold ``burst_seconds`` worth of tokens.
+    User buckets are kept in an LRU bounded by ``max_users``.
+    """
+
+    def __init__(self, user_rates: Dict[str, float], role_rates: Dict[str, Dict[str, float]],
+                 burst_seconds: float, max_users: int = 10000):
+        self.user_rates = user_rates
+        self.role_rates = role_rates
+        self.burst_seconds = burst_seconds
+        self.max_users = max_users
+        self._user_buckets: 'OrderedDict[Tuple[str, str], TokenBucket]' = OrderedDict()
+        self._role_buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, per_minute: float, now: float) -> TokenBucket:
+        rate = per_minute / 60
+        return TokenBucket(rate, max(1.0, rate * self.burst_seconds), now)
+
+    def _buckets(self, user_id: str, role: str, resource: str, now: float) -> List[TokenBucket]:
+        user_key = (user_id, resource)
+        user_bucket = self._user_buckets.get(user_key)
+        if user_bucket is None:
+            user_bucket = self._user_buckets[user_key] = self._bucket(self.user_rates[resource], now)
+            while len(self._user_buckets) > self.max_users:
+                self._user_buckets.popitem(last=False)
+        else:
+            self._user_buckets.move_to_end(user_key)
+        role_key = (role, resource)
+        role_bucket = self._role_buckets.get(role_key)
+        if role_bucket is None:
+            per_minute = _for_role(self.role_rates[resource], role, self.user_rates[resource])
+            role_bucket = self._role_buckets[role_key] = self._bucket(per_minute, now)
+        return [user_bucket, role_bucket]
+
+    def acquire(self, user_id: str, role: str, costs: Dict[str, int]) -> None:
+        """Take ``costs`` (resource -> tokens) from every bucket, or raise AdmissionRejected.
+
+        Each bucket is charged at most its capacity.
+        """
+        now = time.monotonic()
+        with self._lock:
+            planned = []
+            for resource, amount in costs.items():
+                if amount <= 0:
+                    continue
+                for scope, bucket in zip(('user', 'role'), self._buckets(user_id, role, resource, now)):
+                    charge = min(amount, bucket.capacity)
+                    wait = bucket.wait_time(charge, now)
+                    if wait > 0:
+                        metrics.increment(f'admission.rejected.{resource}')
+                        raise AdmissionRejected(
+                            f'{resource}RateLimit',
+                            f'Too many {resource.upper()} requests for this {scope}; retry later',
+                            wait,
+                            429,
+                        )
+                    planned.append((bucket, charge))
+            for bucket, charge in planned:
+                bucket.take(charge)
+
+    def refund(self, user_id: str, role: str, costs: Dict[str, int]) -> None:
+        """Return tokens of a run that was admitted by the limiter but never ran."""
+        now = time.monotonic()
+        with self._lock:
+            for resource, amount in costs.items():
+                if amount > 0:
+                    for bucket in self._buckets(user_id, role, resource, now):
+                        bucket.refund(min(amount, bucket.capacity))
+
+
+class FairQueue:
+    """Concurrency slots handed out by priority class, then weighted fair queuing.
+
+    Runs on the event loop; not thread-safe.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.in_flight = 0
+        self._queues: Dict[str, List] = {priority: [] for priority in PRIORITIES}
+        self._virtual_time = 0.0
+        self._finish: Dict[str, float] = {}
+        self._sequence = itertools.count()
+
+    def depth(self, priority: Optional[str] = None) -> int:
+        queues = [self._queues[priority]] if priority else self._queues.values()
+        return sum(1 for queue in queues for entry in queue if not entry[3].done())
+
+    async def acquire(self, user_id: str, weight: float, priority: str, cost: float,
+                      timeout: float) -> None:
+        """Wait for a slot; raises AdmissionRejected when the queue is full or the wait times out."""
+        if self.in_flight < self.max_concurrent and self.depth() == 0:
+            self.in_flight += 1
+            return
+        if self.depth() >= self.max_queued:
+            metrics.increment('admission.rejected.queueFull')
+            raise AdmissionRejected('queueFull', 'Server is busy; retry later', timeout, 503)
+
+        start = max(self._virtual_time, self._finish.get(user_id, 0.0))
+        finish = start + cost / max(weight, 1e-6)
+        self._finish[user_id] = finish
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queues[priority], (finish, next(self._sequence), start, waiter))
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            metrics.increment('admission.rejected.queueTimeout')
+            raise AdmissionRejected('queueTimeout', 'Server is busy; retry later', timeout, 503)
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Free a slot and hand it to the next waiter, if any."""
+        self.in_flight -= 1
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue:
+                _, _, start, waiter = heapq.heappop(queue)
+                if waiter.done():
+                    # Timed out or cancelled while queued
+                    continue
+                self._virtual_time = max(self._virtual_time, start)
+                self.in_flight += 1
+                waiter.set_result(None)
+                return
+        # Idle: fairness bookkeeping only matters under backlog
+        self._finish.clear()
+
+
+class AdmissionController:
+    """Admit pipeline runs: rate limits first, then a fair share of concurrency.
+
+    Exports ``admission.queueDepth.<priority>``, ``admission.inFlight`` and
+    ``admission.waitMs.p50/p99`` gauges plus ``admission.admitted`` and
+    ``admission.rejected.<reason>`` counters.
+    """
+
+    def __init__(self, limiter: RateLimiter, queue: FairQueue, role_weights: Dict[str, float],
+                 queue_timeout: float, enabled: bool = True):
+        self.limiter = limiter
+        self.queue = queue
+        self.role_weights = role_weights
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+        self._waits = LatencyWindow()
+        for priority in PRIORITIES:
+            metrics.register_gauge(f'admission.queueDepth.{priority}',
+                                   lambda priority=priority: self.queue.depth(priority))
+        metrics.register_gauge('admission.inFlight', lambda: self.queue.in_flight)
+        metrics.register_gauge('admission.waitMs.p50', lambda: self._wait_ms(0.5))
+        metrics.register_gauge('admission.waitMs.p99', lambda: self._wait_ms(0.99))
+
+    def _wait_ms(self, fraction: float) -> float:
+        wait = self._waits.percentile(fraction)
+        return round(wait * 1000, 2) if wait is not None else 0.0
+
+    @asynccontextmanager
+    async def admit(self, user_id: str, role: str, priority: str = INTERACTIVE,
+                    llm_calls: int = 0, sql_executions: int = 1) -> AsyncIterator[None]:
+        """Hold an admission for the body of the ``async with`` block.
+
+        Raises AdmissionRejected (429 for rate limits, 503 for a full or slow
+        queue) before the body runs.
+        """
+        if not self.enabled:
+            yield
+            return
+        costs = {LLM: llm_calls, SQL: sql_executions}
+        self.limiter.acquire(user_id, role, costs)
+        started = time.monotonic()
+        try:
+            await self.queue.acquire(
+                user_id,
+                _for_role(self.role_weights, role, 1.0),
+                priority,
+                # LLM calls dominate a run's duration
+                1 + llm_calls,
+                self.queue_timeout,
+            )
+        except AdmissionRejected as rejected:
+            self.limiter.refund(user_id, role, costs)
+            logger.warn('Query run rejected by admission control', {
+                'userId': user_id,
+                'role': role,
+                'priority': priority,
+                'reason': rejected.reason,
+            })
+            raise
+        except asyncio.CancelledError:
+            self.limiter.refund(user_id, role, costs)
+            raise
+        self._waits.record(time.monotonic() - started)
+        metrics.increment('admission.admitted')
+        try:
+            yield
+        finally:
+            self.queue.release()
+
+
+# Global instance
+admission_controller = AdmissionController(
+    RateLimiter(
+        user_rates={
+            LLM: config.ADMISSION_USER_LLM_PER_MINUTE,
+            SQL: config.ADMISSION_USER_SQL_PER_MINUTE,
+        },
+        role_rates={
+            LLM: parse_role_values(config.ADMISSION_ROLE_LLM_PER_MINUTE),
+            SQL: parse_role_values(config.ADMISSION_ROLE_SQL_PER_MINUTE),
+        },
+        burst_seconds=config.ADMISSION_BURST_SECONDS,
+    ),
+    FairQueue(config.ADMISSION_MAX_CONCURRENT, config.ADMISSION_MAX_QUEUE),
+    parse_role_values(config.ADMISSION_ROLE_WEIGHTS),
+    config.ADMISSION_QUEUE_TIMEOUT_S,
+    enabled=config.ADMISSION_ENABLED,
+)
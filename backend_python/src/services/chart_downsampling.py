@@ -0,0 +1,69 @@
+"""Point budgets for result charts: LTTB for line/area, top-k + "other" for bar/pie."""
+from typing import List, Sequence, Tuple
+
+from config import config
+
+
+def point_budget(chart_type: str) -> int:
+    """Configured maximum number of points for a chart type."""
+    return {
+        'bar': config.CHART_BAR_POINTS,
+        'pie': config.CHART_PIE_POINTS,
+        'line': config.CHART_LINE_POINTS,
+        'area': config.CHART_AREA_POINTS,
+    }.get(chart_type, config.CHART_BAR_POINTS)
+
+
+def lttb(values: Sequence[float], budget: int) -> List[int]:
+    """Positions kept by Largest-Triangle-Three-Buckets downsampling of ``values``.
+
+    The series is plotted at x = position. The first and last points are
+    always kept; every bucket in between contributes the point forming the
+    largest triangle with the previously kept point and the next bucket's
+    average, which preserves peaks and the overall shape.
+    """
+    count = len(values)
+    if budget >= count:
+        return list(range(count))
+    if budget < 3:
+        return [0, count - 1][:max(budget, 0)]
+
+    kept = [0]
+    bucket_size = (count - 2) / (budget - 2)
+    previous = 0
+    for bucket in range(budget - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+
+        # Average of the next bucket (the last point for the final bucket)
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        if bucket == budget - 3 or next_start >= next_end:
+            avg_x, avg_y = count - 1, values[count - 1]
+        else:
+            avg_x = (next_start + next_end - 1) / 2
+            avg_y = sum(values[next_start:next_end]) / (next_end - next_start)
+
+        prev_y = values[previous]
+        best, best_area = start, -1.0
+        for position in range(start, end):
+            area = abs((previous - avg_x) * (values[position] - prev_y)
+                       - (previous - position) * (avg_y - prev_y))
+            if area > best_area:
+                best, best_area = position, area
+        kept.append(best)
+        previous = best
+    kept.append(count - 1)
+    return kept
+
+
+def top_k_with_other(ordered: Sequence[int], budget: int) -> Tuple[List[int], List[int]]:
+    """Split rows (already in rank order) into the kept top rows and the rest.
+
+    When everything does not fit, one point of the budget is left for the
+    "other" bucket that aggregates the rest.
+    """
+    if len(ordered) <= budget:
+        return list(ordered), []
+    keep = max(budget - 1, 0)
+    return list(ordered[:keep]), list(ordered[keep:])
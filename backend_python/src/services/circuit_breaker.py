@@ -0,0 +1,156 @@
+"""Circuit breaker with rolling error-rate window and adaptive timeouts."""
+import threading
+import time
+from collections import deque
+
+from services.logging.logger import logger_instance as logger
+from services.metrics.latency_window import LatencyWindow
+from services.metrics.registry import metrics
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is attempted while the breaker rejects traffic."""
+
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for an unreliable dependency.
+
+    - closed: calls flow; outcomes are kept in a rolling window. When at least
+      ``min_calls`` are recorded and the error rate reaches
+      ``error_rate_threshold`` the breaker opens.
+    - open: calls are rejected immediately for ``open_seconds``.
+    - half-open: one probe call is let through; success closes the breaker,
+      failure re-opens it.
+
+    Per-call timeouts follow observed latency: ``p99 * timeout_multiplier``
+    clamped to ``[min_timeout, max_timeout]``, or ``default_timeout`` until
+    enough successful samples exist.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name: str, window_size: int = 50, min_calls: int = 10,
+                 error_rate_threshold: float = 0.5, open_seconds: float = 30.0,
+                 default_timeout: float = 30.0, min_timeout: float = 2.0,
+                 max_timeout: float = 60.0, timeout_multiplier: float = 1.5):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate_threshold = error_rate_threshold
+        self.open_seconds = open_seconds
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window_size)
+        self._latency = LatencyWindow(window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        prefix = f'circuitBreaker.{name}'
+        metrics.register_gauge(f'{prefix}.state', lambda: self.STATE_CODES[self.state])
+        metrics.register_gauge(f'{prefix}.errorRate', self.error_rate)
+        metrics.register_gauge(f'{prefix}.timeoutMs', lambda: int(self.call_timeout() * 1000))
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker turns half-open once its cool-down ends."""
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def _refresh_state(self) -> None:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def allows_traffic(self) -> bool:
+        """True when a new call would be admitted (does not reserve a probe)."""
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.OPEN:
+                return False
+            return not (self._state == self.HALF_OPEN and self._probe_in_flight)
+
+    def acquire(self) -> bool:
+        """Admit one call or raise CircuitOpenError.
+
+        Returns True when the call is the half-open probe; pass it back to
+        ``release`` if the call ends without an outcome.
+        """
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.OPEN:
+                raise CircuitOpenError(f'Circuit {self.name} is open')
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    raise CircuitOpenError(f'Circuit {self.name} is half-open; probe in flight')
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release(self, probe: bool) -> None:
+        """Give back an admitted call without recording an outcome (e.g. cancelled).
+
+        Only the caller holding the probe (``acquire`` returned True) frees
+        the probe slot; other calls must not let a second probe through.
+        """
+        if not probe:
+            return
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self, latency_seconds: float) -> None:
+        """Record a successful call."""
+        self._latency.record(latency_seconds)
+        with self._lock:
+            self._outcomes.append(True)
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self._outcomes.clear()
+                self._probe_in_flight = False
+                logger.info('Circuit breaker closed', {'breaker': self.name})
+
+    def record_failure(self) -> None:
+        """Record a failed or timed-out call."""
+        with self._lock:
+            self._outcomes.append(False)
+            if self._state == self.HALF_OPEN or self._should_open():
+                self._open()
+
+    def _should_open(self) -> bool:
+        if self._state != self.CLOSED or len(self._outcomes) < self.min_calls:
+            return False
+        failures = sum(1 for ok in self._outcomes if not ok)
+        return failures / len(self._outcomes) >= self.error_rate_threshold
+
+    def _open(self) -> None:
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        metrics.increment(f'circuitBreaker.{self.name}.opened')
+        logger.warn('Circuit breaker opened', {
+            'breaker': self.name,
+            'openSeconds': self.open_seconds,
+        })
+
+    def error_rate(self) -> float:
+        """Failure fraction over the rolling window."""
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return sum(1 for ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def call_timeout(self) -> float:
+        """Per-call timeout in seconds derived from observed p99 latency."""
+        p99 = self._latency.percentile(0.99, min_samples=self.min_calls)
+        if p99 is None:
+            return self.default_timeout
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.timeout_multiplier))
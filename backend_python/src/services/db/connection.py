@@ -1,18 +1,52 @@
 """Database connection and management."""
 import sqlite3
 import os
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Optional
-import sys
-from pathlib import Path
-
-# Add src to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from config import config
+from services.db.history import HISTORY_DDL, history_store
+from services.db.partitioning import Partitions
+from services.db.result_set import ResultSet
+from services.db.snapshots import Snapshot, SnapshotStore
 from services.logging.logger import logger_instance as logger
 
 
+# inventory_items schema; also created in every shard file in partitioned mode
+INVENTORY_ITEMS_DDL = (
+    '''
+    CREATE TABLE IF NOT EXISTS inventory_items (
+        id TEXT PRIMARY KEY,
+        sku TEXT NOT NULL,
+        name TEXT NOT NULL,
+        category_id TEXT,
+        location_id TEXT,
+        current_stock INTEGER DEFAULT 0,
+        reorder_threshold INTEGER DEFAULT 0,
+        recent_sales_volume INTEGER DEFAULT 0,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_inventory_items_category ON inventory_items(category_id)',
+    'CREATE INDEX IF NOT EXISTS idx_inventory_items_location ON inventory_items(location_id)',
+    'CREATE INDEX IF NOT EXISTS idx_inventory_items_stock ON inventory_items(current_stock)',
+    'CREATE INDEX IF NOT EXISTS idx_inventory_items_sales ON inventory_items(recent_sales_volume)',
+    'CREATE INDEX IF NOT EXISTS idx_inventory_items_updated ON inventory_items(updated_at)',
+    # Keep updated_at current on every update so incremental refreshes
+    # (rows changed since the last run) cannot miss a change
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_inventory_items_touch
+    AFTER UPDATE ON inventory_items
+    FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+    BEGIN
+        UPDATE inventory_items SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+    END
+    ''',
+)
+
+
 class Database:
     """SQLite database connection manager."""
     
@@ -20,6 +54,12 @@ class Database:
         """Initialize database connection."""
         self.db_path = db_path or config.DB_PATH
         self.conn: Optional[sqlite3.Connection] = None
+        # Sharded inventory_items (PARTITION_MODE); None for a single file
+        self.partitions = Partitions.from_config(self.db_path)
+        # Immutable published copies for reads (SNAPSHOT_ENABLED); None otherwise
+        self.snapshots = SnapshotStore.from_config(self.db_path)
+        if self.partitions is not None and self.snapshots is not None:
+            raise ValueError('SNAPSHOT_ENABLED cannot be combined with PARTITION_MODE')
         self._ensure_db_path()
     
     def _ensure_db_path(self):
@@ -36,26 +76,55 @@ class Database:
             self._initialize_schema()
         return self.conn
     
+    def connect_read_only(self) -> sqlite3.Connection:
+        """Open a new read-only connection to the database file.
+        
+        Used for validation and speculative reads that must never write.
+        In-memory databases cannot be reopened, so the primary connection
+        is returned for them. In snapshot mode the connection reads the
+        newest published snapshot.
+        """
+        if self.db_path == ':memory:':
+            return self.connect()
+        self.connect()  # Ensure schema exists before opening read-only
+        snapshot = self.snapshots.current() if self.snapshots is not None else None
+        if snapshot is not None:
+            return self.snapshots.open(snapshot)
+        conn = sqlite3.connect(f'file:{Path(self.db_path).resolve()}?mode=ro', uri=True,
+                               check_same_thread=False)
+        if self.partitions is not None:
+            # Temp view first: query_only also rejects temp schema changes
+            self.partitions.attach(conn)
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+    
+    def read_connection(self) -> sqlite3.Connection:
+        """Connection for inventory reads.
+        
+        In snapshot mode this is the calling thread's connection to the newest
+        published snapshot (the primary connection until one exists).
+        """
+        if self.snapshots is not None:
+            current = self.snapshots.connection()
+            if current is not None:
+                return current[0]
+        return self.connect()
+    
+    def publish_snapshot(self) -> Optional[Snapshot]:
+        """Publish a snapshot if the data changed since the last one (snapshot mode only)."""
+        if self.snapshots is None:
+            return None
+        self.connect()  # Snapshot the initialized, seeded schema
+        return self.snapshots.publish_if_changed(self.db_path)
+    
     def _initialize_schema(self):
         """Initialize database schema and sample data."""
         try:
             cursor = self.conn.cursor()
             
-            # Create inventory_items table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS inventory_items (
-                    id TEXT PRIMARY KEY,
-                    sku TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    category_id TEXT,
-                    location_id TEXT,
-                    current_stock INTEGER DEFAULT 0,
-                    reorder_threshold INTEGER DEFAULT 0,
-                    recent_sales_volume INTEGER DEFAULT 0,
-                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
+            # Create inventory_items table, its indexes and triggers
+            for statement in INVENTORY_ITEMS_DDL:
+                cursor.execute(statement)
             
             # Create product_categories table
             cursor.execute('''
@@ -76,29 +145,36 @@ class Database:
                 )
             ''')
             
-            # Create indexes
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_inventory_items_category 
-                ON inventory_items(category_id)
-            ''')
+            # Create saved_queries table (named final SQL, refreshed in the background)
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_inventory_items_location 
-                ON inventory_items(location_id)
-            ''')
-            cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_inventory_items_stock 
-                ON inventory_items(current_stock)
+                CREATE TABLE IF NOT EXISTS saved_queries (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    natural_language_query TEXT NOT NULL,
+                    final_query TEXT NOT NULL,
+                    query_params TEXT NOT NULL DEFAULT '[]',
+                    refresh_interval_seconds INTEGER NOT NULL,
+                    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+                )
             ''')
             cursor.execute('''
-                CREATE INDEX IF NOT EXISTS idx_inventory_items_sales 
-                ON inventory_items(recent_sales_volume)
+                CREATE INDEX IF NOT EXISTS idx_saved_queries_user 
+                ON saved_queries(user_id)
             ''')
             
+            # Create the daily stock/sales history and its weekly/monthly rollups
+            for statement in HISTORY_DDL:
+                cursor.execute(statement)
+            
             self.conn.commit()
             
             # Check if data exists
             cursor.execute('SELECT COUNT(*) as count FROM inventory_items')
             count = cursor.fetchone()['count']
+            if self.partitions is not None:
+                count += self.partitions.existing_item_count()
             
             if count == 0:
                 logger.info('Inserting sample data into database')
@@ -106,6 +182,10 @@ class Database:
                 self.conn.commit()
                 logger.info('Sample data inserted successfully')
             
+            # Shard files are attached last; rows seeded above move into them
+            if self.partitions is not None:
+                self.partitions.setup(self.conn, INVENTORY_ITEMS_DDL)
+            
             logger.info('Database schema initialized', {'path': self.db_path})
             
         except Exception as e:
@@ -155,6 +235,9 @@ class Database:
                VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
             items
         )
+        
+        # Insert six months of daily history consistent with the items above
+        history_store.record(cursor.connection, history_store.sample_rows(items))
     
     def query(self, sql: str, params: Optional[List[Any]] = None) -> Dict[str, Any]:
         """Execute a query and return results."""
@@ -186,6 +269,31 @@ class Database:
             })
             raise
     
+    def query_result_set(self, sql: str, params: Optional[List[Any]] = None) -> ResultSet:
+        """Execute a query and return a compact inventory result set.
+        
+        Rows are read as plain tuples (no ``sqlite3.Row`` or ``dict`` copies).
+        """
+        try:
+            cursor = self.read_connection().cursor()
+            cursor.row_factory = None
+            
+            sqlite_sql = self._convert_to_sqlite(sql)
+            
+            if params:
+                cursor.execute(sqlite_sql, params)
+            else:
+                cursor.execute(sqlite_sql)
+            
+            return ResultSet.from_cursor(cursor)
+            
+        except Exception as e:
+            logger.error('Query execution failed', {
+                'error': str(e),
+                'sql': sql[:200] if len(sql) > 200 else sql
+            })
+            raise
+    
     def _convert_to_sqlite(self, sql: str) -> str:
         """Convert PostgreSQL-style SQL to SQLite-compatible SQL."""
         sqlite_sql = sql
@@ -199,6 +307,25 @@ class Database:
         
         return sqlite_sql
     
+    def data_version(self) -> str:
+        """Return a token that changes whenever the database contents change.
+        
+        Combines SQLite's ``PRAGMA data_version`` (commits from other
+        connections) with ``total_changes`` (writes on this connection). In
+        partitioned mode every shard's data version is included; in snapshot
+        mode the token names the snapshot reads currently see.
+        """
+        if self.conn is None:
+            self.connect()
+        if self.snapshots is not None:
+            snapshot = self.snapshots.current()
+            if snapshot is not None:
+                return snapshot.version
+        version = self.conn.execute('PRAGMA data_version').fetchone()[0]
+        if self.partitions is not None:
+            version = '.'.join(str(v) for v in [version, *self.partitions.data_versions(self.conn)])
+        return f'{version}.{self.conn.total_changes}'
+    
     def test_connection(self) -> bool:
         """Test database connection."""
         try:
@@ -221,14 +348,22 @@ class Database:
 
 # Global database instance
 _db_instance: Optional[Database] = None
+_db_lock = threading.Lock()
 
 
 def get_database() -> Database:
-    """Get or create database instance."""
+    """Get or create database instance.
+    
+    Safe to call from the startup thread and request handlers concurrently;
+    schema creation and seeding run exactly once.
+    """
     global _db_instance
     if _db_instance is None:
-        _db_instance = Database()
-        _db_instance.connect()
+        with _db_lock:
+            if _db_instance is None:
+                db = Database()
+                db.connect()
+                _db_instance = db
     return _db_instance
 
 
@@ -238,6 +373,18 @@ def query(sql: str, params: Optional[List[Any]] = None) -> Dict[str, Any]:
     return db.query(sql, params)
 
 
+def query_result_set(sql: str, params: Optional[List[Any]] = None) -> ResultSet:
+    """Execute a query using the global database instance, returning a ResultSet."""
+    db = get_database()
+    return db.query_result_set(sql, params)
+
+
+def data_version() -> str:
+    """Return the data version token of the global database instance."""
+    db = get_database()
+    return db.data_version()
+
+
 def test_connection() -> bool:
     """Test database connection."""
     db = get_database()
@@ -0,0 +1,274 @@
+"""Daily stock and sales history per item, with weekly and monthly rollups.
+
+Each grain is a ``WITHOUT ROWID`` table clustered by ``(item_id, period)``,
+so "this item over the last N days" is one bounded range scan of adjacent
+rows. Periods are integers: days since 1970-01-01 (UTC), the epoch day of a
+week's Monday, and ``yyyymm`` for months.
+
+Daily rows are recorded (upserted) per item and day; every record
+recomputes the weeks and months it touches. Retention downsamples: daily
+rows are kept for ``HISTORY_DAILY_RETENTION_DAYS`` and weekly rows for
+``HISTORY_WEEKLY_RETENTION_DAYS``, after which only the coarser rollups
+remain. Monthly rows are kept indefinitely.
+
+Only the startup seed records history: nothing in this app changes stock
+or sales. Whatever writes ``inventory_items.current_stock`` or sales (an
+import job, a point-of-sale feed) must also call ``history_store.record``
+for the days it changes, or the history tables stop at the seed.
+"""
+import datetime
+import random
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from config import config
+from services.logging.logger import logger_instance as logger
+from services.metrics.registry import metrics
+
+DAY = 'day'
+WEEK = 'week'
+MONTH = 'month'
+
+EPOCH = datetime.date(1970, 1, 1)
+
+HISTORY_DDL = (
+    '''
+    CREATE TABLE IF NOT EXISTS inventory_history_daily (
+        item_id TEXT NOT NULL,
+        day INTEGER NOT NULL,
+        units_sold INTEGER NOT NULL DEFAULT 0,
+        closing_stock INTEGER,
+        PRIMARY KEY (item_id, day)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS inventory_history_weekly (
+        item_id TEXT NOT NULL,
+        week INTEGER NOT NULL,
+        units_sold INTEGER NOT NULL DEFAULT 0,
+        closing_stock INTEGER,
+        days INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (item_id, week)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS inventory_history_monthly (
+        item_id TEXT NOT NULL,
+        month INTEGER NOT NULL,
+        units_sold INTEGER NOT NULL DEFAULT 0,
+        closing_stock INTEGER,
+        days INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (item_id, month)
+    ) WITHOUT ROWID
+    ''',
+)
+
+
+class Grain:
+    """One history table and the SQL to bound and label its periods."""
+
+    def __init__(self, name: str, table: str, column: str, bound: str, label: str):
+        self.name = name
+        self.table = table
+        self.column = column
+        # SQL for the last period before a range that starts datetime('now', ?) ago
+        self.bound = bound
+        # SQL turning ``{period}`` into a readable label
+        self.label = label
+
+    def since(self, alias: str) -> str:
+        """``alias.period > <last period before the range>``; binds one datetime modifier.
+
+        ``-30 days`` covers today and the 29 days before it, ``-12 months``
+        this month and the 11 before it.
+        """
+        return f'{alias}.{self.column} > {self.bound}'
+
+    def label_of(self, alias: str) -> str:
+        return self.label.format(period=f'{alias}.{self.column}')
+
+
+_TODAY_DAY = "CAST(julianday('now', ?) - 2440587.5 AS INTEGER)"
+
+GRAINS: Dict[str, Grain] = {
+    DAY: Grain(
+        DAY, 'inventory_history_daily', 'day', _TODAY_DAY,
+        "date({period} * 86400, 'unixepoch')",
+    ),
+    WEEK: Grain(
+        # A week overlaps the range if it starts at most six days before its first day
+        WEEK, 'inventory_history_weekly', 'week', f'{_TODAY_DAY} - 6',
+        "date({period} * 86400, 'unixepoch')",
+    ),
+    MONTH: Grain(
+        MONTH, 'inventory_history_monthly', 'month', "CAST(strftime('%Y%m', 'now', ?) AS INTEGER)",
+        "printf('%04d-%02d', {period} / 100, {period} % 100)",
+    ),
+}
+
+
+def epoch_day(day: Union[datetime.date, int]) -> int:
+    """Days since 1970-01-01 for a date (integers pass through)."""
+    if isinstance(day, int):
+        return day
+    if isinstance(day, datetime.datetime):
+        day = day.date()
+    return (day - EPOCH).days
+
+
+def week_of(day: int) -> int:
+    """Epoch day of the Monday starting ``day``'s week (1970-01-01 was a Thursday)."""
+    return day - (day + 3) % 7
+
+
+def month_of(day: int) -> int:
+    date = EPOCH + datetime.timedelta(days=day)
+    return date.year * 100 + date.month
+
+
+def month_start(day: int) -> int:
+    date = EPOCH + datetime.timedelta(days=day)
+    return epoch_day(date.replace(day=1))
+
+
+def grain_for(days: int) -> Grain:
+    """Finest grain still retained for a range reaching ``days`` back."""
+    if days <= config.HISTORY_DAILY_RETENTION_DAYS:
+        return GRAINS[DAY]
+    if days <= config.HISTORY_WEEKLY_RETENTION_DAYS:
+        return GRAINS[WEEK]
+    return GRAINS[MONTH]
+
+
+class HistoryStore:
+    """Record daily history rows and keep the rollups and retention in step."""
+
+    def __init__(self, daily_retention_days: int, weekly_retention_days: int):
+        self.daily_retention_days = daily_retention_days
+        self.weekly_retention_days = weekly_retention_days
+        self._downsampled_on: Optional[int] = None
+
+    def today(self) -> int:
+        return epoch_day(datetime.datetime.now(datetime.timezone.utc).date())
+
+    def record_cutoff(self, today: int) -> int:
+        """First day that may still be recorded.
+
+        Months before it have lost daily rows to retention, so their rollups
+        can no longer be recomputed and are final.
+        """
+        return month_start(today - self.daily_retention_days)
+
+    def record(self, conn: sqlite3.Connection,
+               rows: Iterable[Tuple[str, Union[datetime.date, int], int, Optional[int]]]) -> int:
+        """Upsert ``(item_id, day, units_sold, closing_stock)`` rows and refresh their rollups.
+
+        Raises ValueError for days older than ``record_cutoff``. The first
+        record of a day also applies retention. Does not commit.
+        """
+        today = self.today()
+        cutoff = self.record_cutoff(today)
+        daily: List[Tuple[str, int, int, Optional[int]]] = []
+        since: Dict[str, int] = {}
+        for item_id, day, units_sold, closing_stock in rows:
+            day = epoch_day(day)
+            if day < cutoff:
+                raise ValueError(f'Day {EPOCH + datetime.timedelta(days=day)} is past history retention')
+            daily.append((item_id, day, units_sold, closing_stock))
+            since[item_id] = min(since.get(item_id, day), day)
+        if not daily:
+            return 0
+        conn.executemany(
+            'INSERT OR REPLACE INTO inventory_history_daily (item_id, day, units_sold, closing_stock) '
+            'VALUES (?, ?, ?, ?)',
+            daily
+        )
+        for item_id, first_day in since.items():
+            self._rollup(conn, item_id, first_day)
+        if self._downsampled_on != today:
+            self.downsample(conn, today)
+            self._downsampled_on = today
+        metrics.increment('history.recordedDays', len(daily))
+        return len(daily)
+
+    def _rollup(self, conn: sqlite3.Connection, item_id: str, first_day: int) -> None:
+        """Recompute the weeks and months of ``item_id`` from ``first_day``'s on."""
+        # closing_stock is a bare column next to MAX(day): SQLite takes it from the latest day
+        conn.execute(
+            '''
+            INSERT OR REPLACE INTO inventory_history_weekly (item_id, week, units_sold, closing_stock, days)
+            SELECT item_id, week, units_sold, closing_stock, days FROM (
+                SELECT item_id, day - (day + 3) % 7 AS week, SUM(units_sold) AS units_sold,
+                       closing_stock, COUNT(*) AS days, MAX(day)
+                FROM inventory_history_daily
+                WHERE item_id = ? AND day >= ?
+                GROUP BY week
+            )
+            ''',
+            (item_id, week_of(first_day))
+        )
+        conn.execute(
+            '''
+            INSERT OR REPLACE INTO inventory_history_monthly (item_id, month, units_sold, closing_stock, days)
+            SELECT item_id, month, units_sold, closing_stock, days FROM (
+                SELECT item_id, CAST(strftime('%Y%m', day * 86400, 'unixepoch') AS INTEGER) AS month,
+                       SUM(units_sold) AS units_sold, closing_stock, COUNT(*) AS days, MAX(day)
+                FROM inventory_history_daily
+                WHERE item_id = ? AND day >= ?
+                GROUP BY month
+            )
+            ''',
+            (item_id, month_start(first_day))
+        )
+
+    def downsample(self, conn: sqlite3.Connection, today: Optional[int] = None) -> Dict[str, int]:
+        """Drop daily and weekly rows past retention (their rollups stay). Does not commit."""
+        today = self.today() if today is None else today
+        # Keep the whole week around the record cutoff so that week can still be recomputed
+        daily_cutoff = week_of(self.record_cutoff(today))
+        weekly_cutoff = week_of(today - self.weekly_retention_days)
+        removed = {
+            'daily': conn.execute(
+                'DELETE FROM inventory_history_daily WHERE day < ?', (daily_cutoff,)
+            ).rowcount,
+            'weekly': conn.execute(
+                'DELETE FROM inventory_history_weekly WHERE week < ?', (weekly_cutoff,)
+            ).rowcount,
+        }
+        if any(removed.values()):
+            logger.info('Inventory history downsampled', {
+                'dailyRowsRemoved': removed['daily'],
+                'weeklyRowsRemoved': removed['weekly'],
+            })
+        return removed
+
+    def sample_rows(self, items: Sequence[Sequence[Any]], days: int = 180) -> List[Tuple[str, int, int, int]]:
+        """Plausible daily history ending today for sample ``inventory_items`` rows.
+
+        ``items`` are ``(id, sku, name, category_id, location_id, current_stock,
+        reorder_threshold, recent_sales_volume)``; the last 30 days of sales
+        add up to about ``recent_sales_volume`` and the last closing stock is
+        ``current_stock``.
+        """
+        today = self.today()
+        rows = []
+        for item_id, _, _, _, _, current_stock, threshold, recent_sales in items:
+            rng = random.Random(item_id)
+            mean = recent_sales / 30
+            stock = current_stock
+            series = []
+            # Walk backwards from today's stock: yesterday's close = today's close + sold - received
+            for offset in range(days):
+                day = today - offset
+                weekday_factor = 1.3 if (day + 3) % 7 >= 5 else 0.9
+                sold = max(0, round(rng.gauss(mean * weekday_factor, mean * 0.3)))
+                series.append((item_id, day, sold, stock))
+                stock += sold
+                if stock > max(threshold, 1) * 4 + current_stock:
+                    stock -= max(threshold, 1) * 3
+            rows.extend(reversed(series))
+        return rows
+
+
+# Global instance
+history_store = HistoryStore(config.HISTORY_DAILY_RETENTION_DAYS, config.HISTORY_WEEKLY_RETENTION_DAYS)
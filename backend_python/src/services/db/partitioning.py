@@ -0,0 +1,213 @@
+"""Partitioned storage: ``inventory_items`` sharded into several SQLite files.
+
+With ``PARTITION_MODE=location`` every location gets its own shard file
+(plus an ``other`` shard for items without a known location); with
+``PARTITION_MODE=hash`` items are spread over ``PARTITION_COUNT`` files by a
+hash of their id. Dimension tables (categories, locations, saved queries)
+stay in the main database file.
+
+On a connection, ``attach`` ATTACHes the shards and shadows
+``inventory_items`` with a TEMP view over all of them, so existing read SQL
+keeps working unchanged. The view is read-only: writers address the owning
+shard's table (``Partitions.table_for``). Separate shard files mean separate
+write locks, so ingest into different shards does not serialize.
+"""
+import glob
+import os
+import re
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Sequence, Set
+
+from config import config
+from services.logging.logger import logger_instance as logger
+
+LOCATION = 'location'
+HASH = 'hash'
+OTHER_SHARD = 'other'
+
+ITEM_COLUMNS = (
+    'id', 'sku', 'name', 'category_id', 'location_id', 'current_stock',
+    'reorder_threshold', 'recent_sales_volume', 'created_at', 'updated_at',
+)
+
+
+def _file_key(key: str) -> str:
+    return re.sub(r'[^A-Za-z0-9_-]', '_', key)
+
+
+class PartitionLayout:
+    """Shard keys, files and the routing function of one partitioned database."""
+
+    def __init__(self, mode: str, directory: str, keys: Sequence[str]):
+        self.mode = mode
+        self.directory = directory
+        self.keys = list(keys)
+        self._index = {key: index for index, key in enumerate(self.keys)}
+
+    @classmethod
+    def build(cls, mode: str, directory: str, location_ids: Iterable[str],
+              count: int) -> 'PartitionLayout':
+        """Layout for ``mode``; location shards also cover existing shard files."""
+        if mode == HASH:
+            existing = {cls._key_of(path) for path in glob.glob(os.path.join(directory, 'items_*.db'))}
+            keys = [f'hash{index}of{count}' for index in range(count)]
+            stale = existing - set(keys)
+            if stale:
+                raise RuntimeError(
+                    f'Shard files {sorted(stale)} do not match PARTITION_COUNT={count}; '
+                    'repartition the data or restore the previous count'
+                )
+            return cls(mode, directory, keys)
+        existing = {cls._key_of(path) for path in glob.glob(os.path.join(directory, 'items_*.db'))}
+        known = {_file_key(location_id): location_id for location_id in location_ids}
+        keys = sorted(set(known.values()) | {key for key in existing if key != OTHER_SHARD and key not in known})
+        return cls(mode, directory, keys + [OTHER_SHARD])
+
+    @staticmethod
+    def _key_of(path: str) -> str:
+        return os.path.basename(path)[len('items_'):-len('.db')]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.directory, f'items_{_file_key(self.keys[index])}.db')
+
+    def schema(self, index: int) -> str:
+        """Schema name of shard ``index`` on attached connections."""
+        return f'shard_{index}'
+
+    def shard_for(self, item_id: Any, location_id: Any) -> int:
+        """Shard index owning an item."""
+        if self.mode == HASH:
+            return zlib.crc32(str(item_id).encode('utf-8')) % len(self.keys)
+        return self._index.get(location_id, len(self.keys) - 1)
+
+    def shards_for_locations(self, location_ids: Iterable[Any]) -> Set[int]:
+        """Shards holding items of these locations (location mode only)."""
+        return {self._index.get(location_id, len(self.keys) - 1) for location_id in location_ids}
+
+
+class Partitions:
+    """Create, attach and maintain the shard files of the main database."""
+
+    def __init__(self, db_path: str, mode: str, directory: str, count: int):
+        self.db_path = db_path
+        self.mode = mode
+        self.directory = directory
+        self.count = count
+        self.layout: Optional[PartitionLayout] = None
+
+    @classmethod
+    def from_config(cls, db_path: str) -> Optional['Partitions']:
+        """Partitions configured by ``PARTITION_*``, or None when disabled."""
+        mode = config.PARTITION_MODE.lower()
+        if mode in ('', 'off', 'none'):
+            return None
+        if mode not in (LOCATION, HASH):
+            raise ValueError(f'Unknown PARTITION_MODE "{config.PARTITION_MODE}" (use location or hash)')
+        if db_path == ':memory:':
+            logger.warn('Partitioning is not available for in-memory databases')
+            return None
+        directory = config.PARTITION_DIR or f'{os.path.splitext(db_path)[0]}_shards'
+        return cls(db_path, mode, directory, config.PARTITION_COUNT)
+
+    def existing_item_count(self) -> int:
+        """Items already stored in shard files (before they are attached)."""
+        total = 0
+        for path in glob.glob(os.path.join(self.directory, 'items_*.db')):
+            conn = sqlite3.connect(f'file:{Path(path).resolve()}?mode=ro', uri=True)
+            try:
+                total += conn.execute('SELECT COUNT(*) FROM inventory_items').fetchone()[0]
+            except sqlite3.OperationalError:
+                pass  # Created but never initialized
+            finally:
+                conn.close()
+        return total
+
+    def setup(self, conn: sqlite3.Connection, item_ddl: Sequence[str]) -> None:
+        """Create the shard files, attach them to ``conn`` and move unsharded rows in."""
+        os.makedirs(self.directory, exist_ok=True)
+        location_ids = [row[0] for row in conn.execute('SELECT id FROM locations ORDER BY id')]
+        self.layout = PartitionLayout.build(self.mode, self.directory, location_ids, self.count)
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(self.layout) > limit:
+            raise RuntimeError(
+                f'{len(self.layout)} shards exceed the SQLite limit of {limit} attached databases; '
+                'use PARTITION_MODE=hash with a smaller PARTITION_COUNT'
+            )
+        for index in range(len(self.layout)):
+            shard = sqlite3.connect(self.layout.path(index))
+            try:
+                for statement in item_ddl:
+                    shard.execute(statement)
+                shard.commit()
+            finally:
+                shard.close()
+
+        self.attach(conn, writable=True)
+        moved = conn.execute('SELECT COUNT(*) FROM main.inventory_items').fetchone()[0]
+        if moved:
+            # Rows stored before partitioning was enabled (or just seeded)
+            columns = ', '.join(ITEM_COLUMNS)
+            for index in range(len(self.layout)):
+                conn.execute(
+                    f'INSERT OR IGNORE INTO {self.layout.schema(index)}.inventory_items ({columns}) '
+                    f'SELECT {columns} FROM main.inventory_items WHERE shard_for(id, location_id) = ?',
+                    (index,)
+                )
+            conn.execute('DELETE FROM main.inventory_items')
+        rebalanced = self._rebalance(conn)
+        conn.commit()
+        logger.info('Partitioned storage attached', {
+            'mode': self.mode,
+            'shards': len(self.layout),
+            'directory': self.directory,
+            'movedRows': moved,
+            'rebalancedRows': rebalanced,
+        })
+
+    def _rebalance(self, conn: sqlite3.Connection) -> int:
+        """Move rows of the ``other`` shard whose location now has its own shard."""
+        if self.layout.mode != LOCATION:
+            return 0
+        other = self.layout.schema(len(self.layout) - 1)
+        columns = ', '.join(ITEM_COLUMNS)
+        moved = 0
+        for index, location_id in enumerate(self.layout.keys[:-1]):
+            schema = self.layout.schema(index)
+            cursor = conn.execute(
+                f'INSERT OR IGNORE INTO {schema}.inventory_items ({columns}) '
+                f'SELECT {columns} FROM {other}.inventory_items WHERE location_id = ?', (location_id,)
+            )
+            moved += max(cursor.rowcount, 0)
+            conn.execute(f'DELETE FROM {other}.inventory_items WHERE location_id = ?', (location_id,))
+        return moved
+
+    def attach(self, conn: sqlite3.Connection, writable: bool = False) -> None:
+        """ATTACH every shard to ``conn`` and shadow ``inventory_items`` with a view over them."""
+        layout = self.layout
+        for index in range(len(layout)):
+            path = Path(layout.path(index)).resolve()
+            uri = f'file:{path}' if writable else f'file:{path}?mode=ro'
+            conn.execute(f"ATTACH DATABASE '{uri}' AS {layout.schema(index)}")
+        conn.create_function('shard_for', 2, layout.shard_for, deterministic=True)
+        conn.execute(
+            'CREATE TEMP VIEW IF NOT EXISTS inventory_items AS '
+            + ' UNION ALL '.join(
+                f'SELECT * FROM {layout.schema(index)}.inventory_items' for index in range(len(layout))
+            )
+        )
+
+    def table_for(self, item_id: Any, location_id: Any) -> str:
+        """Qualified table owning an item, for writers on an attached connection."""
+        return f'{self.layout.schema(self.layout.shard_for(item_id, location_id))}.inventory_items'
+
+    def data_versions(self, conn: sqlite3.Connection) -> List[int]:
+        """``PRAGMA data_version`` of every attached shard."""
+        return [
+            conn.execute(f'PRAGMA {self.layout.schema(index)}.data_version').fetchone()[0]
+            for index in range(len(self.layout))
+        ]
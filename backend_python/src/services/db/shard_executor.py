@@ -0,0 +1,732 @@
+"""Parallel execution of inventory reads over partitioned storage.
+
+The attached view (``Partitions.attach``) answers any query, but one
+connection scans the shards one after another. For the query shapes the
+pipeline produces, ``ShardExecutor.plan`` instead rewrites the SELECT into a
+per-shard query that a worker pool runs against every shard file at once:
+
+* a top-level ``location_id = ?`` / ``IN (...)`` filter (``id`` in hash
+  mode) prunes the shards to scan; a single shard runs the SQL unchanged;
+* ``ORDER BY ... LIMIT n`` keeps its sort and limit in every shard and the
+  sorted shard results are k-way merged, so at most ``n`` rows per shard move;
+* ``COUNT``/``SUM``/``TOTAL``/``MIN``/``MAX``/``AVG`` (optionally inside
+  ``ROUND``) are computed per shard and group, then combined: AVG travels as
+  a SUM and COUNT pair.
+
+Anything else (subqueries over items, HAVING, OFFSET, window functions,
+compound selects, ...) gets no plan and runs on the attached view.
+"""
+import asyncio
+import functools
+import heapq
+import math
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from config import config
+from services.db.partitioning import HASH, LOCATION, PartitionLayout
+from services.db.result_set import ResultSet
+from services.metrics.registry import metrics
+
+_TOKEN = re.compile(r"""
+    '(?:[^']|'')*'              # string literal
+  | "(?:[^"]|"")*"              # quoted identifiers
+  | `[^`]*`
+  | \[[^\]]*\]
+  | --[^\n]*                    # comments
+  | /\*.*?\*/
+  | \?\d+ | [:@$]\w+            # numbered or named parameters
+  | \d+(?:\.\d*)?(?:[eE][+-]?\d+)? | \.\d+
+  | \w+
+  | <=|>=|<>|!=|==|\|\|
+  | \S
+""", re.VERBOSE | re.DOTALL)
+
+_CLAUSES = ('FROM', 'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT')
+# Never planned: the attached view handles these
+_UNSUPPORTED = frozenset({
+    'UNION', 'INTERSECT', 'EXCEPT', 'WITH', 'OFFSET', 'OVER', 'WINDOW', 'HAVING',
+    'COLLATE', 'NULLS', 'RIGHT', 'FULL', 'VALUES', 'RECURSIVE',
+})
+_JOIN_WORDS = frozenset({
+    'WHERE', 'JOIN', 'LEFT', 'INNER', 'CROSS', 'NATURAL', 'OUTER', 'ON', 'USING',
+    'GROUP', 'ORDER', 'LIMIT', 'INDEXED', 'NOT',
+})
+_AGGREGATES = frozenset({'COUNT', 'SUM', 'TOTAL', 'MIN', 'MAX', 'AVG'})
+_ANY_AGGREGATE = re.compile(r'\b(?:COUNT|SUM|TOTAL|MIN|MAX|AVG|GROUP_CONCAT)\s*\(', re.IGNORECASE)
+_AGGREGATE_CALL = re.compile(r'^(\w+)\s*\((.*)\)$', re.DOTALL)
+_ROUND_CALL = re.compile(r'^ROUND\s*\((.*),\s*(\d+)\s*\)$', re.DOTALL | re.IGNORECASE)
+
+
+class _Token:
+    __slots__ = ('text', 'upper', 'start', 'end', 'depth')
+
+    def __init__(self, text: str, start: int, end: int, depth: int):
+        self.text = text
+        self.upper = text.upper()
+        self.start = start
+        self.end = end
+        self.depth = depth
+
+
+class _Unplannable(Exception):
+    """The query shape is not supported by the parallel path."""
+
+
+def _tokenize(sql: str) -> List[_Token]:
+    tokens = []
+    depth = 0
+    for match in _TOKEN.finditer(sql):
+        text = match.group()
+        if text.startswith('--') or text.startswith('/*'):
+            continue
+        if text == ')':
+            depth -= 1
+        tokens.append(_Token(text, match.start(), match.end(), depth))
+        if text == '(':
+            depth += 1
+    return tokens
+
+
+def _outer_aggregate(text: str) -> bool:
+    """Whether ``text`` calls an aggregate outside its parenthesized subqueries."""
+    tokens = _tokenize(text)
+    masked = list(text)
+    for index, token in enumerate(tokens[:-1]):
+        if token.text == '(' and tokens[index + 1].upper == 'SELECT':
+            end = next((t.start for t in tokens[index + 1:] if t.text == ')' and t.depth == token.depth),
+                       len(text))
+            masked[token.end:end] = ' ' * (end - token.end)
+    return bool(_ANY_AGGREGATE.search(''.join(masked)))
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(token.upper for token in _tokenize(text))
+
+
+def _unquote(name: str) -> str:
+    if name[:1] in ('"', '`', '[') and len(name) > 1:
+        return name[1:-1]
+    return name
+
+
+def _sqlite_round(value: Any, digits: int) -> Optional[float]:
+    """``ROUND`` as SQLite does it (half away from zero)."""
+    if value is None:
+        return None
+    scale = 10 ** digits
+    return math.copysign(math.floor(abs(value) * scale + 0.5) / scale, value)
+
+
+def _order_key(value: Any) -> Tuple[int, Any]:
+    """SQLite's cross-type ordering: NULL < numbers < text < blobs."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, bytes(value))
+
+
+def _row_key(terms: Sequence[Tuple[int, bool]]) -> Callable[[Sequence[Any]], Any]:
+    def compare(left: Sequence[Any], right: Sequence[Any]) -> int:
+        for position, descending in terms:
+            a, b = _order_key(left[position]), _order_key(right[position])
+            if a != b:
+                result = -1 if a < b else 1
+                return -result if descending else result
+        return 0
+    return functools.cmp_to_key(compare)
+
+
+class _Fragment:
+    """A span of the original SQL with the positional parameters it binds."""
+    __slots__ = ('text', 'params', 'tokens')
+
+    def __init__(self, text: str, params: List[Any], tokens: List[_Token]):
+        self.text = text
+        self.params = params
+        self.tokens = tokens
+
+
+class _SelectItem:
+    __slots__ = ('fragment', 'expression', 'alias', 'aggregate', 'argument', 'round_digits')
+
+    def __init__(self, fragment: _Fragment):
+        self.fragment = fragment
+        tokens = fragment.tokens
+        self.alias = None
+        end = len(tokens)
+        if len(tokens) >= 3 and tokens[-2].upper == 'AS' and tokens[-2].depth == tokens[0].depth:
+            self.alias = _unquote(tokens[-1].text)
+            end = len(tokens) - 2
+        base = tokens[0].start
+        self.expression = fragment.text[:tokens[end - 1].end - base].strip()
+        self.aggregate: Optional[str] = None
+        self.argument: Optional[str] = None
+        self.round_digits: Optional[int] = None
+
+        expression = self.expression
+        rounded = _ROUND_CALL.match(expression)
+        if rounded and _outer_aggregate(rounded.group(1)):
+            expression = rounded.group(1).strip()
+            self.round_digits = int(rounded.group(2))
+        call = _AGGREGATE_CALL.match(expression)
+        if call and call.group(1).upper() in _AGGREGATES and self._single_call(call.group(2)):
+            argument = call.group(2).strip()
+            if _outer_aggregate(argument) or argument.upper().startswith('DISTINCT'):
+                raise _Unplannable('nested or DISTINCT aggregate')
+            if call.group(1).upper() in ('MIN', 'MAX') and self._has_comma(argument):
+                raise _Unplannable('scalar MIN/MAX')
+            self.aggregate = call.group(1).upper()
+            self.argument = argument
+        elif _outer_aggregate(self.expression):
+            raise _Unplannable('aggregate expression')
+        elif self.round_digits is not None:
+            raise _Unplannable('aggregate expression')
+
+    @staticmethod
+    def _single_call(argument: str) -> bool:
+        depth = 0
+        for token in _tokenize(argument):
+            if token.text == '(':
+                depth += 1
+            elif token.text == ')':
+                depth -= 1
+                if depth < 0:
+                    return False
+        return depth == 0
+
+    @staticmethod
+    def _has_comma(argument: str) -> bool:
+        return any(token.text == ',' and token.depth == 0 for token in _tokenize(argument))
+
+    @property
+    def name(self) -> str:
+        return self.alias or self.expression
+
+
+class _Select:
+    """Top-level clauses of one SELECT statement."""
+
+    def __init__(self, sql: str, params: Sequence[Any]):
+        self.sql = sql
+        self.tokens = _tokenize(sql)
+        if self.tokens and self.tokens[-1].text == ';':
+            self.tokens.pop()
+        tokens = self.tokens
+        if len(tokens) < 2 or tokens[0].upper != 'SELECT':
+            raise _Unplannable('not a SELECT')
+        for token in tokens:
+            if token.upper in _UNSUPPORTED or token.text[0] in ':@$' or token.text[:1] == '?' and len(token.text) > 1:
+                raise _Unplannable(token.upper)
+            if token.depth < 0:
+                raise _Unplannable('unbalanced parentheses')
+        if sum(1 for token in tokens if token.text == '?') != len(params):
+            raise _Unplannable('parameter count mismatch')
+        self._param_index = {}
+        for token in tokens:
+            if token.text == '?':
+                self._param_index[token.start] = len(self._param_index)
+        self.params = list(params)
+
+        position = 1
+        self.distinct = False
+        if tokens[1].upper in ('DISTINCT', 'ALL'):
+            self.distinct = tokens[1].upper == 'DISTINCT'
+            position = 2
+
+        # Clause boundaries at depth 0, in statement order
+        marks: List[Tuple[str, int, int]] = []
+        index = position
+        while index < len(tokens):
+            token = tokens[index]
+            if token.depth == 0 and token.upper in _CLAUSES:
+                if token.upper in ('GROUP', 'ORDER'):
+                    if index + 1 >= len(tokens) or tokens[index + 1].upper != 'BY':
+                        raise _Unplannable('malformed clause')
+                    marks.append((token.upper, index, index + 2))
+                    index += 2
+                    continue
+                marks.append((token.upper, index, index + 1))
+            elif token.depth == 0 and token.upper == 'SELECT':
+                raise _Unplannable('compound select')
+            index += 1
+        names = [mark[0] for mark in marks]
+        if len(set(names)) != len(names) or names != sorted(names, key=_CLAUSES.index) or 'FROM' not in names:
+            raise _Unplannable('clause order')
+
+        self.clauses: Dict[str, List[_Token]] = {}
+        bounds = [(position, marks[0][1])] + [
+            (mark[2], marks[i + 1][1] if i + 1 < len(marks) else len(tokens))
+            for i, mark in enumerate(marks)
+        ]
+        self.items = [_SelectItem(fragment) for fragment in self._split(tokens[bounds[0][0]:bounds[0][1]])]
+        for (name, _, _), (start, end) in zip(marks, bounds[1:]):
+            if start == end:
+                raise _Unplannable('empty clause')
+            self.clauses[name] = tokens[start:end]
+
+        self.group_by = self._split(self.clauses['GROUP']) if 'GROUP' in self.clauses else []
+        self.order_by: List[Tuple[_Fragment, bool]] = []
+        for fragment in self._split(self.clauses.get('ORDER', [])):
+            descending = False
+            if fragment.tokens[-1].upper in ('ASC', 'DESC'):
+                descending = fragment.tokens[-1].upper == 'DESC'
+                fragment = self._fragment(fragment.tokens[:-1])
+            self.order_by.append((fragment, descending))
+        self.limit: Optional[int] = None
+        if 'LIMIT' in self.clauses:
+            limit = self.clauses['LIMIT']
+            if len(limit) != 1:
+                raise _Unplannable('LIMIT expression')
+            value = self.params[self._param_index[limit[0].start]] if limit[0].text == '?' else limit[0].text
+            try:
+                self.limit = int(value)
+            except (TypeError, ValueError):
+                raise _Unplannable('LIMIT value')
+            if self.limit < 0:
+                self.limit = None
+        if any(item.fragment.text.strip().endswith('*') for item in self.items) and self.is_aggregate:
+            raise _Unplannable('star in aggregate')
+
+    @property
+    def is_aggregate(self) -> bool:
+        return bool(self.group_by) or any(item.aggregate for item in self.items)
+
+    def _fragment(self, tokens: List[_Token]) -> _Fragment:
+        if not tokens:
+            raise _Unplannable('empty expression')
+        params = [self.params[self._param_index[token.start]] for token in tokens if token.text == '?']
+        return _Fragment(self.sql[tokens[0].start:tokens[-1].end], params, tokens)
+
+    def _split(self, tokens: List[_Token]) -> List[_Fragment]:
+        parts, current = [], []
+        for token in tokens:
+            if token.text == ',' and token.depth == 0:
+                parts.append(self._fragment(current))
+                current = []
+            else:
+                current.append(token)
+        if tokens:
+            parts.append(self._fragment(current))
+        return parts
+
+    def clause(self, name: str) -> Optional[_Fragment]:
+        tokens = self.clauses.get(name)
+        return self._fragment(tokens) if tokens else None
+
+    def item_position(self, fragment: _Fragment) -> Optional[int]:
+        """Select-list position an ORDER BY/GROUP BY term refers to, if any."""
+        tokens = fragment.tokens
+        if len(tokens) == 1 and tokens[0].text.isdigit():
+            position = int(tokens[0].text) - 1
+            if 0 <= position < len(self.items):
+                return position
+            raise _Unplannable('term out of range')
+        if len(tokens) == 1:
+            name = _unquote(tokens[0].text)
+            for position, item in enumerate(self.items):
+                if item.alias is not None and item.alias.lower() == name.lower():
+                    return position
+        normalized = _normalize(fragment.text)
+        for position, item in enumerate(self.items):
+            if _normalize(item.expression) == normalized:
+                return position
+        return None
+
+    def items_alias(self) -> Optional[str]:
+        """Alias of ``inventory_items``, which must be the first table in FROM.
+
+        Shard results are then disjoint slices of the full result; with items
+        on the right of a LEFT JOIN every shard would repeat unmatched rows.
+        """
+        occurrences = [token for token in self.tokens if token.upper == 'INVENTORY_ITEMS']
+        from_tokens = self.clauses['FROM']
+        if len(occurrences) != 1 or from_tokens[0].upper != 'INVENTORY_ITEMS':
+            raise _Unplannable('inventory_items must be the leading table')
+        rest = from_tokens[1:]
+        if rest and rest[0].upper == 'AS':
+            rest = rest[1:]
+        if rest and re.match(r'^\w+$', rest[0].text) and rest[0].upper not in _JOIN_WORDS:
+            return rest[0].text
+        return None
+
+    def where_values(self, column: str, alias: Optional[str]) -> Optional[List[Any]]:
+        """Values a top-level ``[alias.]column = v`` / ``IN (...)`` conjunct restricts to."""
+        where = self.clauses.get('WHERE')
+        if not where:
+            return None
+        base = where[0].depth
+        conjuncts, current, between = [], [], False
+        for token in where:
+            if token.depth == base and token.upper == 'OR':
+                return None
+            if token.depth == base and token.upper == 'BETWEEN':
+                between = True
+            if token.depth == base and token.upper == 'AND' and not between:
+                conjuncts.append(current)
+                current = []
+                continue
+            if token.depth == base and token.upper == 'AND':
+                between = False
+            current.append(token)
+        conjuncts.append(current)
+
+        restricted: Optional[List[Any]] = None
+        for conjunct in conjuncts:
+            values = self._column_values(conjunct, column, alias)
+            if values is not None:
+                restricted = values if restricted is None else [v for v in restricted if v in values]
+        return restricted
+
+    def _column_values(self, tokens: List[_Token], column: str, alias: Optional[str]) -> Optional[List[Any]]:
+        texts = [token.text for token in tokens]
+        if len(texts) >= 3 and texts[1] == '.':
+            if alias is None or texts[0].lower() != alias.lower():
+                return None
+            tokens, texts = tokens[2:], texts[2:]
+        if not texts or _unquote(texts[0]).lower() != column:
+            return None
+        if len(texts) == 3 and texts[1] in ('=', '=='):
+            value = self._literal(tokens[2])
+            return None if value is _Unplannable else [value]
+        if len(texts) >= 4 and texts[1].upper() == 'IN' and texts[2] == '(' and texts[-1] == ')':
+            values = []
+            for index, token in enumerate(tokens[3:-1]):
+                if index % 2 == 1:
+                    if token.text != ',':
+                        return None
+                    continue
+                value = self._literal(token)
+                if value is _Unplannable:
+                    return None
+                values.append(value)
+            return values
+        return None
+
+    def _literal(self, token: _Token) -> Any:
+        if token.text == '?':
+            return self.params[self._param_index[token.start]]
+        if token.text.startswith("'"):
+            return token.text[1:-1].replace("''", "'")
+        return _Unplannable
+
+
+class ShardPlan:
+    """Shards to scan, the SQL each runs and how their rows combine."""
+    __slots__ = ('shards', 'sql', 'params', 'merge', 'columns', 'hidden')
+
+    def __init__(self, shards: List[int], sql: str, params: List[Any],
+                 merge: Optional[Callable[[List[List[Tuple]]], List[Tuple]]] = None,
+                 columns: Optional[List[Any]] = None, hidden: int = 0):
+        self.shards = shards
+        self.sql = sql
+        self.params = params
+        # None when a single shard runs the SQL unchanged
+        self.merge = merge
+        # Output names when they differ from the shard query's (an int takes
+        # that shard column's name); else its names minus ``hidden``
+        self.columns = columns
+        self.hidden = hidden
+
+
+def _plain_plan(select: _Select) -> ShardPlan:
+    """Per-shard SQL keeping ORDER BY/LIMIT, plus a k-way merge of the sorted shard rows."""
+    hidden: List[_Fragment] = []
+    terms: List[Tuple[Optional[int], bool]] = []
+    for fragment, descending in select.order_by:
+        position = select.item_position(fragment)
+        if position is None or select.items[position].fragment.text.strip().endswith('*'):
+            if select.distinct:
+                raise _Unplannable('DISTINCT with a sort column outside the select list')
+            hidden.append(fragment)
+            terms.append((None, descending))
+        else:
+            terms.append((position, descending))
+
+    texts = [item.fragment.text for item in select.items]
+    params = [param for item in select.items for param in item.fragment.params]
+    for index, fragment in enumerate(hidden):
+        texts.append(f'{fragment.text} AS __s{index}')
+        params.extend(fragment.params)
+    sql, tail = _tail(select, keep_order=True)
+    sql = f"SELECT {'DISTINCT ' if select.distinct else ''}{', '.join(texts)} {sql}"
+    limit = select.limit
+    distinct = select.distinct
+
+    def merge(parts: List[List[Tuple]]) -> List[Tuple]:
+        width = next((len(part[0]) for part in parts if part), 0)
+        visible = width - len(hidden)
+        hidden_index = iter(range(visible, width))
+        positions = [(position if position is not None else next(hidden_index), descending)
+                     for position, descending in terms]
+        rows = heapq.merge(*parts, key=_row_key(positions)) if positions else (
+            row for part in parts for row in part)
+        merged, seen = [], set()
+        for row in rows:
+            if limit is not None and len(merged) >= limit:
+                break
+            row = tuple(row[:visible])
+            if distinct:
+                if row in seen:
+                    continue
+                seen.add(row)
+            merged.append(row)
+        return merged
+
+    return ShardPlan([], sql, params + tail, merge, hidden=len(hidden))
+
+
+def _aggregate_plan(select: _Select) -> ShardPlan:
+    """Per-shard partial aggregates per group, combined and then sorted and limited."""
+    texts: List[str] = []
+    params: List[Any] = []
+    # (kind, first shard column, round digits) per select item
+    layout: List[Tuple[str, int, Optional[int]]] = []
+    for index, item in enumerate(select.items):
+        column = len(texts)
+        if item.aggregate is None:
+            texts.append(item.fragment.text)
+            params.extend(item.fragment.params)
+            layout.append(('FIRST', column, None))
+        elif item.aggregate == 'AVG':
+            texts.append(f'SUM({item.argument}) AS __a{index}')
+            texts.append(f'COUNT({item.argument}) AS __c{index}')
+            # Every placeholder of the item is in its argument, which now appears twice
+            params.extend(item.fragment.params * 2)
+            layout.append(('AVG', column, item.round_digits))
+        else:
+            texts.append(f'{item.aggregate}({item.argument}) AS __a{index}')
+            params.extend(item.fragment.params)
+            layout.append((item.aggregate, column, item.round_digits))
+    group_columns = []
+    group_texts: List[str] = []
+    group_params: List[Any] = []
+    for index, (text, fragment_params) in enumerate(_group_terms(select)):
+        group_columns.append(len(texts))
+        texts.append(f'{text} AS __g{index}')
+        params.extend(fragment_params)
+        group_texts.append(text)
+        group_params.extend(fragment_params)
+
+    # ORDER BY resolves against the combined row: items, then group keys
+    terms: List[Tuple[int, bool]] = []
+    group_normalized = [_normalize(text) for text in group_texts]
+    for fragment, descending in select.order_by:
+        position = select.item_position(fragment)
+        if position is None and _normalize(fragment.text) in group_normalized:
+            position = len(select.items) + group_normalized.index(_normalize(fragment.text))
+        if position is None:
+            raise _Unplannable('ORDER BY term not in the output')
+        terms.append((position, descending))
+
+    sql, tail = _tail(select, keep_order=False, group_by=(', '.join(group_texts), group_params))
+    sql = f"SELECT {', '.join(texts)} {sql}"
+    limit = select.limit
+    visible = len(select.items)
+
+    def combine(parts: List[List[Tuple]]) -> List[Tuple]:
+        groups: Dict[Tuple, List[Any]] = {}
+        for part in parts:
+            for row in part:
+                key = tuple(row[column] for column in group_columns)
+                state = groups.get(key)
+                if state is None:
+                    groups[key] = [
+                        [row[column], row[column + 1]] if kind == 'AVG' else row[column]
+                        for kind, column, _ in layout
+                    ]
+                    continue
+                for index, (kind, column, _) in enumerate(layout):
+                    value = row[column]
+                    current = state[index]
+                    if kind == 'AVG':
+                        if value is not None:
+                            current[0] = value if current[0] is None else current[0] + value
+                        current[1] += row[column + 1]
+                    elif kind == 'FIRST':
+                        if current is None:
+                            state[index] = value
+                    elif value is None:
+                        continue
+                    elif current is None:
+                        state[index] = value
+                    elif kind in ('COUNT', 'SUM', 'TOTAL'):
+                        state[index] = current + value
+                    elif kind == 'MIN':
+                        state[index] = min(current, value, key=_order_key)
+                    elif kind == 'MAX':
+                        state[index] = max(current, value, key=_order_key)
+        rows = []
+        for key, state in groups.items():
+            values = []
+            for (kind, _, digits), value in zip(layout, state):
+                if kind == 'AVG':
+                    value = value[0] / value[1] if value[1] else None
+                if digits is not None:
+                    value = _sqlite_round(value, digits)
+                values.append(value)
+            rows.append(tuple(values) + key)
+        if terms:
+            rows.sort(key=_row_key(terms))
+        if limit is not None:
+            rows = rows[:limit]
+        return [row[:visible] for row in rows]
+
+    # Unaliased non-aggregates keep the name SQLite gives their shard column ("c.name" -> "name")
+    columns = [item.name if item.alias is not None or item.aggregate is not None else column
+               for item, (_, column, _) in zip(select.items, layout)]
+    return ShardPlan([], sql, params + tail, combine, columns=columns)
+
+
+def _group_terms(select: _Select) -> List[Tuple[str, List[Any]]]:
+    """GROUP BY terms as expressions, with the parameters each binds.
+
+    A position (``GROUP BY 1``) or select alias is replaced by the item's
+    expression: copied into the shard select list as ``1 AS __g0`` it would
+    be a constant, and the shard query's own column positions shift when
+    AVG splits into a SUM and COUNT pair.
+    """
+    terms = []
+    for fragment in select.group_by:
+        position = select.item_position(fragment)
+        if position is None:
+            terms.append((fragment.text, fragment.params))
+            continue
+        item = select.items[position]
+        if item.aggregate is not None:
+            raise _Unplannable('GROUP BY an aggregate')
+        if _normalize(fragment.text) == _normalize(item.expression):
+            terms.append((fragment.text, fragment.params))
+        elif len(fragment.tokens) == 1:
+            # Every placeholder of a non-aggregate item is in its expression
+            terms.append((item.expression, item.fragment.params))
+        else:
+            raise _Unplannable('unresolved GROUP BY term')
+    return terms
+
+
+def _tail(select: _Select, keep_order: bool,
+          group_by: Optional[Tuple[str, List[Any]]] = None) -> Tuple[str, List[Any]]:
+    """``FROM ... [WHERE] [GROUP BY] [ORDER BY] [LIMIT]`` for the shard query.
+
+    ``group_by`` replaces the statement's GROUP BY text and parameters.
+    """
+    parts, params = [], []
+    names = ('FROM', 'WHERE', 'GROUP', 'ORDER', 'LIMIT') if keep_order else ('FROM', 'WHERE', 'GROUP')
+    for name in names:
+        fragment = select.clause(name)
+        if fragment is None:
+            continue
+        keyword = {'GROUP': 'GROUP BY', 'ORDER': 'ORDER BY'}.get(name, name)
+        text, fragment_params = fragment.text, fragment.params
+        if name == 'GROUP' and group_by is not None:
+            text, fragment_params = group_by
+        parts.append(f'{keyword} {text}')
+        params.extend(fragment_params)
+    return ' '.join(parts), params
+
+
+class ShardExecutor:
+    """Plan and run inventory reads over shard files on a worker pool.
+
+    Each worker thread keeps one read-only connection per shard, with the main
+    database ATTACHed as ``core`` so dimension tables resolve unqualified.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def plan(self, layout: PartitionLayout, sql: str, params: Sequence[Any]) -> Optional[ShardPlan]:
+        """Plan ``sql`` over ``layout``, or None when it must run on the attached view."""
+        try:
+            select = _Select(sql, params)
+            alias = select.items_alias()
+            shards = list(range(len(layout)))
+            if layout.mode == LOCATION:
+                values = select.where_values('location_id', alias)
+                if values is not None:
+                    shards = sorted(layout.shards_for_locations(values))
+            elif layout.mode == HASH:
+                values = select.where_values('id', alias)
+                if values is not None:
+                    shards = sorted({layout.shard_for(value, None) for value in values})
+        except _Unplannable:
+            return None
+        if len(shards) < len(layout):
+            metrics.increment('partitions.prunedQueries')
+        if len(shards) <= 1:
+            # Contradictory filters match nothing; any single shard returns the right empty shape
+            return ShardPlan(shards or [0], sql, list(params))
+        try:
+            plan = _aggregate_plan(select) if select.is_aggregate else _plain_plan(select)
+        except _Unplannable:
+            return None
+        plan.shards = shards
+        return plan
+
+    def _connection(self, layout: PartitionLayout, index: int, core_path: str) -> sqlite3.Connection:
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        path = str(Path(layout.path(index)).resolve())
+        conn = connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            conn.execute(f"ATTACH DATABASE 'file:{Path(core_path).resolve()}?mode=ro' AS core")
+            conn.execute('PRAGMA query_only = ON')
+            connections[path] = conn
+        return conn
+
+    def _query_shard(self, layout: PartitionLayout, index: int, core_path: str,
+                     sql: str, params: List[Any]) -> Tuple[List[str], List[Tuple]]:
+        cursor = self._connection(layout, index, core_path).execute(sql, params)
+        names = [column[0] for column in cursor.description or ()]
+        return names, cursor.fetchall()
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='shard')
+            return self._pool
+
+    async def run(self, layout: PartitionLayout, core_path: str, plan: ShardPlan) -> ResultSet:
+        """Run ``plan`` on its shards in parallel and merge the results."""
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, self._query_shard, layout, index, core_path, plan.sql, plan.params)
+            for index in plan.shards
+        ))
+        metrics.increment('partitions.parallelQueries')
+        metrics.increment('partitions.shardsScanned', len(plan.shards))
+        names = results[0][0]
+        if plan.merge is None:
+            rows = results[0][1]
+        else:
+            # Merging walks every shard row; keep it off the event loop too
+            rows = await loop.run_in_executor(pool, plan.merge, [rows for _, rows in results])
+            if plan.columns is None:
+                names = names[:len(names) - plan.hidden]
+            else:
+                names = [names[name] if isinstance(name, int) else name for name in plan.columns]
+        return ResultSet.from_rows([(name,) for name in names], rows)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False)
+                self._pool = None
+
+
+# Global instance
+shard_executor = ShardExecutor(config.PARTITION_WORKERS)
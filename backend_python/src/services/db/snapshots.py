@@ -0,0 +1,184 @@
+"""Immutable read snapshots of the database, published by VACUUM INTO.
+
+A publisher writes ``VACUUM INTO`` a temporary file, renames it to
+``snapshot-<ns>.db`` and then atomically replaces the ``CURRENT`` pointer
+file naming it. Readers open snapshots with ``immutable=1`` (no locks, no
+change detection) and a large ``mmap_size``, so pages come straight from the
+OS page cache shared by every worker process. Between queries a reader
+checks the pointer and moves to the newest snapshot; a query in flight
+keeps the snapshot it started on. Older snapshots are pruned after
+``keep`` newer ones exist (open connections keep reading the unlinked file
+on POSIX systems).
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+from config import config
+from services.logging.logger import logger_instance as logger
+from services.metrics.registry import metrics
+
+POINTER = 'CURRENT'
+
+
+class Snapshot:
+    """One published snapshot file."""
+    __slots__ = ('name', 'path', 'published_at')
+
+    def __init__(self, name: str, path: str, published_at: float):
+        self.name = name
+        self.path = path
+        self.published_at = published_at
+
+    @property
+    def version(self) -> str:
+        """Data version token of everything read from this snapshot."""
+        return f'snapshot:{self.name}'
+
+
+class SnapshotStore:
+    """Publish snapshots of one database and hand out connections to the newest."""
+
+    def __init__(self, directory: str, keep: int, mmap_bytes: int):
+        self.directory = directory
+        self.keep = max(keep, 1)
+        self.mmap_bytes = mmap_bytes
+        self._pointer = os.path.join(directory, POINTER)
+        self._pointer_key: Optional[Tuple[int, int]] = None
+        self._current: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Publisher side: a read-only connection to the source and its data version
+        self._source: Optional[sqlite3.Connection] = None
+        self._published_version: Optional[int] = None
+        metrics.register_gauge('snapshots.ageSeconds', self._age_seconds)
+
+    @classmethod
+    def from_config(cls, db_path: str) -> Optional['SnapshotStore']:
+        """Store configured by ``SNAPSHOT_*``, or None when disabled."""
+        if not config.SNAPSHOT_ENABLED:
+            return None
+        if db_path == ':memory:':
+            logger.warn('Snapshot reads are not available for in-memory databases')
+            return None
+        directory = config.SNAPSHOT_DIR or f'{os.path.splitext(db_path)[0]}_snapshots'
+        return cls(directory, config.SNAPSHOT_KEEP, config.SNAPSHOT_MMAP_BYTES)
+
+    def _age_seconds(self) -> float:
+        current = self._current
+        return round(time.time() - current.published_at, 1) if current is not None else 0.0
+
+    def current(self) -> Optional[Snapshot]:
+        """Newest published snapshot (re-read only when the pointer file changed)."""
+        try:
+            stat = os.stat(self._pointer)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if key != self._pointer_key:
+                with open(self._pointer, encoding='utf-8') as f:
+                    pointer = json.load(f)
+                self._current = Snapshot(
+                    pointer['name'],
+                    os.path.join(self.directory, pointer['name']),
+                    pointer['publishedAt'],
+                )
+                self._pointer_key = key
+            return self._current
+
+    def open(self, snapshot: Snapshot) -> sqlite3.Connection:
+        """New lock-free, memory-mapped connection to ``snapshot``."""
+        conn = sqlite3.connect(f'file:{Path(snapshot.path).resolve()}?immutable=1', uri=True,
+                               check_same_thread=False)
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_bytes)}')
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def connection(self) -> Optional[Tuple[sqlite3.Connection, Snapshot]]:
+        """This thread's connection to the newest snapshot, switching if a newer one exists."""
+        snapshot = self.current()
+        if snapshot is None:
+            return None
+        local = self._local
+        if getattr(local, 'snapshot', None) is not snapshot:
+            previous = getattr(local, 'conn', None)
+            local.conn = self.open(snapshot)
+            local.snapshot = snapshot
+            if previous is not None:
+                previous.close()
+                metrics.increment('snapshots.switches')
+        return local.conn, snapshot
+
+    def publish_if_changed(self, db_path: str) -> Optional[Snapshot]:
+        """Publish a snapshot of ``db_path`` unless nothing was committed since the last one."""
+        if self._source is None:
+            self._source = sqlite3.connect(f'file:{Path(db_path).resolve()}?mode=ro', uri=True,
+                                           check_same_thread=False)
+        version = self._source.execute('PRAGMA data_version').fetchone()[0]
+        if version == self._published_version and self.current() is not None:
+            return None
+        snapshot = self.publish(self._source)
+        self._published_version = version
+        return snapshot
+
+    def publish(self, source: sqlite3.Connection) -> Snapshot:
+        """VACUUM ``source`` into a new snapshot and make it current."""
+        os.makedirs(self.directory, exist_ok=True)
+        started = time.perf_counter()
+        name = f'snapshot-{time.time_ns()}.db'
+        path = os.path.join(self.directory, name)
+        temp = f'{path}.tmp'
+        try:
+            source.execute('VACUUM INTO ?', (temp,))
+            self._fsync(temp)
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+        published_at = time.time()
+        pointer_temp = f'{self._pointer}.tmp'
+        with open(pointer_temp, 'w', encoding='utf-8') as f:
+            json.dump({'name': name, 'publishedAt': published_at}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_temp, self._pointer)
+
+        pruned = self._prune(name)
+        metrics.increment('snapshots.published')
+        logger.info('Database snapshot published', {
+            'snapshot': name,
+            'sizeBytes': os.path.getsize(path),
+            'durationMs': round((time.perf_counter() - started) * 1000, 1),
+            'pruned': pruned,
+        })
+        return self.current()
+
+    @staticmethod
+    def _fsync(path: str) -> None:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _prune(self, current: str) -> int:
+        """Delete all but the ``keep`` newest snapshots."""
+        names = sorted(os.path.basename(path) for path in glob.glob(os.path.join(self.directory, 'snapshot-*.db')))
+        pruned = 0
+        for name in names[:-self.keep]:
+            if name == current:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+                pruned += 1
+            except OSError:
+                pass  # Still open on a platform that cannot unlink open files; retried next time
+        return pruned
@@ -0,0 +1,841 @@
+"""Rule-based parser for common inventory questions (no LLM round-trip)."""
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from config import config
+from services.db.connection import get_database
+from services.db.history import DAY, GRAINS, MONTH, WEEK, Grain, grain_for
+from services.logging.logger import logger_instance as logger
+
+
+class PhraseMatch(NamedTuple):
+    """One phrase occurrence in the normalized question."""
+    start: int
+    end: int
+    kind: str
+    value: Any
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton finding many lowercase phrases in one pass.
+
+    Matches must start and end on word boundaries; overlaps are resolved
+    leftmost-longest. When a phrase is added twice the first payload wins.
+    Call ``build`` after the last ``add``.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (phrase length, (kind, value)) for every phrase ending at the node
+        self._output: List[List[Tuple[int, Tuple[str, Any]]]] = [[]]
+        self.size = 0
+
+    def add(self, phrase: str, kind: str, value: Any = None) -> None:
+        """Register ``phrase`` (already lowercase) with its payload."""
+        node = 0
+        for char in phrase:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = child
+        if not self._output[node]:
+            self._output[node].append((len(phrase), (kind, value)))
+            self.size += 1
+
+    def build(self) -> 'PhraseMatcher':
+        """Compute failure links (breadth-first) and merge outputs."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0) if node else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        return self
+
+    def find(self, text: str) -> List[PhraseMatch]:
+        """Non-overlapping, word-bounded matches in ``text``, in order."""
+        candidates = []
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, (kind, value) in self._output[node]:
+                start = end - length
+                if _bounded(text, start, end):
+                    candidates.append(PhraseMatch(start, end, kind, value))
+
+        candidates.sort(key=lambda m: (m.start, m.start - m.end))
+        selected: List[PhraseMatch] = []
+        last_end = 0
+        for match in candidates:
+            if match.start >= last_end:
+                selected.append(match)
+                last_end = match.end
+        return selected
+
+
+def _bounded(text: str, start: int, end: int) -> bool:
+    """True unless the match cuts through a word (symbol phrases need no boundary)."""
+    if text[start].isalnum() and start > 0 and text[start - 1].isalnum():
+        return False
+    if text[end - 1].isalnum() and end < len(text) and text[end].isalnum():
+        return False
+    return True
+
+
+class ParsedQuery:
+    """Parameterized SQL for a question, with how much of the question it explains."""
+    def __init__(self, intent: str, sql: str, params: List[Any], filters: Dict[str, Any],
+                 confidence: float, matched: List[str], limit_requested: bool = False):
+        self.intent = intent
+        self.sql = sql
+        self.params = params
+        self.filters = filters
+        self.confidence = confidence
+        self.matched = matched
+        # True when the question gave the row count ("top 5", "show 20 items")
+        self.limit_requested = limit_requested
+
+
+class IntentParser:
+    """Parse inventory questions with a compiled phrase matcher.
+
+    The matcher covers category names, location names/types and SKUs from
+    the database plus fixed vocabularies (intent phrases, fields, comparison
+    operators, sorting, grouping, aggregates, time ranges, trends). Recognized parts
+    are combined into parameterized SQL; ``confidence`` is the share of the
+    question's content words the parse accounts for, so questions with
+    unrecognized words fall through to the LLM. The vocabulary is rebuilt
+    when the database data version changes, at most every
+    ``SCHEMA_REFRESH_SECONDS``.
+    """
+
+    MAX_LIMIT = 100
+    DEFAULT_LIMITS = {'top_sellers': 10, 'slow_movers': 10, 'low_stock': 100, 'out_of_stock': 100}
+    DEFAULT_LIMIT = 50
+
+    # Intents that filter on stock level (they also apply to grouped totals)
+    STOCK_STATES = ('out_of_stock', 'low_stock', 'overstock')
+
+    # Overstocked: more than this many times the reorder threshold on hand
+    OVERSTOCK_FACTOR = 3
+
+    SELECT_COLUMNS = """i.id,
+    i.sku,
+    i.name,
+    i.category_id as categoryId,
+    i.location_id as locationId,
+    i.current_stock as currentStock,
+    i.reorder_threshold as reorderThreshold,
+    i.recent_sales_volume as recentSalesVolume,
+    i.created_at as createdAt,
+    i.updated_at as updatedAt"""
+
+    FIELD_PHRASES = {
+        'current_stock': ('stock', 'current stock', 'stock level', 'stock levels', 'quantity',
+                          'quantities', 'units', 'units on hand', 'on hand', 'inventory level',
+                          'inventory levels', 'stocked'),
+        'recent_sales_volume': ('sales', 'sales volume', 'sold', 'units sold', 'sale', 'demand'),
+        'reorder_threshold': ('threshold', 'reorder threshold', 'reorder point', 'reorder level',
+                              'reorder thresholds', 'thresholds'),
+        'name': ('name', 'names', 'alphabetical', 'alphabetically'),
+        'updated_at': ('updated', 'last updated', 'update date', 'date updated'),
+    }
+
+    # Aliases of each field in grouped/aggregate rows
+    FIELD_ALIASES = {
+        'current_stock': 'currentStock',
+        'recent_sales_volume': 'recentSalesVolume',
+        'reorder_threshold': 'reorderThreshold',
+        'name': 'name',
+    }
+
+    INTENT_PHRASES = {
+        'low_stock': ('low stock', 'low-stock', 'running low', 'low on stock', 'low inventory',
+                      'reorder', 'to reorder', 'needs reorder', 'need reorder', 'needs reordering',
+                      'need reordering', 'restock', 'needs restocking', 'need restocking',
+                      'low stock alert', 'stock alert'),
+        'out_of_stock': ('out of stock', 'out-of-stock', 'sold out', 'no stock', 'zero stock'),
+        'overstock': ('overstock', 'overstocked', 'excess stock', 'too much stock', 'surplus'),
+        'top_sellers': ('top selling', 'top sellers', 'top seller', 'best selling', 'best-selling',
+                        'best sellers', 'best seller', 'bestsellers', 'bestselling', 'selling',
+                        'sellers', 'popular', 'most popular', 'fast moving', 'fastest moving'),
+        'slow_movers': ('slow moving', 'slow-moving', 'slow movers', 'slowest', 'slowest moving',
+                        'worst selling', 'worst sellers', 'least popular', 'not selling', 'dead stock'),
+    }
+
+    # Words the parser understands but that do not change the SQL
+    STOPWORDS = frozenset({
+        'a', 'all', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by', 'can', 'category',
+        'categories', 'currently', 'display', 'do', 'does', 'each', 'every', 'find', 'for',
+        'from', 'get', 'give', 'goods', 'has', 'have', 'i', 'in', 'inventory', 'is',
+        'it', 'item', 'items', 'list', 'location', 'locations', 'me', 'my',
+        'now', 'of', 'on', 'or', 'our', 'please', 'product', 'products', 'recent', 'right',
+        'see', 'show', 'sku', 'skus', 'so', 'that', 'the', 'their', 'them', 'there', 'these',
+        'they', 'this', 'those', 'to', 'we', 'what', 'whats', "what's", 'where', 'which',
+        'with', 'you', 'results', 'rows', 'entries', 'stuff', 'things', 'tell', 'want',
+        'need', 'us', 'only', 'just', 'levels', 'level',
+    })
+
+    LIST_WORDS = frozenset({'show', 'list', 'find', 'display', 'get', 'give', 'which', 'what'})
+
+    # Nouns after a bare number that make it a row limit ("show 20 items")
+    LIMIT_NOUNS = frozenset({'items', 'products', 'results', 'rows', 'entries', 'skus', 'goods'})
+
+    COMPARISONS = {
+        '>': ('more than', 'greater than', 'over', 'above', 'exceeding', 'higher than',
+              'bigger than', 'larger than', '>'),
+        '>=': ('at least', 'no less than', 'minimum of', '>='),
+        '<': ('less than', 'fewer than', 'under', 'below', 'lower than', 'smaller than', '<'),
+        '<=': ('at most', 'no more than', 'maximum of', 'up to', '<='),
+        '=': ('exactly', 'equal to', 'equals', '='),
+    }
+
+    SORT_PREFIXES = ('sorted by', 'sort by', 'order by', 'ordered by', 'ranked by', 'by')
+    SUPERLATIVES = {
+        'DESC': ('highest', 'most', 'largest', 'biggest', 'max', 'maximum', 'greatest'),
+        'ASC': ('lowest', 'least', 'smallest', 'fewest', 'min', 'minimum'),
+    }
+    DIRECTIONS = {
+        'ASC': ('ascending', 'asc', 'lowest first', 'smallest first', 'fewest first', 'a-z'),
+        'DESC': ('descending', 'desc', 'highest first', 'largest first', 'most first', 'z-a'),
+    }
+    RECENCY = {
+        'DESC': ('recently updated', 'most recent', 'latest', 'newest', 'recent changes'),
+        'ASC': ('oldest', 'least recently updated', 'stale'),
+    }
+
+    # 'top'/'bottom' rank by sales unless another sort is given; 'first'/'limit' only cap rows
+    RANKS = {'top': 'DESC', 'bottom': 'ASC', 'first': None, 'limit': None}
+
+    GROUP_TARGETS = {
+        'location': ('location', 'locations', 'warehouse', 'warehouses', 'store', 'stores',
+                     'site', 'sites', 'branch', 'branches'),
+        'category': ('category', 'categories', 'department', 'departments'),
+    }
+    GROUP_PREFIXES = ('per', 'by', 'each', 'for each', 'across', 'grouped by', 'group by',
+                      'broken down by', 'breakdown by', 'split by')
+
+    AGGREGATES = {
+        'SUM': ('total', 'totals', 'sum', 'sum of', 'overall', 'combined', 'aggregate', 'how much'),
+        'AVG': ('average', 'avg', 'mean'),
+    }
+    # Count matching items ("how many units" is a total instead)
+    COUNT_PHRASES = ('how many', 'number of', 'count of', 'count')
+    # "which store ..." asks for one row per location (the best one with a superlative sort)
+    WHICH_PREFIXES = ('which', 'what')
+
+    TIME_ANCHORS = ('last', 'past', 'previous', 'in the last', 'in the past', 'within the last',
+                    'within the past', 'over the last', 'over the past', 'during the last')
+    TIME_UNITS = {
+        'day': ('days', 1), 'days': ('days', 1),
+        'week': ('days', 7), 'weeks': ('days', 7),
+        'month': ('months', 1), 'months': ('months', 1),
+        'year': ('years', 1), 'years': ('years', 1),
+    }
+    # SQLite datetime() modifiers for fixed ranges
+    TIME_FIXED = {
+        'today': ('start of day', 'today'),
+        'yesterday': ('-1 days', '1 day'),
+        'this week': ('-7 days', '7 days'),
+        'this month': ('start of month', 'this month'),
+        'this year': ('start of year', 'this year'),
+    }
+    # Approximate days reaching back for each modifier form
+    MODIFIER_DAYS = {'days': 1, 'months': 31, 'years': 366,
+                     'start of day': 1, 'start of month': 31, 'start of year': 366}
+
+    # Period series over the history tables (None: pick the grain from the range)
+    TRENDS = {
+        None: ('trend', 'trends', 'trending', 'over time', 'history', 'historical', 'time series'),
+        DAY: ('daily', 'per day', 'by day', 'each day', 'day by day'),
+        WEEK: ('weekly', 'per week', 'by week', 'each week', 'week by week'),
+        MONTH: ('monthly', 'per month', 'by month', 'each month', 'month by month'),
+    }
+    TREND_RANGES = {DAY: ('-30 days', '30 days'), WEEK: ('-84 days', '84 days'), MONTH: ('-12 months', '12 months')}
+    GRAIN_DAYS = {DAY: 1, WEEK: 7, MONTH: 31}
+
+    # Extra category names people use (added only when the category exists)
+    CATEGORY_ALIASES = {
+        'Clothing': ('clothes', 'apparel', 'garments'),
+        'Electronics': ('electronic', 'electronics items', 'gadgets'),
+        'Home & Garden': ('home and garden', 'home', 'garden'),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matcher: Optional[PhraseMatcher] = None
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+
+    def matcher(self) -> PhraseMatcher:
+        """Return the compiled matcher, rebuilding it when the data changed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._matcher is None or now - self._checked_at >= config.SCHEMA_REFRESH_SECONDS:
+                self._checked_at = now
+                db = get_database()
+                version = db.data_version()
+                if self._matcher is None or version != self._version:
+                    self._matcher = self._compile(db.connect())
+                    self._version = db.data_version()
+            return self._matcher
+
+    def _compile(self, conn) -> PhraseMatcher:
+        matcher = PhraseMatcher()
+        categories = conn.execute('SELECT id, name FROM product_categories').fetchall()
+        locations = conn.execute('SELECT id, name, type FROM locations').fetchall()
+        skus = conn.execute('SELECT DISTINCT sku FROM inventory_items WHERE sku IS NOT NULL').fetchall()
+
+        # Exact entity names first so they win over vocabulary and derived aliases
+        for cat_id, name in categories:
+            matcher.add(name.lower(), 'category', (cat_id, name))
+        for loc_id, name, _ in locations:
+            matcher.add(name.lower(), 'location', (loc_id, name))
+        for (sku,) in skus:
+            matcher.add(str(sku).lower(), 'sku', str(sku))
+
+        # "which store" restricts to that location type; ahead of the generic "which <noun>"
+        for loc_type in sorted({row[2] for row in locations if row[2]}):
+            for phrase in (loc_type.lower(), loc_type.lower() + 's'):
+                for prefix in self.WHICH_PREFIXES:
+                    matcher.add(f'{prefix} {phrase}', 'which', ('location', loc_type))
+
+        self._add_vocabulary(matcher)
+
+        by_name = {name: (cat_id, name) for cat_id, name in categories}
+        for name, aliases in self.CATEGORY_ALIASES.items():
+            if name in by_name:
+                for alias in aliases:
+                    matcher.add(alias, 'category', by_name[name])
+        for cat_id, name in categories:
+            if name.lower().endswith('s'):
+                matcher.add(name.lower()[:-1], 'category', (cat_id, name))
+        for loc_type in sorted({row[2] for row in locations if row[2]}):
+            for phrase in (loc_type.lower(), loc_type.lower() + 's'):
+                matcher.add(phrase, 'location_type', loc_type)
+        # A word unique to one location name identifies it ("downtown")
+        words: Dict[str, List[Tuple[str, str]]] = {}
+        for loc_id, name, _ in locations:
+            for word in re.findall(r'[a-z0-9]+', name.lower()):
+                words.setdefault(word, []).append((loc_id, name))
+        for word, owners in words.items():
+            if len(owners) == 1 and len(word) > 3 and word not in self.STOPWORDS:
+                matcher.add(word, 'location', owners[0])
+
+        matcher.build()
+        logger.info('Intent parser vocabulary compiled', {
+            'phrases': matcher.size,
+            'categories': len(categories),
+            'locations': len(locations),
+            'skus': len(skus),
+        })
+        return matcher
+
+    def _add_vocabulary(self, matcher: PhraseMatcher) -> None:
+        """Fixed phrases, longest forms included explicitly (matching is leftmost-longest)."""
+        for target, nouns in self.GROUP_TARGETS.items():
+            for noun in nouns:
+                for prefix in self.GROUP_PREFIXES:
+                    matcher.add(f'{prefix} {noun}', 'group', target)
+                for prefix in self.WHICH_PREFIXES:
+                    matcher.add(f'{prefix} {noun}', 'which', (target, None))
+        for column, phrases in self.FIELD_PHRASES.items():
+            for phrase in phrases:
+                for prefix in self.SORT_PREFIXES:
+                    matcher.add(f'{prefix} {phrase}', 'sort', (column, None))
+                for direction, words in self.SUPERLATIVES.items():
+                    for word in words:
+                        matcher.add(f'{word} {phrase}', 'sort', (column, direction))
+        for intent, phrases in self.INTENT_PHRASES.items():
+            for phrase in phrases:
+                matcher.add(phrase, 'intent', intent)
+        for direction, phrases in self.RECENCY.items():
+            for phrase in phrases:
+                matcher.add(phrase, 'sort', ('updated_at', direction))
+        for direction, phrases in self.DIRECTIONS.items():
+            for phrase in phrases:
+                matcher.add(phrase, 'direction', direction)
+        for phrase, (modifier, label) in self.TIME_FIXED.items():
+            matcher.add(phrase, 'time_fixed', (modifier, label))
+        for phrase in self.TIME_ANCHORS:
+            matcher.add(phrase, 'time_anchor')
+        for grain, phrases in self.TRENDS.items():
+            for phrase in phrases:
+                matcher.add(phrase, 'trend', grain)
+        for phrase, unit in self.TIME_UNITS.items():
+            matcher.add(phrase, 'time_unit', unit)
+        for operator, phrases in self.COMPARISONS.items():
+            for phrase in phrases:
+                matcher.add(phrase, 'comparison', operator)
+        for column, phrases in self.FIELD_PHRASES.items():
+            for phrase in phrases:
+                matcher.add(phrase, 'field', column)
+        for function, phrases in self.AGGREGATES.items():
+            for phrase in phrases:
+                matcher.add(phrase, 'aggregate', function)
+        for phrase in self.COUNT_PHRASES:
+            matcher.add(phrase, 'count')
+        for phrase, direction in self.RANKS.items():
+            matcher.add(phrase, 'rank', direction)
+        matcher.add('between', 'between')
+
+    @staticmethod
+    def normalize(question: str) -> str:
+        """Lowercase, collapse whitespace and drop trailing punctuation."""
+        return ' '.join(question.lower().replace('?', ' ').replace(',', ' ').split()).rstrip('.!')
+
+    def parse(self, question: str) -> ParsedQuery:
+        """Parse ``question`` into parameterized SQL with a confidence score."""
+        text = self.normalize(question)
+        elements = self.matcher().find(text)
+        elements.extend(
+            PhraseMatch(m.start(), m.end(), 'number', int(m.group()))
+            for m in re.finditer(r'(?<![\w-])\d+(?![\w-])', text)
+        )
+        elements.sort(key=lambda e: e.start)
+
+        consumed = set()
+        categories: Dict[str, str] = {}
+        locations: Dict[str, str] = {}
+        location_types: List[str] = []
+        skus: List[str] = []
+        intents: List[str] = []
+        conditions: List[Tuple[str, List[Any], str]] = []
+        sort: Optional[Tuple[str, Optional[str]]] = None
+        direction: Optional[str] = None
+        rank: Optional[str] = None
+        limit: Optional[int] = None
+        group: Optional[str] = None
+        aggregate: Optional[str] = None
+        count = False
+        pick_one = False
+        time_range: Optional[Tuple[str, str]] = None
+        trend = False
+        trend_grain: Optional[str] = None
+
+        def following(index: int, kind: str) -> Optional[PhraseMatch]:
+            if index + 1 < len(elements) and elements[index + 1].kind == kind:
+                gap = text[elements[index].end:elements[index + 1].start].split()
+                if all(word in ('of', 'the', 'than', 'and') for word in gap):
+                    return elements[index + 1]
+            return None
+
+        for index, element in enumerate(elements):
+            if index in consumed:
+                continue
+            kind, value = element.kind, element.value
+            if kind == 'category':
+                categories[value[0]] = value[1]
+            elif kind == 'location':
+                locations[value[0]] = value[1]
+            elif kind == 'location_type':
+                if value not in location_types:
+                    location_types.append(value)
+            elif kind == 'sku':
+                if value not in skus:
+                    skus.append(value)
+            elif kind == 'intent':
+                if value not in intents:
+                    intents.append(value)
+            elif kind == 'group':
+                group = value
+            elif kind == 'aggregate':
+                aggregate = value
+            elif kind == 'count':
+                if following(index, 'field') is not None:
+                    aggregate = aggregate or 'SUM'
+                else:
+                    count = True
+            elif kind == 'which':
+                group, location_type = value
+                if location_type is not None and location_type not in location_types:
+                    location_types.append(location_type)
+                pick_one = True
+            elif kind == 'direction':
+                direction = value
+            elif kind == 'sort':
+                sort = value
+            elif kind == 'rank':
+                number = following(index, 'number')
+                if number is not None:
+                    limit = number.value
+                    consumed.add(index + 1)
+                rank = value or rank
+            elif kind == 'comparison':
+                condition = self._comparison(elements, index, value, following, consumed)
+                if condition is not None:
+                    conditions.append(condition)
+            elif kind == 'between':
+                low = following(index, 'number')
+                high = following(index + 1, 'number') if low is not None else None
+                if high is not None and text[low.end:high.start].split() == ['and']:
+                    previous = elements[index - 1] if index > 0 else None
+                    subject = previous.value if previous is not None and previous.kind == 'field' else None
+                    subject = subject if subject in self.FIELD_ALIASES and subject != 'name' else 'current_stock'
+                    conditions.append((f'i.{subject} BETWEEN ? AND ?', [low.value, high.value],
+                                       f'{subject} between {low.value} and {high.value}'))
+                    consumed.update({index + 1, index + 2})
+            elif kind == 'trend':
+                trend = True
+                trend_grain = value or trend_grain
+            elif kind == 'time_fixed':
+                time_range = value
+            elif kind == 'time_anchor':
+                number = following(index, 'number')
+                unit_index = index + 1 if number is None else index + 2
+                unit = following(unit_index - 1, 'time_unit')
+                if unit is not None:
+                    amount = (number.value if number is not None else 1) * unit.value[1]
+                    time_range = (f'-{amount} {unit.value[0]}', f'{amount} {unit.value[0]}')
+                    consumed.update(range(index + 1, unit_index + 1))
+            elif kind == 'number' and limit is None:
+                after = text[element.end:].split()[:1]
+                before = text[:element.start].split()[-1:]
+                if (after and after[0] in self.LIMIT_NOUNS) or (before and before[0] in self.LIST_WORDS):
+                    limit = value
+                    consumed.add(index)
+
+        # Which elements the plan explains; unbound numbers and stray units do not count
+        explained = [
+            e for i, e in enumerate(elements)
+            if e.kind not in ('number', 'time_unit', 'time_anchor', 'comparison', 'between') or i in consumed
+        ]
+        for i, e in enumerate(elements):
+            if e.kind in ('time_anchor', 'comparison', 'between') and (i + 1) in consumed:
+                explained.append(e)
+
+        if sort is None and rank is not None:
+            sort = ('recent_sales_volume', rank)
+        if sort is not None and direction is not None:
+            sort = (sort[0], direction)
+        if sort is not None and sort[1] is None:
+            sort = (sort[0], 'ASC' if sort[0] == 'name' else 'DESC')
+        if pick_one and limit is None and sort is not None:
+            limit = 1
+
+        intent = self._intent(intents, sort, group, aggregate, trend, count)
+        stock_state = next((name for name in self.STOCK_STATES if name in intents), None)
+
+        # Sales within a time range (and trends) read the history tables, not recent_sales_volume
+        history: Optional[Grain] = None
+        if intent == 'sales_trend':
+            time_range = time_range or self.TREND_RANGES[trend_grain or DAY]
+            history = self._trend_grain(self._range_days(time_range[0]), trend_grain)
+        elif time_range and (
+            intent in ('top_sellers', 'slow_movers')
+            or (sort is not None and sort[0] == 'recent_sales_volume')
+            or any(e.kind == 'field' and e.value == 'recent_sales_volume' for e in elements)
+        ):
+            history = grain_for(self._range_days(time_range[0]))
+
+        sql, params = self._build_sql(
+            intent, stock_state, categories, locations, location_types, skus, conditions,
+            time_range, sort, limit, group, aggregate, history,
+        )
+
+        filters: Dict[str, Any] = {}
+        if len(categories) == 1:
+            filters['category'] = next(iter(categories.values()))
+        elif categories:
+            filters['categories'] = list(categories.values())
+        if locations:
+            filters['locations'] = list(locations.values())
+        if location_types:
+            filters['locationTypes'] = location_types
+        if skus:
+            filters['skus'] = skus
+        if conditions:
+            filters['conditions'] = [description for _, _, description in conditions]
+        if time_range:
+            filters['timeRange'] = time_range[1]
+        if history is not None:
+            filters['trend' if intent == 'sales_trend' else 'salesHistory'] = history.name
+        if sort:
+            filters['sortBy'] = f'{sort[0]} {sort[1]}'
+        if group:
+            filters['groupBy'] = group
+        if aggregate:
+            filters['aggregate'] = aggregate
+        if count:
+            filters['aggregate'] = 'COUNT'
+
+        confidence = self._confidence(text, explained, bool(filters) or intent != 'list_items')
+        return ParsedQuery(
+            intent=intent,
+            sql=sql,
+            params=params,
+            filters=filters,
+            confidence=confidence,
+            matched=[text[e.start:e.end] for e in sorted(explained, key=lambda e: e.start)],
+            limit_requested=limit is not None,
+        )
+
+    def _comparison(self, elements: List[PhraseMatch], index: int, operator: str,
+                    following, consumed: set) -> Optional[Tuple[str, List[Any], str]]:
+        """Bind a comparison to its subject field and a number or another field."""
+        previous = elements[index - 1] if index > 0 else None
+        subject = previous.value if previous is not None and previous.kind == 'field' else None
+
+        number = following(index, 'number')
+        if number is not None:
+            consumed.add(index + 1)
+            unit = following(index + 1, 'field')
+            if subject is None and unit is not None:
+                subject = unit.value
+                consumed.add(index + 2)
+            subject = subject if subject in self.FIELD_ALIASES and subject != 'name' else 'current_stock'
+            return (f'i.{subject} {operator} ?', [number.value],
+                    f'{subject} {operator} {number.value}')
+
+        other = following(index, 'field')
+        if other is not None and other.value in self.FIELD_ALIASES and other.value != 'name':
+            consumed.add(index + 1)
+            subject = subject if subject in self.FIELD_ALIASES and subject != 'name' else 'current_stock'
+            if subject != other.value:
+                return (f'i.{subject} {operator} i.{other.value}', [],
+                        f'{subject} {operator} {other.value}')
+        return None
+
+    def _intent(self, intents: List[str], sort: Optional[Tuple[str, str]],
+                group: Optional[str], aggregate: Optional[str], trend: bool, count: bool = False) -> str:
+        if trend:
+            return 'sales_trend'
+        if count:
+            return f'count_by_{group}' if group else 'count_items'
+        if group:
+            return f'aggregate_by_{group}'
+        if aggregate:
+            return 'aggregate_total'
+        for intent in self.STOCK_STATES + ('slow_movers', 'top_sellers'):
+            if intent in intents:
+                return intent
+        if sort and sort[0] == 'recent_sales_volume':
+            return 'top_sellers' if sort[1] == 'DESC' else 'slow_movers'
+        return 'list_items'
+
+    def _range_days(self, modifier: str) -> int:
+        """How many days a datetime() modifier such as ``-3 months`` reaches back."""
+        match = re.fullmatch(r'-(\d+) (days|months|years)', modifier)
+        if match:
+            return int(match.group(1)) * self.MODIFIER_DAYS[match.group(2)]
+        return self.MODIFIER_DAYS.get(modifier, 1)
+
+    def _trend_grain(self, days: int, requested: Optional[str]) -> Grain:
+        """Requested grain, coarsened until it is retained and the series fits ``MAX_LIMIT`` rows."""
+        order = (DAY, WEEK, MONTH)
+        first = max(order.index(requested or DAY), order.index(grain_for(days).name))
+        for name in order[first:]:
+            if days // self.GRAIN_DAYS[name] < self.MAX_LIMIT:
+                return GRAINS[name]
+        return GRAINS[MONTH]
+
+    def _build_sql(self, intent: str, stock_state: Optional[str], categories: Dict[str, str], locations: Dict[str, str],
+                   location_types: List[str], skus: List[str],
+                   conditions: List[Tuple[str, List[Any], str]],
+                   time_range: Optional[Tuple[str, str]], sort: Optional[Tuple[str, str]],
+                   limit: Optional[int], group: Optional[str],
+                   aggregate: Optional[str], history: Optional[Grain] = None) -> Tuple[str, List[Any]]:
+        where: List[str] = []
+        params: List[Any] = []
+
+        def add_in(column: str, values: List[Any]) -> None:
+            if len(values) == 1:
+                where.append(f'{column} = ?')
+            else:
+                where.append(f'{column} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+
+        if categories:
+            add_in('i.category_id', list(categories))
+        if locations:
+            add_in('i.location_id', list(locations))
+        if location_types:
+            placeholders = ', '.join('?' * len(location_types))
+            where.append(f'i.location_id IN (SELECT id FROM locations WHERE type IN ({placeholders}))')
+            params.extend(location_types)
+        if skus:
+            add_in('i.sku', skus)
+
+        if stock_state == 'low_stock':
+            where.append('i.current_stock <= i.reorder_threshold')
+        elif stock_state == 'out_of_stock':
+            where.append('i.current_stock <= 0')
+        elif stock_state == 'overstock':
+            where.append('i.current_stock > i.reorder_threshold * ?')
+            params.append(self.OVERSTOCK_FACTOR)
+        if intent == 'top_sellers':
+            where.append('i.recent_sales_volume > 0')
+
+        for condition, values, _ in conditions:
+            where.append(condition)
+            params.extend(values)
+        if intent == 'sales_trend':
+            params.append(time_range[0])
+            return self._trend_sql(history, where), params
+        if time_range and history is None:
+            where.append("i.updated_at >= datetime('now', ?)")
+            params.append(time_range[0])
+
+        where_clause = f"WHERE {' AND '.join(where)}" if where else ''
+        row_limit = min(limit or self.DEFAULT_LIMITS.get(intent, self.DEFAULT_LIMIT), self.MAX_LIMIT)
+
+        count = intent.startswith('count_')
+        if group or aggregate or count:
+            sql = self._aggregate_sql(group, aggregate or 'SUM', where_clause, sort, row_limit, count)
+            return self._windowed_sales(sql, params, history, time_range) if history else (sql, params)
+
+        if sort:
+            order_by = f'i.{sort[0]} {sort[1]}'
+        elif intent == 'low_stock':
+            order_by = 'i.current_stock ASC, i.recent_sales_volume DESC'
+        elif intent == 'out_of_stock':
+            order_by = 'i.recent_sales_volume DESC'
+        elif intent == 'overstock':
+            order_by = 'i.current_stock DESC'
+        elif intent == 'top_sellers':
+            order_by = 'i.recent_sales_volume DESC'
+        elif intent == 'slow_movers':
+            order_by = 'i.recent_sales_volume ASC'
+        else:
+            order_by = 'i.updated_at DESC'
+        if history is not None:
+            # Sort on the selected window total instead of evaluating it twice
+            order_by = order_by.replace('i.recent_sales_volume', 'recentSalesVolume')
+
+        sql = '\n'.join(part for part in (
+            f'SELECT\n    {self.SELECT_COLUMNS}',
+            'FROM inventory_items i',
+            where_clause,
+            f'ORDER BY {order_by}',
+            f'LIMIT {row_limit}',
+        ) if part)
+        return self._windowed_sales(sql, params, history, time_range) if history else (sql, params)
+
+    @staticmethod
+    def _windowed_sales(sql: str, params: List[Any], grain: Grain,
+                        time_range: Tuple[str, str]) -> Tuple[str, List[Any]]:
+        """Replace ``i.recent_sales_volume`` with units sold in ``time_range`` from ``grain``'s table.
+
+        Each occurrence becomes a correlated range scan of one item's rows
+        (the tables are clustered by item and period) and binds the range's
+        datetime() modifier at its position among the other parameters.
+        """
+        window = (f'(SELECT COALESCE(SUM(h.units_sold), 0) FROM {grain.table} h '
+                  f'WHERE h.item_id = i.id AND {grain.since("h")})')
+        parts = sql.split('i.recent_sales_volume')
+        params = list(params)
+        position = parts[0].count('?')
+        for part in parts[1:]:
+            params.insert(position, time_range[0])
+            position += 1 + part.count('?')
+        return window.join(parts), params
+
+    def _trend_sql(self, grain: Grain, where: List[str]) -> str:
+        """Units sold and closing stock per period, oldest first, shaped like inventory rows."""
+        label = grain.label_of('h')
+        return '\n'.join((
+            'SELECT',
+            f'    {label} as id,',
+            '    NULL as sku,',
+            f'    {label} as name,',
+            '    NULL as categoryId,',
+            '    NULL as locationId,',
+            '    SUM(h.closing_stock) as currentStock,',
+            '    SUM(i.reorder_threshold) as reorderThreshold,',
+            '    SUM(h.units_sold) as recentSalesVolume',
+            'FROM inventory_items i',
+            f'JOIN {grain.table} h ON h.item_id = i.id',
+            f"WHERE {' AND '.join(where + [grain.since('h')])}",
+            f'GROUP BY h.{grain.column}',
+            f'ORDER BY h.{grain.column} ASC',
+            f'LIMIT {self.MAX_LIMIT}',
+        ))
+
+    def _aggregate_sql(self, group: Optional[str], function: str, where_clause: str,
+                       sort: Optional[Tuple[str, str]], row_limit: int, count: bool = False) -> str:
+        """Grouped (or overall) totals shaped like inventory rows so tables and charts still apply.
+
+        With ``count`` the number of matching items (``COUNT(*)``) goes into
+        ``name``, next to each group's name, and orders the groups by default.
+        """
+        def measure(column: str) -> str:
+            return f'ROUND(AVG(i.{column}), 1)' if function == 'AVG' else f'SUM(i.{column})'
+
+        measures = (
+            f'{measure("current_stock")} as currentStock,\n'
+            f'    {measure("reorder_threshold")} as reorderThreshold,\n'
+            f'    {measure("recent_sales_volume")} as recentSalesVolume'
+        )
+        if sort and sort[0] in self.FIELD_ALIASES:
+            order_by = f'{self.FIELD_ALIASES[sort[0]]} {sort[1]}'
+        elif count and group:
+            order_by = 'COUNT(*) DESC'
+        else:
+            order_by = 'currentStock DESC'
+
+        def label(column: str) -> str:
+            return f"printf('%s (%d items)', {column}, COUNT(*))" if count else column
+
+        if group == 'location':
+            select = (f'l.id as id,\n    NULL as sku,\n    {label("l.name")} as name,\n    NULL as categoryId,\n'
+                      '    l.id as locationId')
+            source = 'FROM inventory_items i\nJOIN locations l ON i.location_id = l.id'
+            group_by = 'GROUP BY l.id, l.name'
+        elif group == 'category':
+            select = (f'c.id as id,\n    NULL as sku,\n    {label("c.name")} as name,\n    c.id as categoryId,\n'
+                      '    NULL as locationId')
+            source = 'FROM inventory_items i\nJOIN product_categories c ON i.category_id = c.id'
+            group_by = 'GROUP BY c.id, c.name'
+        else:
+            name = "printf('%d matching items', COUNT(*))" if count else "'All matching items'"
+            select = (f"'all' as id,\n    NULL as sku,\n    {name} as name,\n"
+                      '    NULL as categoryId,\n    NULL as locationId')
+            source = 'FROM inventory_items i'
+            group_by = ''
+            row_limit = 1
+
+        return '\n'.join(part for part in (
+            f'SELECT\n    {select},\n    {measures}',
+            source,
+            where_clause,
+            group_by,
+            f'ORDER BY {order_by}',
+            f'LIMIT {row_limit}',
+        ) if part)
+
+    def _confidence(self, text: str, explained: List[PhraseMatch], has_intent: bool) -> float:
+        """Share of content words covered by explained matches (lower without any intent)."""
+        spans = [(e.start, e.end) for e in explained]
+        content = 0
+        covered = 0
+        list_request = False
+        for token in re.finditer(r"[a-z0-9<>=][a-z0-9'&<>=-]*", text):
+            word = token.group()
+            inside = any(start <= token.start() and token.end() <= end for start, end in spans)
+            if word in self.LIST_WORDS:
+                list_request = True
+            if word in self.STOPWORDS and not inside:
+                continue
+            content += 1
+            covered += inside
+        coverage = covered / content if content else 1.0
+        strength = 1.0 if has_intent or list_request else 0.7
+        return round(coverage * strength, 2)
+
+
+# Global instance
+intent_parser = IntentParser()
@@ -1,23 +1,39 @@
 """Inventory Query Executor - executes SQL queries safely."""
+import asyncio
 import re
-import sys
+import sqlite3
 import time
-from pathlib import Path
-from typing import List, Dict, Any
+import uuid
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
 
-# Add src to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from services.db.connection import query
+from config import config
+from services.db.connection import data_version, get_database, query_result_set
+from services.db.result_set import ResultSet
+from services.db.shard_executor import shard_executor
 from services.logging.logger import logger_instance as logger
+from services.metrics.registry import metrics
+from services.query_rewriter import QueryRewrite, query_rewriter
+from services.result_cache import cache_key, result_cache
+from services.result_diff import ResultVersion
+from services.single_flight import SingleFlight
 
 
 class QueryResult:
     """Query result model."""
-    def __init__(self, rows: List[Dict[str, Any]], row_count: int, execution_time_ms: int):
-        self.rows = rows
+    def __init__(self, result_set: ResultSet, row_count: int, execution_time_ms: int,
+                 cached: bool = False, incremental: bool = False):
+        self.result_set = result_set
         self.row_count = row_count
         self.execution_time_ms = execution_time_ms
+        # True when served from the shared result cache
+        self.cached = cached
+        # True when only rows changed since the previous version were re-read
+        self.incremental = incremental
+    
+    @property
+    def rows(self) -> List[Dict[str, Any]]:
+        """Rows as InventoryItem-shaped dictionaries (materialized on first use)."""
+        return self.result_set.to_dicts()
 
 
 class InventoryQueryExecutor:
@@ -25,58 +41,64 @@ class InventoryQueryExecutor:
     
     DANGEROUS_KEYWORDS = ['DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 'TRUNCATE']
     
-    async def execute_query(self, sql: str) -> QueryResult:
+    # Incremental refresh needs a plain filter/sort/limit over inventory_items alone
+    INCREMENTAL_FROM = re.compile(
+        r'\bFROM\s+inventory_items(?:\s+(?:AS\s+)?(?!(?:WHERE|ORDER|LIMIT)\b)(\w+))?'
+        r'(?=\s+(?:WHERE|ORDER|LIMIT)\b|\s*;?\s*$)',
+        re.IGNORECASE
+    )
+    INCREMENTAL_BLOCKERS = re.compile(
+        r'\bJOIN\b|\bGROUP\s+BY\b|\bDISTINCT\b|\bUNION\b|\bHAVING\b|\bOFFSET\b|\(\s*SELECT\b'
+        r'|\b(?:COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(',
+        re.IGNORECASE
+    )
+    LIMIT_CLAUSE = re.compile(r'\bLIMIT\s+(\d+)\s*;?\s*$', re.IGNORECASE)
+    
+    def __init__(self):
+        self._single_flight = SingleFlight('executor')
+    
+    async def execute_query(self, sql: str, params: Optional[Sequence[Any]] = None) -> QueryResult:
         """Execute a read-only SQL query against the inventory database.
         
-        This service ensures queries are safe and read-only.
+        This service ensures queries are safe and read-only. ``params`` are
+        bound to the query's ``?`` placeholders.
         """
         start_time = time.time()
-        logger.info('Executing inventory query', {'sql': sql})
+        params = list(params or [])
+        logger.info('Executing inventory query', {'sql': sql, 'params': params})
         
         try:
-            # Basic safety check: ensure query is SELECT only
-            normalized_sql = sql.strip().upper()
-            if not normalized_sql.startswith('SELECT'):
-                raise ValueError('Only SELECT queries are allowed')
-            
-            # Check for dangerous keywords (as standalone words, not substrings)
-            for keyword in self.DANGEROUS_KEYWORDS:
-                keyword_regex = re.compile(rf'\b{keyword}\b', re.IGNORECASE)
-                if keyword_regex.search(normalized_sql):
-                    raise ValueError(f'Query contains forbidden keyword: {keyword}')
+            self.validate_read_only(sql)
             
             # Convert PostgreSQL-style SQL to SQLite-compatible SQL
-            sqlite_sql = self._convert_to_sqlite(sql)
+            sqlite_sql = self.convert_to_sqlite(sql)
             
-            # Execute query
-            result = query(sqlite_sql)
-            execution_time_ms = int((time.time() - start_time) * 1000)
+            # Identical SQL + parameters at the same data version reuse a cached result
+            key = cache_key(sqlite_sql, params)
+            version = data_version()
+            result_set = result_cache.get(key, version)
+            cached = result_set is not None
             
-            # Map SQLite results to InventoryItem format
-            rows = []
-            for row in result['rows']:
-                rows.append({
-                    'id': row.get('id'),
-                    'sku': row.get('sku'),
-                    'name': row.get('name'),
-                    'categoryId': row.get('categoryId') or row.get('category_id'),
-                    'locationId': row.get('locationId') or row.get('location_id'),
-                    'currentStock': row.get('currentStock') or row.get('current_stock') or 0,
-                    'reorderThreshold': row.get('reorderThreshold') or row.get('reorder_threshold') or 0,
-                    'recentSalesVolume': row.get('recentSalesVolume') or row.get('recent_sales_volume') or 0,
-                    'createdAt': row.get('createdAt') or row.get('created_at'),
-                    'updatedAt': row.get('updatedAt') or row.get('updated_at'),
-                })
+            # Execute query; rows are mapped to InventoryItem format per cursor,
+            # not per row (see ResultSet.from_cursor). Concurrent executions of
+            # the same SQL and parameters share one cursor pass.
+            if result_set is None:
+                result_set = await self._single_flight.do(
+                    key, lambda: self._run_and_cache(key, version, sqlite_sql, params)
+                )
+            execution_time_ms = int((time.time() - start_time) * 1000)
             
             logger.info('Query executed successfully', {
-                'rowCount': len(rows),
+                'rowCount': len(result_set),
                 'executionTimeMs': execution_time_ms,
+                'cached': cached,
             })
             
             return QueryResult(
-                rows=rows,
-                row_count=len(rows),
-                execution_time_ms=execution_time_ms
+                result_set=result_set,
+                row_count=len(result_set),
+                execution_time_ms=execution_time_ms,
+                cached=cached
             )
         except Exception as e:
             execution_time_ms = int((time.time() - start_time) * 1000)
@@ -86,7 +108,298 @@ class InventoryQueryExecutor:
             })
             raise
     
-    def _convert_to_sqlite(self, sql: str) -> str:
+    async def execute_speculative(self, sql: str, params: Optional[Sequence[Any]] = None) -> QueryResult:
+        """Execute a query on a private read-only connection in a worker thread.
+        
+        Used to run a rewritten draft while its review is still in progress;
+        the result is cached like ``execute_query``'s. Cancelling the
+        returned awaitable interrupts the SQLite statement.
+        """
+        params = list(params or [])
+        self.validate_read_only(sql)
+        sqlite_sql = self.convert_to_sqlite(sql)
+        version = data_version()
+        
+        start_time = time.time()
+        conn = get_database().connect_read_only()
+        try:
+            result_set = await asyncio.to_thread(
+                self._run_read_only, conn, *self._physical(sqlite_sql, params)
+            )
+        except asyncio.CancelledError:
+            try:
+                conn.interrupt()
+            except sqlite3.ProgrammingError:
+                pass  # Already finished and closed
+            raise
+        result_cache.put(cache_key(sqlite_sql, params), version, result_set)
+        
+        execution_time_ms = int((time.time() - start_time) * 1000)
+        logger.info('Speculative query executed', {
+            'rowCount': len(result_set),
+            'executionTimeMs': execution_time_ms,
+        })
+        return QueryResult(
+            result_set=result_set,
+            row_count=len(result_set),
+            execution_time_ms=execution_time_ms
+        )
+    
+    async def execute_snapshot(
+        self, statements: Sequence[Tuple[str, Sequence[Any]]]
+    ) -> List[Union[QueryResult, Exception]]:
+        """Execute several queries against one consistent read snapshot.
+        
+        All statements run in a single read transaction on a private read-only
+        connection, so they see the same committed data even if writes land
+        in between. A failing statement yields its exception in place of a
+        result; the others still run.
+        """
+        prepared: List[Union[Tuple[str, List[Any]], Exception]] = []
+        for sql, params in statements:
+            try:
+                self.validate_read_only(sql)
+                prepared.append(self._physical(self.convert_to_sqlite(sql), list(params or [])))
+            except ValueError as e:
+                prepared.append(e)
+        
+        start_time = time.time()
+        conn = get_database().connect_read_only()
+        results = await asyncio.to_thread(self._run_snapshot, conn, prepared)
+        logger.info('Snapshot batch executed', {
+            'statements': len(prepared),
+            'failed': sum(1 for r in results if isinstance(r, Exception)),
+            'executionTimeMs': int((time.time() - start_time) * 1000),
+        })
+        return results
+    
+    def _run_snapshot(self, conn: sqlite3.Connection,
+                      prepared: List[Union[Tuple[str, List[Any]], Exception]]) -> List[Union[QueryResult, Exception]]:
+        """Run prepared statements inside one read transaction on ``conn``."""
+        # The shared connection (in-memory databases) cannot hold a private transaction
+        private = conn is not get_database().conn
+        results: List[Union[QueryResult, Exception]] = []
+        try:
+            if private:
+                conn.execute('BEGIN')
+            for item in prepared:
+                if isinstance(item, Exception):
+                    results.append(item)
+                    continue
+                sqlite_sql, params = item
+                start_time = time.time()
+                try:
+                    cursor = conn.cursor()
+                    cursor.row_factory = None
+                    cursor.execute(sqlite_sql, params)
+                    result_set = ResultSet.from_cursor(cursor)
+                except sqlite3.Error as e:
+                    results.append(e)
+                    continue
+                results.append(QueryResult(
+                    result_set=result_set,
+                    row_count=len(result_set),
+                    execution_time_ms=int((time.time() - start_time) * 1000),
+                ))
+        finally:
+            if private:
+                conn.rollback()
+                conn.close()
+        return results
+    
+    async def execute_incremental(
+        self, sql: str, params: Optional[Sequence[Any]], previous: Optional[ResultVersion]
+    ) -> Tuple[QueryResult, ResultVersion]:
+        """Re-execute a query, re-reading only rows changed since ``previous``.
+        
+        When the query shape allows it (see ``_incremental_sql``), the query
+        runs restricted to the previous result rows plus the rows whose
+        ``updated_at`` is not older than the previous watermark. Otherwise, or
+        without a previous version, it runs in full. Returns the result and
+        the new version to diff the next refresh against.
+        """
+        start_time = time.time()
+        params = list(params or [])
+        self.validate_read_only(sql)
+        sqlite_sql = self.convert_to_sqlite(sql)
+        
+        conn = get_database().read_connection()
+        version = data_version()
+        watermark = self.watermark()
+        
+        result_set = None
+        if previous is not None and previous.data_version == version:
+            # Nothing was written since the previous run
+            result_set = previous.result_set
+        elif previous is not None:
+            restricted = self._incremental_sql(conn, sqlite_sql, params, previous)
+            if restricted is not None:
+                result_set = query_result_set(*restricted)
+        
+        incremental = result_set is not None
+        if result_set is None:
+            result_set = await self._run(sqlite_sql, params)
+        metrics.increment('executor.incremental.hits' if incremental else 'executor.incremental.fullRuns')
+        
+        execution_time_ms = int((time.time() - start_time) * 1000)
+        logger.info('Versioned query executed', {
+            'rowCount': len(result_set),
+            'executionTimeMs': execution_time_ms,
+            'incremental': incremental,
+        })
+        return (
+            QueryResult(
+                result_set=result_set,
+                row_count=len(result_set),
+                execution_time_ms=execution_time_ms,
+                incremental=incremental
+            ),
+            ResultVersion(uuid.uuid4().hex, result_set, version, watermark),
+        )
+    
+    def watermark(self) -> Optional[str]:
+        """Latest ``updated_at`` in inventory_items (read before a versioned run)."""
+        return get_database().read_connection().execute(
+            'SELECT MAX(updated_at) FROM inventory_items'
+        ).fetchone()[0]
+    
+    def _incremental_sql(self, conn: sqlite3.Connection, sqlite_sql: str, params: List[Any],
+                         previous: ResultVersion) -> Optional[Tuple[str, List[Any]]]:
+        """SQL and parameters re-reading only candidate rows, or None for a full run.
+        
+        Candidates are the previous result rows plus the rows changed since
+        its watermark; ``inventory_items`` is replaced by a subquery limited
+        to their ids. Rows outside both sets neither changed nor qualified
+        (or ranked below the previous rows), so the restricted query returns
+        the same rows as a full run. That does not hold when a row of a
+        LIMIT-full previous result changed or was deleted (its replacement may
+        be any unchanged row), and does not pay off when too many rows changed.
+        """
+        if self.INCREMENTAL_BLOCKERS.search(sqlite_sql) or previous.watermark is None:
+            return None
+        matches = list(self.INCREMENTAL_FROM.finditer(sqlite_sql))
+        if len(matches) != 1 or len(re.findall(r'\bFROM\b', sqlite_sql, re.IGNORECASE)) != 1:
+            return None
+        previous_ids = previous.result_set.column('id')
+        if None in previous_ids:
+            return None
+        
+        changed = conn.execute(
+            'SELECT id FROM inventory_items WHERE updated_at >= ?', (previous.watermark,)
+        ).fetchmany(config.INCREMENTAL_MAX_CHANGED_ROWS + 1)
+        if len(changed) > config.INCREMENTAL_MAX_CHANGED_ROWS:
+            return None
+        changed_ids = {row[0] for row in changed}
+        
+        limit = self.LIMIT_CLAUSE.search(sqlite_sql)
+        if limit and len(previous_ids) >= int(limit.group(1)):
+            if not changed_ids.isdisjoint(previous_ids):
+                return None
+            placeholders = ', '.join('?' * len(previous_ids))
+            remaining = conn.execute(
+                f'SELECT COUNT(*) FROM inventory_items WHERE id IN ({placeholders})', previous_ids
+            ).fetchone()[0]
+            if remaining != len(previous_ids):
+                return None
+        
+        candidates = list(dict.fromkeys([*previous_ids, *changed_ids]))
+        if not candidates:
+            candidates = [None]  # Nothing can qualify; keep the query valid
+        match = matches[0]
+        alias = match.group(1) or 'inventory_items'
+        placeholders = ', '.join('?' * len(candidates))
+        restricted_sql = (
+            sqlite_sql[:match.start()]
+            + f'FROM (SELECT * FROM inventory_items WHERE id IN ({placeholders})) AS {alias}'
+            + sqlite_sql[match.end():]
+        )
+        # Candidate ids bind after the placeholders that precede FROM
+        position = sqlite_sql.count('?', 0, match.start())
+        return restricted_sql, params[:position] + candidates + params[position:]
+    
+    def _run_read_only(self, conn: sqlite3.Connection, sqlite_sql: str,
+                       params: Sequence[Any] = ()) -> ResultSet:
+        """Run converted SQL on ``conn`` and close it (unless it is the shared connection)."""
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(sqlite_sql, list(params))
+            return ResultSet.from_cursor(cursor)
+        finally:
+            if conn is not get_database().conn:
+                conn.close()
+    
+    def validate_read_only(self, sql: str) -> None:
+        """Raise ValueError unless ``sql`` is a SELECT without modifying keywords."""
+        # Basic safety check: ensure query is SELECT only
+        normalized_sql = sql.strip().upper()
+        if not normalized_sql.startswith('SELECT'):
+            raise ValueError('Only SELECT queries are allowed')
+        
+        # Check for dangerous keywords (as standalone words, not substrings)
+        for keyword in self.DANGEROUS_KEYWORDS:
+            keyword_regex = re.compile(rf'\b{keyword}\b', re.IGNORECASE)
+            if keyword_regex.search(normalized_sql):
+                raise ValueError(f'Query contains forbidden keyword: {keyword}')
+    
+    async def _run(self, sqlite_sql: str, params: List[Any]) -> ResultSet:
+        """Run converted SQL against the database.
+        
+        With partitioned storage, supported shapes run on the shard files in
+        parallel; everything else reads the attached view.
+        """
+        db = get_database()
+        partitions = db.partitions
+        if partitions is not None and partitions.layout is not None and config.PARTITION_PARALLEL:
+            plan = shard_executor.plan(partitions.layout, sqlite_sql, params)
+            if plan is not None:
+                try:
+                    return await shard_executor.run(partitions.layout, db.db_path, plan)
+                except sqlite3.OperationalError as e:
+                    # A rewrite the shards cannot run; the attached view is authoritative
+                    metrics.increment('partitions.parallelFallbacks')
+                    logger.warn('Parallel shard query failed; reading the attached view', {
+                        'error': str(e),
+                        'sql': sqlite_sql[:200],
+                    })
+            metrics.increment('partitions.attachQueries')
+        return query_result_set(*self._physical(sqlite_sql, params))
+    
+    async def _run_and_cache(self, key, version: str, sqlite_sql: str, params: List[Any]) -> ResultSet:
+        """Run converted SQL and cache the result under the version read before running it."""
+        result_set = await self._run(sqlite_sql, params)
+        result_cache.put(key, version, result_set)
+        return result_set
+    
+    def rewrite(self, sql: str, params: Optional[Sequence[Any]] = None) -> QueryRewrite:
+        """Rewrite a reviewed draft before it is stored and executed (see ``QueryRewriter``).
+        
+        Never raises: when rewriting is disabled or fails, the draft comes
+        back unchanged.
+        """
+        params = list(params or [])
+        if not config.QUERY_REWRITE:
+            return QueryRewrite(sql, params, [])
+        try:
+            self.validate_read_only(sql)
+            return query_rewriter.rewrite(self.convert_to_sqlite(sql), params)
+        except Exception as e:
+            logger.warn('Query rewrite failed; executing the draft as is', {'error': str(e)})
+            return QueryRewrite(sql, params, [])
+    
+    def _physical(self, sqlite_sql: str, params: List[Any]) -> Tuple[str, List[Any]]:
+        """SQL and parameters to execute for converted SQL (columns/joins pruned, LIMIT pushed down)."""
+        if config.QUERY_REWRITE:
+            try:
+                physical = query_rewriter.physical(sqlite_sql, params)
+            except Exception as e:
+                logger.warn('Query rewrite failed; executing the query as is', {'error': str(e)})
+                physical = None
+            if physical is not None:
+                return physical
+        return sqlite_sql, params
+    
+    def convert_to_sqlite(self, sql: str) -> str:
         """Convert PostgreSQL-style SQL to SQLite-compatible SQL."""
         sqlite_sql = sql
         
@@ -3,12 +3,6 @@ import logging
 import sys
 import os
 from typing import Any, Dict
-from pathlib import Path
-
-# Add src to path for imports
-_src_path = Path(__file__).parent.parent.parent
-if str(_src_path) not in sys.path:
-    sys.path.insert(0, str(_src_path))
 
 try:
     from config import config
@@ -0,0 +1 @@
+"""Metrics services package."""
@@ -0,0 +1,29 @@
+"""Rolling latency window with percentile estimates."""
+import threading
+from collections import deque
+from typing import Optional
+
+
+class LatencyWindow:
+    """Keep the last ``size`` latency samples (in seconds) and report percentiles."""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Add one latency sample."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, fraction: float, min_samples: int = 1) -> Optional[float]:
+        """Return the ``fraction`` (0-1) percentile, or None with too few samples."""
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+        return ordered[index]
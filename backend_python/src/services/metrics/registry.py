@@ -0,0 +1,54 @@
+"""In-process metrics registry (counters and gauges)."""
+import threading
+from typing import Callable, Dict, Optional
+
+
+class MetricsRegistry:
+    """Thread-safe registry of counters and gauges.
+
+    Gauges may be set directly or registered as callables that are evaluated
+    when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._gauge_fns: Dict[str, Callable[[], float]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to a fixed value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def register_gauge(self, name: str, fn: Callable[[], float]) -> None:
+        """Register a gauge computed on demand."""
+        with self._lock:
+            self._gauge_fns[name] = fn
+
+    def counter(self, name: str) -> float:
+        """Return the current value of a counter."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+        """Return all counters and gauges, optionally filtered by name prefix."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            gauge_fns = dict(self._gauge_fns)
+        for name, fn in gauge_fns.items():
+            gauges[name] = fn()
+        if prefix:
+            counters = {k: v for k, v in counters.items() if k.startswith(prefix)}
+            gauges = {k: v for k, v in gauges.items() if k.startswith(prefix)}
+        return {'counters': counters, 'gauges': gauges}
+
+
+# Global instance
+metrics = MetricsRegistry()
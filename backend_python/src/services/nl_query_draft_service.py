@@ -1,23 +1,34 @@
 """Natural Language Query Draft Service with Reflection Pattern."""
+import asyncio
 import json
-import re
-import sys
-from pathlib import Path
-from typing import Dict, Any, List, Optional
-from openai import OpenAI
-
-# Add src to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+import time
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Set, Tuple
 
 from config import config
+from models.inventory_query_session import ReviewFindings
+from services.circuit_breaker import CircuitBreaker
+from services.intent_parser import ParsedQuery, intent_parser
+from services.inventory_query_executor import QueryResult, inventory_query_executor
 from services.logging.logger import logger_instance as logger
+from services.metrics.latency_window import LatencyWindow
+from services.metrics.registry import metrics
+from services.query_static_review import QueryStaticReviewer, StaticReview
+from services.schema_prompt import schema_prompt_builder
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
 
 class DraftQuery:
     """Draft query model."""
     def __init__(self, sql: str, intent: str, entities: List[str], 
                  filters: Dict[str, Any], reasoning: Optional[str] = None,
-                 critique: Optional[str] = None, revised: bool = False):
+                 critique: Optional[str] = None, revised: bool = False,
+                 review_findings: Optional[ReviewFindings] = None,
+                 speculative_result: Optional[QueryResult] = None,
+                 speculative_query: Optional[Tuple[str, List[Any]]] = None,
+                 source: str = 'llm', params: Optional[List[Any]] = None,
+                 confidence: Optional[float] = None, limit_requested: Optional[bool] = None):
         self.sql = sql
         self.intent = intent
         self.entities = entities
@@ -25,70 +36,66 @@ class DraftQuery:
         self.reasoning = reasoning
         self.critique = critique
         self.revised = revised
+        self.review_findings = review_findings
+        # Result of running ``speculative_query`` (the rewritten ``sql`` and its
+        # parameters) while the draft was being reviewed, if kept
+        self.speculative_result = speculative_result
+        self.speculative_query = speculative_query
+        # Which drafting path produced this draft ('rules', 'llm', 'llm-hedge', 'keywords', 'keywords-hedge')
+        self.source = source
+        # Positional parameters for ``sql`` (local drafts bind values instead of inlining them)
+        self.params = params or []
+        # Local parser confidence (0-1); None for LLM drafts
+        self.confidence = confidence
+        # Whether the outer LIMIT is a row count the question asked for (not the
+        # row cap); None until the rewrite stage decides for LLM drafts
+        self.limit_requested = limit_requested
+        # SQL and parameters actually executed (``sql`` after the pipeline's rewrite stage)
+        self.final_sql = sql
+        self.final_params = self.params
 
 
 class NLQueryDraftService:
     """Service for generating SQL queries from natural language using GPT."""
     
-    DATABASE_SCHEMA = """
-Database Schema for SQLite:
-
-Table: inventory_items
-Columns:
-- id TEXT PRIMARY KEY
-- sku TEXT NOT NULL (Stock Keeping Unit)
-- name TEXT NOT NULL (Product name)
-- category_id TEXT (Foreign key to product_categories.id)
-- location_id TEXT (Foreign key to locations.id)
-- current_stock INTEGER (Current quantity in stock)
-- reorder_threshold INTEGER (Minimum stock level before reordering)
-- recent_sales_volume INTEGER (Sales volume for recent period)
-- created_at TEXT (Timestamp)
-- updated_at TEXT (Timestamp)
-
-Table: product_categories
-Columns:
-- id TEXT PRIMARY KEY
-- name TEXT NOT NULL (Category name: 'Electronics', 'Clothing', 'Home & Garden')
-- parent_category_id TEXT (For hierarchical categories)
-
-Table: locations
-Columns:
-- id TEXT PRIMARY KEY
-- name TEXT NOT NULL (Location name: 'Main Warehouse', 'Store Downtown', 'Store Uptown')
-- type TEXT (Location type: 'warehouse', 'store')
-- parent_location_id TEXT (For hierarchical locations)
-
-Sample Data:
-- Electronics products: 'Laptop Computer', 'Smartphone', 'Tablet', 'Headphones' (category_id='cat-1')
-- Clothing products: 'T-Shirt', 'Jeans', 'Jacket' (category_id='cat-3')
-- Home & Garden products: 'Garden Tool Set', 'Lawn Mower', 'Plant Pot' (category_id='cat-2')
-
-CRITICAL SQL Rules for SQLite:
-1. ONLY SELECT queries allowed - NO modifications
-2. Use simple table aliases: i for inventory_items, c for product_categories, l for locations
-3. Always use LEFT JOIN for optional relationships
-4. Column aliases MUST use camelCase: current_stock as currentStock
-5. WHERE clauses must use exact column names from schema
-6. Category filter example: WHERE c.name = 'Electronics'
-7. Always include these columns in SELECT: i.id, i.sku, i.name, i.category_id as categoryId, i.location_id as locationId, i.current_stock as currentStock, i.reorder_threshold as reorderThreshold, i.recent_sales_volume as recentSalesVolume
-8. Default LIMIT 50, Maximum LIMIT 100
-9. SQLite syntax only - no PostgreSQL-specific functions
-
-Example Query:
-SELECT i.id, i.sku, i.name, i.category_id as categoryId, i.current_stock as currentStock
-FROM inventory_items i
-LEFT JOIN product_categories c ON i.category_id = c.id
-WHERE c.name = 'Electronics'
-ORDER BY i.recent_sales_volume DESC
-LIMIT 10;
-"""
-    
     def __init__(self):
-        """Initialize the service with OpenAI client if configured."""
-        self.openai: Optional[OpenAI] = None
+        """Initialize the service; the OpenAI client is created lazily."""
+        self.static_reviewer = QueryStaticReviewer(schema_prompt_builder.columns_by_table)
+        self._llm_latency = LatencyWindow()
+        self.breaker = CircuitBreaker(
+            'openai',
+            window_size=config.openai.BREAKER_WINDOW,
+            min_calls=config.openai.BREAKER_MIN_CALLS,
+            error_rate_threshold=config.openai.BREAKER_ERROR_RATE,
+            open_seconds=config.openai.BREAKER_OPEN_SECONDS,
+            default_timeout=config.openai.TIMEOUT_DEFAULT_S,
+            min_timeout=config.openai.TIMEOUT_MIN_S,
+            max_timeout=config.openai.TIMEOUT_MAX_S,
+            timeout_multiplier=config.openai.TIMEOUT_P99_MULTIPLIER,
+        )
         
+        self._openai: Optional['OpenAI'] = None
+        self._openai_initialized = False
+    
+    @property
+    def openai(self) -> Optional['OpenAI']:
+        """OpenAI client, created (and the ``openai`` package imported) on first use."""
+        if not self._openai_initialized:
+            self._openai = self._create_client()
+            self._openai_initialized = True
+        return self._openai
+    
+    @openai.setter
+    def openai(self, client: Optional['OpenAI']) -> None:
+        self._openai = client
+        self._openai_initialized = True
+    
+    def _create_client(self) -> Optional['OpenAI']:
+        """Create the OpenAI client if configured."""
+        client = None
         if config.openai.API_KEY and config.openai.ENABLED:
+            from openai import OpenAI
+            
             if config.openai.IS_AZURE:
                 # Azure OpenAI configuration
                 # The endpoint might be a full URL or just the base
@@ -119,10 +126,11 @@ LIMIT 10;
                     os.environ.pop('http_proxy', None)
                     os.environ.pop('https_proxy', None)
                     
-                    self.openai = OpenAI(
+                    client = OpenAI(
                         api_key=config.openai.API_KEY,
                         base_url=base_url,
                         default_query={'api-version': config.openai.API_VERSION},
+                        max_retries=config.openai.MAX_RETRIES,
                     )
                     logger.info('Azure OpenAI GPT integration enabled', {
                         'deployment': config.openai.DEPLOYMENT,
@@ -132,18 +140,20 @@ LIMIT 10;
                 except Exception as e:
                     logger.error(f'Failed to initialize Azure OpenAI client: {e}', {'error_type': type(e).__name__})
                     logger.warn('Falling back to keyword-based query generation')
-                    self.openai = None
+                    client = None
             else:
                 # Standard OpenAI configuration
                 try:
-                    self.openai = OpenAI(api_key=config.openai.API_KEY)
+                    client = OpenAI(api_key=config.openai.API_KEY, max_retries=config.openai.MAX_RETRIES)
                     logger.info('OpenAI GPT integration enabled', {'model': config.openai.MODEL})
                 except Exception as e:
                     logger.error(f'Failed to initialize OpenAI client: {e}', {'error_type': type(e).__name__})
                     logger.warn('Falling back to keyword-based query generation')
-                    self.openai = None
+                    client = None
         else:
             logger.warn('OpenAI GPT disabled - using keyword-based fallback')
+        
+        return client
     
     async def generate_draft(self, natural_language_query: str) -> DraftQuery:
         """Generate a draft SQL query from natural language input using GPT.
@@ -155,59 +165,253 @@ LIMIT 10;
             'usingGPT': self.openai is not None
         })
         
-        # Try GPT-based generation if available
-        if self.openai:
-            try:
-                # Step 1: Generate initial draft with GPT
-                draft = await self._generate_with_gpt(natural_language_query)
-                
-                # Step 2: Self-review and critique the draft
-                critique = await self._critique_query(natural_language_query, draft)
-                
-                # Step 3: Revise if necessary based on critique
-                if critique['needsRevision']:
-                    logger.info('Query needs revision', {'reason': critique['issues']})
-                    revised = await self._revise_query(natural_language_query, draft, critique)
-                    return DraftQuery(
-                        sql=revised.sql,
-                        intent=revised.intent,
-                        entities=revised.entities,
-                        filters=revised.filters,
-                        reasoning=revised.reasoning,
-                        critique='; '.join(critique['issues']),
-                        revised=True
-                    )
-                
-                return DraftQuery(
-                    sql=draft.sql,
-                    intent=draft.intent,
-                    entities=draft.entities,
-                    filters=draft.filters,
-                    reasoning=draft.reasoning,
-                    critique='No issues found',
-                    revised=False
-                )
-            except Exception as e:
-                logger.error('GPT generation failed, falling back to keyword-based', {
-                    'error': str(e)
+        # Questions the local parser fully explains skip the LLM round-trip
+        parsed = intent_parser.parse(natural_language_query)
+        draft = self._draft_from_rules(parsed)
+        
+        # Otherwise try GPT-based generation if available, bounded by the hedging deadline.
+        # While the circuit breaker is open requests go straight to the local path.
+        if draft is None:
+            if self.openai and self.breaker.allows_traffic():
+                draft = await self._race_drafts(natural_language_query)
+            else:
+                if self.openai:
+                    metrics.increment('draftService.breakerShortCircuits')
+                # Fallback to keyword-based generation
+                draft = self._draft_from_parse(parsed, 'keywords')
+        
+        metrics.increment(f'draftService.source.{draft.source}')
+        return draft
+    
+    def expected_llm_calls(self, natural_language_query: str) -> int:
+        """LLM calls ``generate_draft`` is expected to make for a question (for admission).
+        
+        Zero when the local parser answers it or the LLM is unavailable;
+        otherwise the draft, critique and revision calls are all counted.
+        """
+        if not self.openai or not self.breaker.allows_traffic():
+            return 0
+        if intent_parser.parse(natural_language_query).confidence >= config.INTENT_CONFIDENCE_THRESHOLD:
+            return 0
+        return config.ADMISSION_LLM_CALLS_PER_DRAFT
+    
+    def _hedge_deadline(self) -> float:
+        """Seconds to wait for the LLM before hedging, from observed draft latency."""
+        observed = self._llm_latency.percentile(
+            config.DRAFT_HEDGE_PERCENTILE, min_samples=config.DRAFT_HEDGE_MIN_SAMPLES
+        )
+        if observed is None:
+            return config.DRAFT_HEDGE_DEFAULT_MS / 1000
+        return max(config.DRAFT_HEDGE_MIN_MS / 1000, observed)
+    
+    def _start_llm_draft(self, natural_language_query: str, source: str) -> asyncio.Task:
+        """Start a reflection-pattern draft attempt tagged with ``source``."""
+        return asyncio.create_task(self._timed_reflection(natural_language_query, source))
+    
+    async def _timed_reflection(self, natural_language_query: str, source: str) -> DraftQuery:
+        """Run one LLM draft attempt and record its latency."""
+        started = time.monotonic()
+        try:
+            draft = await self._generate_with_reflection(natural_language_query)
+        except asyncio.CancelledError:
+            # Losing attempts are recorded too, as a lower bound, so the
+            # deadline does not drift down to only the fast samples
+            self._llm_latency.record(time.monotonic() - started)
+            raise
+        self._llm_latency.record(time.monotonic() - started)
+        draft.source = source
+        return draft
+    
+    async def _race_drafts(self, natural_language_query: str) -> DraftQuery:
+        """Race the LLM draft against a deadline-triggered hedge.
+        
+        The LLM draft starts immediately. If it has not answered within the
+        percentile-based deadline, an optional second LLM request is fired
+        and, after a short grace period, the keyword draft is computed. The
+        first valid draft wins and the other attempts are cancelled.
+        """
+        pending = {self._start_llm_draft(natural_language_query, 'llm')}
+        timeout: Optional[float] = self._hedge_deadline()
+        hedged = False
+        
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=timeout,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    self._cancel_all(pending)
+                    return task.result()
+                logger.error('GPT generation failed', {'error': str(task.exception())})
+            
+            if done:
+                continue
+            
+            # Deadline passed without an answer
+            if config.DRAFT_HEDGE_LLM and not hedged:
+                hedged = True
+                metrics.increment('draftService.hedge.llmRequests')
+                pending.add(self._start_llm_draft(natural_language_query, 'llm-hedge'))
+                timeout = config.DRAFT_HEDGE_GRACE_MS / 1000
+                continue
+            
+            keyword_draft = self._generate_with_keywords(natural_language_query)
+            if self.static_reviewer.review(keyword_draft.sql, keyword_draft.params).passed:
+                logger.warn('LLM draft exceeded deadline, using keyword draft', {
+                    'deadlineMs': int(self._hedge_deadline() * 1000),
                 })
-                return self._generate_with_keywords(natural_language_query)
+                self._cancel_all(pending)
+                keyword_draft.source = 'keywords-hedge'
+                return keyword_draft
+            # Keyword draft is not usable; keep waiting for the LLM
+            timeout = None
         
-        # Fallback to keyword-based generation
+        logger.warn('All GPT attempts failed, falling back to keyword-based generation')
         return self._generate_with_keywords(natural_language_query)
     
+    def _cancel_all(self, tasks: Set[asyncio.Task]) -> None:
+        """Cancel losing draft attempts."""
+        for task in tasks:
+            task.cancel()
+    
+    async def _generate_with_reflection(self, natural_language_query: str) -> DraftQuery:
+        """Generate a draft with GPT: Draft → Self-Review → Finalize."""
+        # Step 1: Generate initial draft with GPT
+        draft = await self._generate_with_gpt(natural_language_query)
+        
+        # Step 2a: Cheap local static review; the LLM critique only runs
+        # when it finds problems
+        static_review = self.static_reviewer.review(draft.sql)
+        if static_review.passed:
+            metrics.increment('draftService.critique.skipped')
+            logger.info('Local static review passed, skipping LLM critique', {
+                'critiqueCallsSaved': metrics.counter('draftService.critique.skipped'),
+            })
+            return DraftQuery(
+                sql=draft.sql,
+                intent=draft.intent,
+                entities=draft.entities,
+                filters=draft.filters,
+                reasoning=draft.reasoning,
+                critique='Local static review passed',
+                revised=False,
+                review_findings=self._review_findings(static_review, 'skipped')
+            )
+        
+        # Step 2b: Self-review and critique the draft, speculatively
+        # executing it in parallel when it is at least read-only
+        speculation = None
+        speculative_query = None
+        if config.SPECULATIVE_EXECUTION and static_review.safety_checks['isReadOnly']:
+            # Run what the pipeline will execute: the draft after the rewrite stage
+            rewrite = inventory_query_executor.rewrite(draft.sql, draft.params)
+            speculative_query = (rewrite.sql, rewrite.params)
+            speculation = asyncio.create_task(inventory_query_executor.execute_speculative(*speculative_query))
+        
+        metrics.increment('draftService.critique.calls')
+        try:
+            critique = await self._critique_query(natural_language_query, draft, static_review.issues)
+        except BaseException:
+            self._discard_speculation(speculation)
+            raise
+        
+        # Step 3: Revise if necessary based on critique
+        if critique['needsRevision']:
+            self._discard_speculation(speculation)
+            logger.info('Query needs revision', {'reason': critique['issues']})
+            revised = await self._revise_query(natural_language_query, draft, critique)
+            return DraftQuery(
+                sql=revised.sql,
+                intent=revised.intent,
+                entities=revised.entities,
+                filters=revised.filters,
+                reasoning=revised.reasoning,
+                critique='; '.join(critique['issues']),
+                revised=True,
+                review_findings=self._review_findings(
+                    self.static_reviewer.review(revised.sql), 'escalated',
+                    adjustments=critique['issues']
+                )
+            )
+        
+        return DraftQuery(
+            sql=draft.sql,
+            intent=draft.intent,
+            entities=draft.entities,
+            filters=draft.filters,
+            reasoning=draft.reasoning,
+            critique='No issues found',
+            revised=False,
+            review_findings=self._review_findings(static_review, 'escalated'),
+            speculative_result=await self._collect_speculation(speculation),
+            speculative_query=speculative_query,
+        )
+    
+    def _discard_speculation(self, speculation: Optional[asyncio.Task]) -> None:
+        """Cancel a speculative execution whose draft will not be used."""
+        if speculation is not None:
+            speculation.cancel()
+            metrics.increment('draftService.speculation.discarded')
+    
+    async def _collect_speculation(self, speculation: Optional[asyncio.Task]) -> Optional[QueryResult]:
+        """Return the speculative result for an approved draft, or None if it failed."""
+        if speculation is None:
+            return None
+        try:
+            result = await speculation
+        except Exception as e:
+            logger.warn('Speculative execution failed, will execute normally', {'error': str(e)})
+            metrics.increment('draftService.speculation.failed')
+            return None
+        metrics.increment('draftService.speculation.kept')
+        return result
+    
+    def _review_findings(self, review: StaticReview, decision: str,
+                         adjustments: Optional[List[str]] = None) -> ReviewFindings:
+        """Record the static review outcome and critique decision."""
+        return ReviewFindings(
+            flags=list(review.issues),
+            adjustments=list(adjustments or []),
+            safetyChecks=review.safety_checks,
+            critiqueDecision=decision,
+        )
+    
+    async def _complete(self, **kwargs: Any) -> Any:
+        """Run a chat completion through the circuit breaker without blocking the event loop.
+        
+        The OpenAI client is synchronous; calls run in a worker thread so that
+        concurrent requests (and coalesced waiters) keep being served. Each
+        call gets a timeout derived from observed p99 latency.
+        """
+        probe = self.breaker.acquire()
+        timeout = self.breaker.call_timeout()
+        started = time.monotonic()
+        try:
+            completion = await asyncio.wait_for(
+                asyncio.to_thread(self.openai.chat.completions.create, timeout=timeout, **kwargs),
+                timeout=timeout
+            )
+        except asyncio.CancelledError:
+            # Cancelled by a hedge winner; not the provider's fault
+            self.breaker.release(probe)
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success(time.monotonic() - started)
+        return completion
+    
     async def _generate_with_gpt(self, natural_language_query: str) -> DraftQuery:
         """Generate SQL using GPT (Step 1: Draft)."""
         model_or_deployment = config.openai.DEPLOYMENT if config.openai.IS_AZURE else config.openai.MODEL
         
-        completion = self.openai.chat.completions.create(
+        completion = await self._complete(
             model=model_or_deployment,
             messages=[
                 {
                     'role': 'system',
                     'content': f"""You are an expert SQL query generator for an inventory management system.
 
-{self.DATABASE_SCHEMA}
+{schema_prompt_builder.render(natural_language_query)}
 
 Your task:
 1. Convert natural language queries to SELECT-only SQL queries
@@ -215,7 +419,7 @@ Your task:
 3. Apply appropriate filters, sorting, and limits
 4. Return results in JSON format with:
    - sql: The SQL query
-   - intent: The query intent (e.g., 'top_sellers', 'low_stock', 'list_items')
+   - intent: The query intent (e.g., 'top_sellers', 'low_stock', 'sales_trend', 'list_items')
    - filters: Object with detected filters (e.g., {{category: 'Electronics'}})
    - reasoning: Brief explanation of your approach
 
@@ -250,11 +454,12 @@ Security Rules:
             reasoning=response.get('reasoning', '')
         )
     
-    async def _critique_query(self, natural_language_query: str, draft: DraftQuery) -> Dict[str, Any]:
+    async def _critique_query(self, natural_language_query: str, draft: DraftQuery,
+                              local_issues: Optional[List[str]] = None) -> Dict[str, Any]:
         """Critique and review the generated query (Step 2: Self-Review)."""
         model_or_deployment = config.openai.DEPLOYMENT if config.openai.IS_AZURE else config.openai.MODEL
         
-        completion = self.openai.chat.completions.create(
+        completion = await self._complete(
             model=model_or_deployment,
             messages=[
                 {
@@ -266,7 +471,7 @@ Security Rules:
 3. **Performance**: Verify appropriate indexes are used, LIMIT clauses exist
 4. **Intent Alignment**: Ensure query matches the user's request
 
-{self.DATABASE_SCHEMA}
+{schema_prompt_builder.render(natural_language_query, draft.sql)}
 
 Return JSON with:
 - needsRevision: boolean
@@ -280,6 +485,9 @@ Return JSON with:
 Generated SQL:
 {draft.sql}
 
+Local static checks reported:
+{chr(10).join(local_issues or ['(none)'])}
+
 Review this query and identify any issues."""
                 },
             ],
@@ -299,14 +507,14 @@ Review this query and identify any issues."""
         """Revise the query based on critique (Step 3: Finalize)."""
         model_or_deployment = config.openai.DEPLOYMENT if config.openai.IS_AZURE else config.openai.MODEL
         
-        completion = self.openai.chat.completions.create(
+        completion = await self._complete(
             model=model_or_deployment,
             messages=[
                 {
                     'role': 'system',
                     'content': f"""You are an expert SQL query generator. Revise the SQL query to address the identified issues.
 
-{self.DATABASE_SCHEMA}
+{schema_prompt_builder.render(natural_language_query, draft.sql)}
 
 Return JSON with the corrected query in the same format as before."""
                 },
@@ -337,135 +545,40 @@ Generate a corrected SQL query that addresses these issues."""
             reasoning=response.get('reasoning', draft.reasoning)
         )
     
-    def _generate_with_keywords(self, natural_language_query: str) -> DraftQuery:
-        """Fallback keyword-based generation (used when GPT is unavailable)."""
-        query = natural_language_query.lower().strip()
-        
-        filters: Dict[str, Any] = {}
-        
-        # Extract filters from query first
-        if 'electronics' in query or 'electronic' in query:
-            filters['category'] = 'Electronics'
-        elif 'clothing' in query or 'clothes' in query or 'apparel' in query:
-            filters['category'] = 'Clothing'
-        elif 'home' in query or 'garden' in query:
-            filters['category'] = 'Home & Garden'
-        
-        if 'last 30 days' in query or '30 days' in query:
-            filters['timeRange'] = '30 days'
-        
-        # Detect intent and generate SQL
-        if 'top' in query or 'best' in query or 'selling' in query:
-            intent = 'top_sellers'
-            sql = self._generate_top_sellers_query(query, filters)
-        elif 'low stock' in query or 'out of stock' in query or 'reorder' in query:
-            intent = 'low_stock'
-            sql = self._generate_low_stock_query(query, filters)
-        elif 'show' in query or 'list' in query or 'find' in query:
-            intent = 'list_items'
-            sql = self._generate_list_query(query, filters)
-        else:
-            intent = 'list_items'
-            sql = self._generate_list_query(query, filters)
-        
+    def _draft_from_rules(self, parsed: ParsedQuery) -> Optional[DraftQuery]:
+        """Use the local parse as the final draft when it is confident and passes review."""
+        if parsed.confidence < config.INTENT_CONFIDENCE_THRESHOLD:
+            metrics.increment('draftService.rules.lowConfidence')
+            return None
+        review = self.static_reviewer.review(parsed.sql, parsed.params)
+        if not review.passed:
+            logger.warn('Rule-based draft failed static review', {
+                'intent': parsed.intent,
+                'issues': review.issues,
+            })
+            return None
+        draft = self._draft_from_parse(parsed, 'rules')
+        draft.review_findings = self._review_findings(review, 'skipped')
+        draft.critique = 'Rule-based parse; LLM not consulted'
+        return draft
+    
+    def _draft_from_parse(self, parsed: ParsedQuery, source: str) -> DraftQuery:
+        """Wrap a local parse as a draft."""
         return DraftQuery(
-            sql=sql,
-            intent=intent,
+            sql=parsed.sql,
+            params=parsed.params,
+            intent=parsed.intent,
             entities=['InventoryItem'],
-            filters=filters,
-            reasoning='Generated using keyword-based fallback'
+            filters=parsed.filters,
+            reasoning=f"Parsed locally (confidence {parsed.confidence:.2f}) from: {', '.join(parsed.matched) or 'no recognized terms'}",
+            source=source,
+            confidence=parsed.confidence,
+            limit_requested=parsed.limit_requested,
         )
     
-    def _generate_top_sellers_query(self, query: str, filters: Dict[str, Any]) -> str:
-        """Generate top sellers query."""
-        limit = self._extract_limit(query) or 10
-        where_clauses = ['i.recent_sales_volume > 0']
-        
-        if 'category' in filters:
-            where_clauses.append(f"c.name = '{filters['category']}'")
-        
-        where_clause = ' AND '.join(where_clauses)
-        
-        return f"""
-            SELECT 
-                i.id,
-                i.sku,
-                i.name,
-                i.category_id as categoryId,
-                i.location_id as locationId,
-                i.current_stock as currentStock,
-                i.reorder_threshold as reorderThreshold,
-                i.recent_sales_volume as recentSalesVolume,
-                i.created_at as createdAt,
-                i.updated_at as updatedAt
-            FROM inventory_items i
-            LEFT JOIN product_categories c ON i.category_id = c.id
-            WHERE {where_clause}
-            ORDER BY i.recent_sales_volume DESC
-            LIMIT {limit}
-        """.strip()
-    
-    def _generate_low_stock_query(self, query: str, filters: Dict[str, Any]) -> str:
-        """Generate low stock query."""
-        where_clauses = ['i.current_stock <= i.reorder_threshold']
-        
-        if 'category' in filters:
-            where_clauses.append(f"c.name = '{filters['category']}'")
-        
-        where_clause = ' AND '.join(where_clauses)
-        
-        return f"""
-            SELECT 
-                i.id,
-                i.sku,
-                i.name,
-                i.category_id as categoryId,
-                i.location_id as locationId,
-                i.current_stock as currentStock,
-                i.reorder_threshold as reorderThreshold,
-                i.recent_sales_volume as recentSalesVolume,
-                i.created_at as createdAt,
-                i.updated_at as updatedAt
-            FROM inventory_items i
-            LEFT JOIN product_categories c ON i.category_id = c.id
-            WHERE {where_clause}
-            ORDER BY i.current_stock ASC, i.recent_sales_volume DESC
-            LIMIT 100
-        """.strip()
-    
-    def _generate_list_query(self, query: str, filters: Dict[str, Any]) -> str:
-        """Generate list query."""
-        limit = self._extract_limit(query) or 50
-        where_clauses = []
-        
-        if 'category' in filters:
-            where_clauses.append(f"c.name = '{filters['category']}'")
-        
-        where_clause = f"WHERE {' AND '.join(where_clauses)}" if where_clauses else ''
-        
-        return f"""
-            SELECT 
-                i.id,
-                i.sku,
-                i.name,
-                i.category_id as categoryId,
-                i.location_id as locationId,
-                i.current_stock as currentStock,
-                i.reorder_threshold as reorderThreshold,
-                i.recent_sales_volume as recentSalesVolume,
-                i.created_at as createdAt,
-                i.updated_at as updatedAt
-            FROM inventory_items i
-            LEFT JOIN product_categories c ON i.category_id = c.id
-            {where_clause}
-            ORDER BY i.updated_at DESC
-            LIMIT {limit}
-        """.strip()
-    
-    def _extract_limit(self, query: str) -> Optional[int]:
-        """Extract limit number from query."""
-        match = re.search(r'(\d+)', query)
-        return int(match.group(1)) if match else None
+    def _generate_with_keywords(self, natural_language_query: str) -> DraftQuery:
+        """Fallback local generation (used when GPT is unavailable or too slow)."""
+        return self._draft_from_parse(intent_parser.parse(natural_language_query), 'keywords')
 
 
 # Global instance
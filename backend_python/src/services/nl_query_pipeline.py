@@ -1,15 +1,15 @@
 """NL Query Pipeline - orchestrates the full NL→query flow."""
-import sys
-from pathlib import Path
+import asyncio
+import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple, Union
 
-# Add src to path for imports
-sys.path.insert(0, str(Path(__file__).parent.parent))
+from config import config
 
-from services.nl_query_draft_service import nl_query_draft_service
-from services.inventory_query_executor import inventory_query_executor
-from models.inventory_query_session import InventoryQuerySession, QuerySessionStatus
+from services.nl_query_draft_service import DraftQuery, nl_query_draft_service
+from services.inventory_query_executor import QueryResult, inventory_query_executor
+from services.single_flight import SingleFlight
+from models.inventory_query_session import InventoryQuerySession, QuerySessionStatus, ReviewFindings
 from services.logging.logger import logger_instance as logger
 
 
@@ -21,9 +21,17 @@ class PipelineResult:
         self.results = results
 
 
+def normalize_query(natural_language_query: str) -> str:
+    """Normalize a question for coalescing (case and whitespace insensitive)."""
+    return ' '.join(natural_language_query.lower().split())
+
+
 class NLQueryPipeline:
     """Execute the full NL→query pipeline: draft → review → execute."""
     
+    def __init__(self):
+        self._single_flight = SingleFlight('pipeline')
+    
     async def process_query(self, natural_language_query: str, user_id: str,
                           session_id: str) -> PipelineResult:
         """Process a natural language query through the full pipeline.
@@ -36,58 +44,136 @@ class NLQueryPipeline:
             'query': natural_language_query
         })
         
-        # Step 1: Draft generation
-        draft = await nl_query_draft_service.generate_draft(natural_language_query)
+        try:
+            # Steps 1-3 are shared with concurrent callers asking the same question
+            draft, result = await self._single_flight.do(
+                normalize_query(natural_language_query),
+                lambda: self._draft_and_execute(natural_language_query)
+            )
+        except Exception as e:
+            logger.error('Query pipeline failed', {
+                'sessionId': session_id,
+                'error': str(e),
+            })
+            raise
+        
+        logger.info('Query pipeline completed successfully', {
+            'sessionId': session_id,
+            'rowCount': result.row_count,
+        })
+        
+        return self._pipeline_result(session_id, user_id, natural_language_query, draft, result)
+    
+    async def process_batch(self, natural_language_queries: List[str],
+                            user_id: str) -> List[Tuple[str, Union[PipelineResult, Exception]]]:
+        """Process several questions together (e.g. the tiles of one dashboard).
+        
+        Questions that normalize to the same text are drafted once. Drafts are
+        generated concurrently, at most ``BATCH_DRAFT_CONCURRENCY`` at a time,
+        and all final SQL then runs on one shared read snapshot so the results
+        are mutually consistent. Returns ``(normalized question, result or
+        error)`` per unique question, in first-seen order.
+        """
+        unique: Dict[str, str] = {}
+        for query in natural_language_queries:
+            unique.setdefault(normalize_query(query), query)
+        
+        logger.info('Processing NL query batch', {
+            'userId': user_id,
+            'queries': len(natural_language_queries),
+            'unique': len(unique),
+        })
+        
+        semaphore = asyncio.Semaphore(config.BATCH_DRAFT_CONCURRENCY)
+        
+        async def draft_one(query: str) -> DraftQuery:
+            async with semaphore:
+                return await nl_query_draft_service.generate_draft(query)
+        
+        drafts = await asyncio.gather(
+            *(draft_one(query) for query in unique.values()), return_exceptions=True
+        )
         
+        # Speculative results were read at different times; re-run everything on one snapshot
+        drafted = [(key, draft) for key, draft in zip(unique, drafts) if isinstance(draft, DraftQuery)]
+        for _, draft in drafted:
+            self._rewrite(draft)
+        executed = await inventory_query_executor.execute_snapshot(
+            [(draft.final_sql, draft.final_params) for _, draft in drafted]
+        )
+        outcomes: Dict[str, Union[QueryResult, Exception]] = {
+            key: result for (key, _), result in zip(drafted, executed)
+        }
+        
+        results: List[Tuple[str, Union[PipelineResult, Exception]]] = []
+        for (key, query), draft in zip(unique.items(), drafts):
+            outcome = draft if isinstance(draft, Exception) else outcomes[key]
+            if isinstance(outcome, Exception):
+                logger.error('Batch query failed', {'query': query, 'error': str(outcome)})
+                results.append((key, outcome))
+            else:
+                results.append((key, self._pipeline_result(str(uuid.uuid4()), user_id, query, draft, outcome)))
+        return results
+    
+    def _pipeline_result(self, session_id: str, user_id: str, natural_language_query: str,
+                         draft: DraftQuery, result: QueryResult) -> PipelineResult:
+        """Build the executed session and results payload for one question."""
+        now = datetime.now()
         session = InventoryQuerySession(
             id=session_id,
             userId=user_id,
             naturalLanguageQuery=natural_language_query,
             draftQuery=draft.sql,
-            status=QuerySessionStatus.DRAFTED,
-            createdAt=datetime.now(),
-            updatedAt=datetime.now()
+            reviewFindings=draft.review_findings,
+            draftSource=draft.source,
+            finalQuery=draft.final_sql,
+            queryParams=draft.final_params,
+            rowLimitRequested=bool(draft.limit_requested),
+            status=QuerySessionStatus.EXECUTED,
+            executedAt=now,
+            resultSummary={
+                'rowCount': result.row_count,
+                'keyAggregates': {},
+            },
+            createdAt=now,
+            updatedAt=now
         )
+        return PipelineResult(
+            session=session,
+            results={
+                'resultSet': result.result_set,
+                'rowCount': result.row_count,
+                'executionTimeMs': result.execution_time_ms,
+            }
+        )
+    
+    async def _draft_and_execute(self, natural_language_query: str) -> Tuple[DraftQuery, QueryResult]:
+        """Draft and execute a query once; the outcome is shared by coalesced callers."""
+        # Step 1: Draft generation
+        draft = await nl_query_draft_service.generate_draft(natural_language_query)
         
         # Step 2: Self-review (simplified for US1, will be enhanced in US2)
         # For now, we'll execute directly if the query looks safe
-        session.status = QuerySessionStatus.EXECUTING
-        session.updatedAt = datetime.now()
         
-        try:
-            # Step 3: Execute
-            result = await inventory_query_executor.execute_query(draft.sql)
-            
-            session.status = QuerySessionStatus.EXECUTED
-            session.finalQuery = draft.sql
-            session.executedAt = datetime.now()
-            session.resultSummary = {
-                'rowCount': result.row_count,
-                'keyAggregates': {},
-            }
-            session.updatedAt = datetime.now()
-            
-            logger.info('Query pipeline completed successfully', {
-                'sessionId': session_id,
-                'rowCount': result.row_count,
-            })
-            
-            return PipelineResult(
-                session=session,
-                results={
-                    'rows': result.rows,
-                    'rowCount': result.row_count,
-                    'executionTimeMs': result.execution_time_ms,
-                }
-            )
-        except Exception as e:
-            session.status = QuerySessionStatus.FAILED
-            session.updatedAt = datetime.now()
-            logger.error('Query pipeline failed', {
-                'sessionId': session_id,
-                'error': str(e),
-            })
-            raise
+        # Step 3: Rewrite and execute (unless the same final SQL already ran speculatively during review)
+        self._rewrite(draft)
+        if (draft.speculative_result is not None
+                and draft.speculative_query == (draft.final_sql, draft.final_params)):
+            return draft, draft.speculative_result
+        result = await inventory_query_executor.execute_query(draft.final_sql, draft.final_params)
+        return draft, result
+    
+    def _rewrite(self, draft: DraftQuery) -> None:
+        """Set the draft's final SQL from the rewrite stage and record what it changed."""
+        rewrite = inventory_query_executor.rewrite(draft.sql, draft.params)
+        draft.final_sql = rewrite.sql
+        draft.final_params = rewrite.params
+        if draft.limit_requested is None:
+            draft.limit_requested = not rewrite.row_cap
+        if rewrite.adjustments:
+            if draft.review_findings is None:
+                draft.review_findings = ReviewFindings()
+            draft.review_findings.adjustments.extend(rewrite.adjustments)
 
 
 # Global instance
@@ -0,0 +1,410 @@
+"""Profiling tools for production diagnosis (exposed to admins only).
+
+- ``request_profiler``: cProfile captures of single requests, triggered by
+  the ``X-Profile`` header or by arming a session id. Captures are kept in a
+  bounded store and served as pstats dumps, text tables or collapsed stacks.
+- ``sampling_profiler``: samples every thread's stack over a time window
+  (``sys._current_frames``), cheap enough to run against live traffic.
+- ``memory_profiler``: ``tracemalloc`` snapshots diffed against the previous
+  snapshot or the start of tracing.
+- ``loop_lag_monitor``: heartbeat on the event loop plus a watchdog thread
+  that records the loop thread's stack when the heartbeat is late, so the
+  coroutine blocking the loop is logged.
+
+Collapsed stacks are ``frame;frame;frame value`` lines, the input format of
+flamegraph.pl, speedscope and inferno.
+"""
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+from services.logging.logger import logger_instance as logger
+from services.metrics.registry import metrics
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profiler that runs one capture at a time is already in use."""
+
+
+def _frame_label(code_name: str, filename: str, lineno: int) -> str:
+    if filename == '~':
+        # cProfile's pseudo file for builtins: "<built-in method time.sleep>"
+        return code_name.replace(';', ':')
+    return f'{code_name} ({os.path.basename(filename)}:{lineno})'.replace(';', ':')
+
+
+def collapsed_from_stats(stats: Dict[Tuple, Tuple], max_depth: int = 128) -> str:
+    """Estimate collapsed stacks (values in microseconds) from cProfile stats.
+
+    cProfile keeps caller -> callee edges rather than full stacks, so each
+    function's cumulative time is split over its callers in proportion to the
+    time spent along each edge, the same estimate graphical pstats viewers
+    use. Recursive edges are cut.
+    """
+    callees: Dict[Tuple, List[Tuple[Tuple, float]]] = {}
+    roots = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    totals: Counter = Counter()
+
+    def walk(func: Tuple, path: Tuple[Tuple, ...], share: float) -> None:
+        _, _, self_time, cumulative, _ = stats[func]
+        labels = ';'.join(_frame_label(name, filename, lineno) for filename, lineno, name in path)
+        totals[labels] += self_time * share * 1e6
+        if len(path) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = stats[callee][3]
+            if callee in path or callee_total <= 0:
+                continue
+            callee_share = share * edge_time / callee_total
+            # Prune branches below a microsecond
+            if callee_share * callee_total * 1e6 < 1:
+                continue
+            walk(callee, path + (callee,), min(callee_share, 1.0))
+
+    for root in roots:
+        walk(root, (root,), 1.0)
+    return ''.join(f'{stack} {round(value)}\n' for stack, value in sorted(totals.items()) if round(value) > 0)
+
+
+class RequestProfile:
+    """One finished per-request cProfile capture."""
+
+    __slots__ = ('id', 'method', 'path', 'trigger', 'status', 'duration_ms', 'created_at', 'stats')
+
+    def __init__(self, capture_id: str, method: str, path: str, trigger: str):
+        self.id = capture_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.status: Optional[int] = None
+        self.duration_ms = 0.0
+        self.created_at = datetime.now().isoformat()
+        self.stats: Dict[Tuple, Tuple] = {}
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'trigger': self.trigger,
+            'status': self.status,
+            'durationMs': round(self.duration_ms, 2),
+            'createdAt': self.created_at,
+        }
+
+    def pstats_dump(self) -> bytes:
+        """Marshalled stats, the file format read by ``pstats.Stats(path)``."""
+        return marshal.dumps(self.stats)
+
+    def text(self, sort: str = 'cumulative', limit: int = 50) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(_StatsSource(self.stats), stream=stream)
+        stats.sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def collapsed(self) -> str:
+        return collapsed_from_stats(self.stats)
+
+
+class _StatsSource:
+    """Profiler stand-in for ``pstats.Stats``, which empties its source's stats."""
+
+    def __init__(self, stats: Dict[Tuple, Tuple]):
+        self.stats = dict(stats)
+
+    def create_stats(self) -> None:
+        pass
+
+
+class RequestProfiler:
+    """Decides which requests to profile and keeps the last captures.
+
+    A request is profiled when it carries the ``X-Profile`` header and an
+    admin token, or when its path contains a session id armed by an admin.
+    cProfile hooks the event loop thread, so a capture also contains
+    coroutines of other requests interleaved with it; only one capture runs
+    at a time and concurrent triggers are skipped.
+    """
+
+    def __init__(self, max_captures: int):
+        self.max_captures = max_captures
+        self._captures: 'OrderedDict[str, RequestProfile]' = OrderedDict()
+        self._armed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+
+    def arm_session(self, session_id: str, requests: int) -> None:
+        """Profile the next ``requests`` requests whose path contains ``session_id``."""
+        with self._lock:
+            self._armed[session_id] = requests
+
+    def disarm_session(self, session_id: str) -> bool:
+        with self._lock:
+            return self._armed.pop(session_id, None) is not None
+
+    def armed_sessions(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._armed)
+
+    def session_trigger(self, path: str) -> Optional[str]:
+        """Armed session id in ``path`` (consuming one of its requests), if any."""
+        with self._lock:
+            if not self._armed:
+                return None
+            for segment in path.split('/'):
+                remaining = self._armed.get(segment)
+                if remaining is None:
+                    continue
+                if remaining <= 1:
+                    del self._armed[segment]
+                else:
+                    self._armed[segment] = remaining - 1
+                return segment
+        return None
+
+    def start(self, method: str, path: str, trigger: str) -> Optional[Tuple[RequestProfile, cProfile.Profile]]:
+        """Begin a capture, or return None while another one is running."""
+        if not self._running.acquire(blocking=False):
+            metrics.increment('profiling.requests.skipped')
+            return None
+        capture = RequestProfile(uuid.uuid4().hex[:12], method, path, trigger)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) owns the hook
+            self._running.release()
+            metrics.increment('profiling.requests.skipped')
+            return None
+        return capture, profile
+
+    def finish(self, capture: RequestProfile, profile: cProfile.Profile, started: float) -> None:
+        try:
+            profile.disable()
+        finally:
+            self._running.release()
+        capture.duration_ms = (time.perf_counter() - started) * 1000
+        profile.create_stats()
+        capture.stats = profile.stats
+        with self._lock:
+            self._captures[capture.id] = capture
+            while len(self._captures) > self.max_captures:
+                self._captures.popitem(last=False)
+        metrics.increment('profiling.requests.captured')
+        logger.info('Request profile captured', {
+            'profileId': capture.id,
+            'path': capture.path,
+            'trigger': capture.trigger,
+            'durationMs': round(capture.duration_ms, 2),
+        })
+
+    def get(self, capture_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._captures.get(capture_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            captures = list(self._captures.values())
+        return [capture.summary() for capture in reversed(captures)]
+
+
+class SamplingProfiler:
+    """Statistical profiler sampling all thread stacks at a fixed interval.
+
+    Runs on its own thread and only reads frames, so the cost is one stack
+    walk per thread per sample. One sampling window runs at a time.
+    """
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self._running = threading.Lock()
+
+    def sample(self, seconds: float, interval_ms: float) -> Tuple[str, int]:
+        """Sample for ``seconds`` and return (collapsed stacks, sample count).
+
+        Stack values are sample counts; every stack starts with the thread
+        name. Blocks the calling thread for the whole window.
+        """
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusyError('A sampling window is already running')
+        try:
+            return self._sample(min(seconds, self.max_seconds), max(interval_ms, 1) / 1000)
+        finally:
+            self._running.release()
+
+    def _sample(self, seconds: float, interval: float) -> Tuple[str, int]:
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stacks[(names.get(ident, str(ident)),) + frame_stack(frame)] += 1
+            samples += 1
+            time.sleep(interval)
+        metrics.increment('profiling.sampling.samples', samples)
+        lines = [f'{";".join(stack)} {count}\n' for stack, count in sorted(stacks.items())]
+        return ''.join(lines), samples
+
+
+def frame_stack(frame) -> Tuple[str, ...]:
+    """Labels of ``frame`` and its callers, outermost first."""
+    labels = []
+    while frame is not None:
+        code = frame.f_code
+        labels.append(_frame_label(code.co_name, code.co_filename, frame.f_lineno))
+        frame = frame.f_back
+    return tuple(reversed(labels))
+
+
+class MemoryProfiler:
+    """``tracemalloc`` tracing with snapshot diffs.
+
+    Each snapshot is compared with the previous one (or with the snapshot
+    taken when tracing started), which points at allocation sites that keep
+    growing, e.g. the in-memory session store.
+    """
+
+    def __init__(self, frames: int):
+        self.frames = frames
+        self._lock = threading.Lock()
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self) -> None:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self._baseline = self._previous = self._take()
+        logger.info('Memory tracing started', {'frames': self.frames})
+
+    def stop(self) -> None:
+        with self._lock:
+            tracemalloc.stop()
+            self._baseline = self._previous = None
+        logger.info('Memory tracing stopped')
+
+    def _take(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    def snapshot(self, against: str = 'previous', group_by: str = 'lineno',
+                 limit: int = 25) -> Dict[str, Any]:
+        """Diff a new snapshot against the ``previous`` one or the ``start``."""
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._baseline is None:
+                raise RuntimeError('Memory tracing is not running')
+            current = self._take()
+            reference = self._baseline if against == 'start' else self._previous
+            self._previous = current
+        traced, peak = tracemalloc.get_traced_memory()
+        differences = current.compare_to(reference, group_by)
+        return {
+            'against': against,
+            'groupBy': group_by,
+            'tracedBytes': traced,
+            'peakBytes': peak,
+            'growthBytes': sum(diff.size_diff for diff in differences),
+            'top': [
+                {
+                    'location': [f'{frame.filename}:{frame.lineno}' for frame in diff.traceback],
+                    'sizeDiffBytes': diff.size_diff,
+                    'sizeBytes': diff.size,
+                    'countDiff': diff.count_diff,
+                    'count': diff.count,
+                }
+                for diff in differences[:limit]
+            ],
+        }
+
+
+class LoopLagMonitor:
+    """Detect and attribute event loop stalls.
+
+    A heartbeat coroutine sleeps ``interval`` seconds and measures how late
+    it wakes up. A watchdog thread checks the heartbeat; once it is late by
+    more than ``threshold`` it records the loop thread's stack (the
+    coroutine holding the loop), which is logged when the loop recovers.
+    """
+
+    def __init__(self, interval_ms: float, threshold_ms: float):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._blocked_stack: Optional[Tuple[str, ...]] = None
+        self._max_lag_ms = 0.0
+        metrics.register_gauge('loop.maxLagMs', lambda: round(self._max_lag_ms, 2))
+
+    async def run(self) -> None:
+        """Heartbeat loop; run as a background task for the app lifetime."""
+        self._loop_thread = threading.get_ident()
+        stop = threading.Event()
+        watchdog = threading.Thread(target=self._watch, args=(stop,), name='loop-lag-watchdog', daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                self._beat = time.monotonic()
+                self._blocked_stack = None
+                await asyncio.sleep(self.interval)
+                lag = time.monotonic() - self._beat - self.interval
+                metrics.set_gauge('loop.lagMs', round(lag * 1000, 2))
+                self._max_lag_ms = max(self._max_lag_ms, lag * 1000)
+                if lag >= self.threshold:
+                    self._report(lag)
+        finally:
+            stop.set()
+
+    def _report(self, lag: float) -> None:
+        metrics.increment('loop.blocked')
+        stack = self._blocked_stack or ()
+        logger.warn('Event loop blocked', {
+            'lagMs': round(lag * 1000, 2),
+            'thresholdMs': round(self.threshold * 1000, 2),
+            # Innermost frames first
+            'stack': list(reversed(stack))[:15],
+        })
+
+    def _watch(self, stop: threading.Event) -> None:
+        while not stop.wait(self.interval):
+            late = time.monotonic() - self._beat - self.interval
+            if late < self.threshold or self._blocked_stack is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is not None:
+                self._blocked_stack = frame_stack(frame)
+
+
+# Global instances
+request_profiler = RequestProfiler(config.PROFILE_MAX_CAPTURES)
+sampling_profiler = SamplingProfiler(config.PROFILE_SAMPLE_MAX_SECONDS)
+memory_profiler = MemoryProfiler(config.TRACEMALLOC_FRAMES)
+loop_lag_monitor = LoopLagMonitor(config.LOOP_LAG_INTERVAL_MS, config.LOOP_LAG_THRESHOLD_MS)
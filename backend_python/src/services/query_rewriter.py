@@ -0,0 +1,839 @@
+"""Cost-checked rewrites of drafted SQL between review and execution.
+
+Drafts (LLM drafts in particular) often filter a LEFT JOINed lookup table by
+name, leave out LIMIT or select more than the results use. ``QueryRewriter``
+parses a SELECT over ``inventory_items`` and its lookup joins and applies:
+
+* LIMIT enforcement: a missing LIMIT becomes ``DEFAULT_LIMIT`` and larger
+  ones are lowered to ``MAX_LIMIT`` (applied to any SELECT);
+* LEFT JOINs whose columns a WHERE condition compares become inner joins
+  (the condition already rejects the NULL rows the outer join adds);
+* lookup joins nothing references any more are removed.
+
+These make up the final SQL stored on the session, which exports and saved
+queries reuse. Execution (``physical``) goes further on a copy: ``*`` across
+joins narrows to the items' columns, selected columns the result set does not
+map are dropped along with joins only they needed, WHERE conditions on a
+joined category or location alone are resolved to ids
+(``c.name = 'Electronics'`` -> ``i.category_id = 'cat-1'``) so the
+``inventory_items`` indexes apply, and ORDER BY/LIMIT is pushed into
+``inventory_items`` ahead of to-one LEFT joins when the sort cannot stop
+early. Resolved ids are never stored: they are looked up again whenever the
+data version changes, so names matching new categories or locations are
+picked up.
+
+Each optional rewrite is kept only when the ``EXPLAIN QUERY PLAN`` of the
+rewritten SQL is estimated no more expensive than before (``plan_cost``).
+Statements outside the parsed shape only get LIMIT enforcement.
+"""
+import math
+import re
+import sqlite3
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from services.db.connection import data_version, get_database
+from services.db.result_set import INVENTORY_FIELDS
+from services.db.shard_executor import _outer_aggregate, _tokenize, _unquote
+from services.intent_parser import IntentParser
+from services.logging.logger import logger_instance as logger
+from services.metrics.registry import metrics
+
+# Lookup tables joined one-to-one on their primary key, and the items column referencing them
+LOOKUPS = {'product_categories': 'category_id', 'locations': 'location_id'}
+
+# Not parsed; such statements only get LIMIT enforcement
+_UNSUPPORTED = frozenset({
+    'UNION', 'INTERSECT', 'EXCEPT', 'WITH', 'HAVING', 'OFFSET', 'WINDOW', 'OVER', 'NATURAL',
+    'USING', 'RIGHT', 'FULL', 'CROSS', 'VALUES', 'NULLS', 'INDEXED',
+})
+_CLAUSES = ('FROM', 'WHERE', 'GROUP', 'ORDER', 'LIMIT')
+_JOIN_WORDS = frozenset({'LEFT', 'INNER', 'OUTER', 'JOIN', 'ON'})
+
+# Words inside expressions that are not column references
+_KEYWORDS = frozenset({
+    'AND', 'OR', 'NOT', 'IN', 'IS', 'NULL', 'LIKE', 'GLOB', 'REGEXP', 'MATCH', 'BETWEEN',
+    'ESCAPE', 'COLLATE', 'NOCASE', 'BINARY', 'RTRIM', 'CASE', 'WHEN', 'THEN', 'ELSE', 'END',
+    'CAST', 'AS', 'ASC', 'DESC', 'DISTINCT', 'ALL', 'EXISTS', 'SELECT', 'FROM', 'WHERE',
+    'GROUP', 'BY', 'ORDER', 'LIMIT', 'JOIN', 'LEFT', 'INNER', 'OUTER', 'ON', 'TRUE', 'FALSE',
+    'CURRENT_TIMESTAMP', 'CURRENT_DATE', 'CURRENT_TIME', 'INTEGER', 'INT', 'TEXT', 'REAL',
+    'NUMERIC', 'BLOB',
+})
+# Tokens that let a condition hold for a NULL-extended row
+_NULL_TOLERANT = frozenset({'IS', 'NULL', 'COALESCE', 'IFNULL', 'NULLIF', 'IIF', 'CASE', 'OR', 'NOT'})
+
+# Column names the result set maps (see ``resolve_projection``)
+_RESULT_COLUMNS = frozenset(name for field in INVENTORY_FIELDS for name in field)
+
+_TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.IGNORECASE)
+_NAME = re.compile(r'^(?:[A-Za-z_]\w*|"[^"]+"|`[^`]+`|\[[^\]]+\])$')
+_SEARCH_TERMS = re.compile(r'\((.*)\)')
+
+# ``plan_cost`` input: EXPLAIN QUERY PLAN rows as (id, parent, detail)
+Plan = List[Tuple[int, int, str]]
+
+
+class _Unsupported(Exception):
+    """The statement is outside the shapes the rewriter parses."""
+
+
+class _Part:
+    """SQL text with the parameters it binds, in order."""
+    __slots__ = ('text', 'params', '_tokens')
+
+    def __init__(self, text: str, params: Sequence[Any]):
+        self.text = text
+        self.params = list(params)
+        self._tokens = None
+
+    @property
+    def tokens(self):
+        if self._tokens is None:
+            self._tokens = _tokenize(self.text)
+        return self._tokens
+
+    def qualifiers(self) -> Set[str]:
+        """Lowercase table aliases used as ``alias.column``."""
+        tokens = self.tokens
+        return {
+            _unquote(token.text).lower() for index, token in enumerate(tokens[:-1])
+            if tokens[index + 1].text == '.' and _NAME.match(token.text)
+        }
+
+    def bare_names(self) -> Set[str]:
+        """Lowercase unqualified identifiers (columns or select aliases); a bare ``*`` too."""
+        tokens = self.tokens
+        names = set()
+        for index, token in enumerate(tokens):
+            if token.text == '*' and (index == 0 or tokens[index - 1].text in (',', '(')):
+                names.add('*')
+                continue
+            if not _NAME.match(token.text) or token.upper in _KEYWORDS:
+                continue
+            if index > 0 and tokens[index - 1].text == '.':
+                continue
+            if index + 1 < len(tokens) and tokens[index + 1].text in ('.', '('):
+                continue
+            names.add(_unquote(token.text).lower())
+        return names
+
+    def has_subquery(self) -> bool:
+        return any(token.upper == 'SELECT' for token in self.tokens)
+
+
+class _Join:
+    """``[LEFT] JOIN table alias ON ...``."""
+    __slots__ = ('left', 'table', 'alias', 'on', 'foreign_key')
+
+    def __init__(self, left: bool, table: str, alias: str, on: _Part, foreign_key: Optional[str]):
+        self.left = left
+        self.table = table
+        self.alias = alias
+        self.on = on
+        # ``i.category_id`` for ``ON i.category_id = c.id`` with c a lookup table (a to-one join)
+        self.foreign_key = foreign_key
+
+    def render(self) -> str:
+        return f"{'LEFT JOIN' if self.left else 'JOIN'} {_source(self.table, self.alias)} ON {self.on.text}"
+
+
+def _source(table: str, alias: str) -> str:
+    return table if alias.lower() == table.lower() else f'{table} {alias}'
+
+
+def _literal(value: Any) -> str:
+    """SQL literal for a lookup id."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class _Statement:
+    """A SELECT over ``inventory_items`` and lookup joins, split into editable parts."""
+
+    def __init__(self, sql: str, params: Sequence[Any]):
+        tokens = _tokenize(sql)
+        if tokens and tokens[-1].text == ';':
+            tokens.pop()
+        if len(tokens) < 4 or tokens[0].upper != 'SELECT':
+            raise _Unsupported('not a SELECT')
+        for token in tokens:
+            if token.upper in _UNSUPPORTED or token.text[0] in ':@$' or (token.text[0] == '?' and len(token.text) > 1):
+                raise _Unsupported(token.upper)
+            if token.depth < 0:
+                raise _Unsupported('unbalanced parentheses')
+        placeholders = [token for token in tokens if token.text == '?']
+        if len(placeholders) != len(params):
+            raise _Unsupported('parameter count mismatch')
+        self._sql = sql
+        self._params = {token.start: params[index] for index, token in enumerate(placeholders)}
+
+        position = 1
+        self.distinct = tokens[1].upper == 'DISTINCT'
+        if tokens[1].upper in ('DISTINCT', 'ALL'):
+            position = 2
+        marks: List[Tuple[str, int, int]] = []
+        index = position
+        while index < len(tokens):
+            token = tokens[index]
+            if token.depth == 0 and token.upper == 'SELECT':
+                raise _Unsupported('compound select')
+            if token.depth == 0 and token.upper in _CLAUSES:
+                width = 2 if token.upper in ('GROUP', 'ORDER') else 1
+                if width == 2 and (index + 1 >= len(tokens) or tokens[index + 1].upper != 'BY'):
+                    raise _Unsupported('malformed clause')
+                marks.append((token.upper, index, index + width))
+                index += width
+                continue
+            index += 1
+        names = [mark[0] for mark in marks]
+        if 'FROM' not in names or len(set(names)) != len(names) or names != sorted(names, key=_CLAUSES.index):
+            raise _Unsupported('clause order')
+        if marks[0][1] == position:
+            raise _Unsupported('no select items')
+        clauses = {}
+        for number, (name, _, start) in enumerate(marks):
+            end = marks[number + 1][1] if number + 1 < len(marks) else len(tokens)
+            if start == end:
+                raise _Unsupported('empty clause')
+            clauses[name] = tokens[start:end]
+
+        self.items = self._split(tokens[position:marks[0][1]])
+        self._parse_from(clauses['FROM'])
+        self.where = self._conjuncts(clauses['WHERE']) if 'WHERE' in clauses else []
+        self.group_by = self._part(clauses['GROUP']) if 'GROUP' in clauses else None
+        self.order_by = self._part(clauses['ORDER']) if 'ORDER' in clauses else None
+        self.limit: Optional[_Part] = None
+        if 'LIMIT' in clauses:
+            if len(clauses['LIMIT']) != 1:
+                raise _Unsupported('LIMIT expression')
+            self.limit = self._part(clauses['LIMIT'])
+        # Aliases of inner joins whose WHERE conditions were resolved to ids
+        self.resolved: Set[str] = set()
+        # (WHERE conjuncts, ORDER BY) evaluated in a LIMITed items subquery ahead of the joins
+        self.pushed: Optional[Tuple[List[_Part], _Part]] = None
+
+    def _part(self, tokens) -> _Part:
+        text = self._sql[tokens[0].start:tokens[-1].end]
+        return _Part(text, [self._params[token.start] for token in tokens if token.text == '?'])
+
+    def _split(self, tokens) -> List[_Part]:
+        parts, current = [], []
+        for token in tokens:
+            if token.depth == 0 and token.text == ',':
+                if not current:
+                    raise _Unsupported('empty expression')
+                parts.append(self._part(current))
+                current = []
+            else:
+                current.append(token)
+        if not current:
+            raise _Unsupported('empty expression')
+        parts.append(self._part(current))
+        return parts
+
+    def _conjuncts(self, tokens) -> List[_Part]:
+        """Top-level AND terms (the whole clause when it has a top-level OR)."""
+        if any(token.depth == 0 and token.upper == 'OR' for token in tokens):
+            return [self._part(tokens)]
+        conjuncts, current, between = [], [], False
+        for token in tokens:
+            if token.depth == 0 and token.upper == 'BETWEEN':
+                between = True
+            elif token.depth == 0 and token.upper == 'AND':
+                if between:
+                    between = False
+                else:
+                    if not current:
+                        raise _Unsupported('empty condition')
+                    conjuncts.append(self._part(current))
+                    current = []
+                    continue
+            current.append(token)
+        if not current:
+            raise _Unsupported('empty condition')
+        conjuncts.append(self._part(current))
+        return conjuncts
+
+    def _parse_from(self, tokens) -> None:
+        try:
+            if tokens[0].upper != 'INVENTORY_ITEMS':
+                raise _Unsupported('inventory_items must be the leading table')
+            self.table = tokens[0].text
+            self.alias, position = self._alias(tokens, 1, self.table)
+            self.joins: List[_Join] = []
+            while position < len(tokens):
+                left = tokens[position].upper == 'LEFT'
+                if tokens[position].upper in ('LEFT', 'INNER'):
+                    position += 1
+                    if left and tokens[position].upper == 'OUTER':
+                        position += 1
+                if tokens[position].upper != 'JOIN' or not _NAME.match(tokens[position + 1].text):
+                    raise _Unsupported('join')
+                table = _unquote(tokens[position + 1].text)
+                alias, position = self._alias(tokens, position + 2, table)
+                if tokens[position].upper != 'ON':
+                    raise _Unsupported('join without ON')
+                end = next((j for j in range(position + 1, len(tokens))
+                            if tokens[j].depth == 0 and tokens[j].upper in ('LEFT', 'INNER', 'JOIN')),
+                           len(tokens))
+                on = self._part(tokens[position + 1:end])
+                self.joins.append(_Join(left, table, alias, on, self._foreign_key(table, alias, on)))
+                position = end
+        except IndexError:
+            raise _Unsupported('malformed FROM')
+        aliases = [self.alias.lower()] + [join.alias.lower() for join in self.joins]
+        if len(set(aliases)) != len(aliases):
+            raise _Unsupported('repeated alias')
+
+    @staticmethod
+    def _alias(tokens, position: int, table: str) -> Tuple[str, int]:
+        if position < len(tokens) and tokens[position].upper == 'AS':
+            position += 1
+            if position >= len(tokens) or not _NAME.match(tokens[position].text):
+                raise _Unsupported('alias')
+        if (position < len(tokens) and _NAME.match(tokens[position].text)
+                and tokens[position].upper not in _JOIN_WORDS):
+            return _unquote(tokens[position].text), position + 1
+        return table, position
+
+    def _foreign_key(self, table: str, alias: str, on: _Part) -> Optional[str]:
+        column = LOOKUPS.get(table.lower())
+        texts = [_unquote(token.text).lower() for token in on.tokens]
+        if column is None or len(texts) != 7 or texts[3] not in ('=', '=='):
+            return None
+        sides = {tuple(texts[0:3]), tuple(texts[4:7])}
+        if sides == {(self.alias.lower(), '.', column), (alias.lower(), '.', 'id')}:
+            return f'{self.alias}.{column}'
+        return None
+
+    def copy(self) -> '_Statement':
+        clone = _Statement.__new__(_Statement)
+        clone.__dict__.update(self.__dict__)
+        clone.items = list(self.items)
+        clone.joins = [_Join(j.left, j.table, j.alias, j.on, j.foreign_key) for j in self.joins]
+        clone.where = list(self.where)
+        clone.resolved = set(self.resolved)
+        return clone
+
+    def parts(self, exclude: Optional[_Join] = None) -> List[_Part]:
+        """Every expression except ``exclude``'s ON clause."""
+        parts = list(self.items)
+        parts.extend(join.on for join in self.joins if join is not exclude)
+        parts.extend(self.where)
+        parts.extend(part for part in (self.group_by, self.order_by) if part is not None)
+        if self.pushed is not None:
+            parts.extend(self.pushed[0])
+        return parts
+
+    def render(self) -> Tuple[str, List[Any]]:
+        params: List[Any] = []
+        select = 'SELECT DISTINCT' if self.distinct else 'SELECT'
+        lines = [f"{select} {', '.join(item.text for item in self.items)}"]
+        for item in self.items:
+            params.extend(item.params)
+        if self.pushed is not None:
+            where, order_by = self.pushed
+            inner = [f'SELECT * FROM {_source(self.table, self.alias)}']
+            if where:
+                inner.append(f"WHERE {' AND '.join(part.text for part in where)}")
+                for part in where:
+                    params.extend(part.params)
+            inner.append(f'ORDER BY {order_by.text} LIMIT {self.limit.text}')
+            params.extend(order_by.params)
+            params.extend(self.limit.params)
+            lines.append(f"FROM ({' '.join(inner)}) AS {self.alias}")
+        else:
+            lines.append(f'FROM {_source(self.table, self.alias)}')
+        for join in self.joins:
+            lines.append(join.render())
+            params.extend(join.on.params)
+        if self.where:
+            lines.append(f"WHERE {' AND '.join(part.text for part in self.where)}")
+            for part in self.where:
+                params.extend(part.params)
+        for keyword, part in (('GROUP BY', self.group_by), ('ORDER BY', self.order_by), ('LIMIT', self.limit)):
+            if part is not None:
+                lines.append(f'{keyword} {part.text}')
+                params.extend(part.params)
+        return '\n'.join(lines), params
+
+
+def _output_name(item: _Part) -> Optional[str]:
+    """Column name a select item produces, or None for ``*`` forms."""
+    tokens = item.tokens
+    if tokens[-1].text == '*':
+        return None
+    if len(tokens) >= 3 and tokens[-2].upper == 'AS':
+        return _unquote(tokens[-1].text)
+    if (len(tokens) >= 2 and _NAME.match(tokens[-1].text) and tokens[-1].upper not in _KEYWORDS
+            and (_NAME.match(tokens[-2].text) or tokens[-2].text == ')') and tokens[-2].upper not in _KEYWORDS):
+        return _unquote(tokens[-1].text)  # "expr alias"
+    if len(tokens) == 1 or (len(tokens) == 3 and tokens[1].text == '.'):
+        return _unquote(tokens[-1].text)
+    return item.text
+
+
+def _split_terms(part: _Part) -> List[_Part]:
+    """Top-level comma-separated terms of ``part`` with the parameters each binds."""
+    terms, current = [], []
+    params = list(part.params)
+
+    def flush():
+        text = part.text[current[0].start:current[-1].end]
+        count = sum(1 for token in current if token.text == '?')
+        terms.append(_Part(text, params[:count]))
+        del params[:count]
+
+    for token in part.tokens:
+        if token.depth == 0 and token.text == ',':
+            flush()
+            current = []
+        else:
+            current.append(token)
+    flush()
+    return terms
+
+
+class QueryRewrite:
+    """Rewritten SQL and parameters, with one description per applied rewrite."""
+    __slots__ = ('sql', 'params', 'adjustments', 'row_cap')
+
+    def __init__(self, sql: str, params: List[Any], adjustments: List[str], row_cap: bool = True):
+        self.sql = sql
+        self.params = params
+        self.adjustments = adjustments
+        # False when the outer LIMIT was left as drafted with a value other than
+        # the default or maximum, i.e. a row count the question asked for
+        self.row_cap = row_cap
+
+
+class QueryRewriter:
+    """Rewrite drafts before they are stored (``rewrite``) and executed (``physical``)."""
+
+    # The same row limits local drafts use
+    DEFAULT_LIMIT = IntentParser.DEFAULT_LIMIT
+    MAX_LIMIT = IntentParser.MAX_LIMIT
+
+    # Conditions matching more lookup rows than this stay joins
+    MAX_RESOLVED_IDS = 50
+
+    # Plan costs: share of a table one index probe matches (equality / range)
+    EQUALITY_SELECTIVITY = 0.1
+    RANGE_SELECTIVITY = 0.25
+    UNKNOWN_TABLE_ROWS = 1000
+
+    # Execution rewrites remembered per data version and SQL text
+    PHYSICAL_CACHE_SIZE = 512
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._physical: 'OrderedDict[Tuple[str, str], Optional[Tuple[str, List[int], List[str]]]]' = OrderedDict()
+        self._row_counts: Dict[str, int] = {}
+        self._counts_version: Optional[str] = None
+        self._columns: Dict[str, Set[str]] = {}
+
+    def rewrite(self, sql: str, params: Sequence[Any]) -> QueryRewrite:
+        """Final SQL for a draft; adjustments include what execution will change."""
+        params = list(params)
+        adjustments: List[str] = []
+        sql, params, row_cap = self._enforce_limit(sql, params, adjustments)
+        try:
+            statement = _Statement(sql, params)
+        except _Unsupported:
+            statement = None
+        if statement is not None:
+            try:
+                rewritten = self._apply(
+                    statement, (self._inner_joins, self._prune_joins),
+                    lambda values: values
+                )
+            except sqlite3.Error as e:
+                logger.warn('Query rewrite skipped', {'error': str(e), 'sql': sql[:200]})
+                rewritten = None
+            if rewritten is not None:
+                statement, applied = rewritten
+                sql, params = statement.render()
+                adjustments.extend(applied)
+        physical = self._physical_plan(sql, params)
+        if physical is not None:
+            adjustments.extend(f'{adjustment} when executing' for adjustment in physical[2])
+        return QueryRewrite(sql, params, adjustments, row_cap)
+
+    def physical(self, sql: str, params: Sequence[Any]) -> Optional[Tuple[str, List[Any]]]:
+        """SQL and parameters to execute in place of ``sql``, or None to run it as is."""
+        params = list(params)
+        plan = self._physical_plan(sql, params)
+        if plan is None:
+            return None
+        return plan[0], [params[index] for index in plan[1]]
+
+    def _physical_plan(self, sql: str, params: List[Any]) -> Optional[Tuple[str, List[int], List[str]]]:
+        """Execution rewrite of ``sql`` as (SQL, source index of each parameter, adjustments).
+
+        Cached per data version and SQL text: the rewrites depend on the
+        statement's shape and on lookup ids resolved from the data, not on the
+        values bound to it.
+        """
+        key = (data_version(), sql)
+        with self._lock:
+            if key in self._physical:
+                self._physical.move_to_end(key)
+                return self._physical[key]
+        plan = None
+        try:
+            # Parsed with parameter positions in place of values, so the plan maps any binding
+            statement = _Statement(sql, list(range(len(params))))
+        except _Unsupported:
+            statement = None
+        if statement is not None:
+            try:
+                rewritten = self._apply(
+                    statement,
+                    (self._narrow_star, self._prune_columns, self._resolve_lookups, self._prune_joins,
+                     self._push_down_limit),
+                    lambda order: [params[index] for index in order]
+                )
+            except sqlite3.Error as e:
+                logger.warn('Query rewrite skipped', {'error': str(e), 'sql': sql[:200]})
+                rewritten = None
+            if rewritten is not None:
+                statement, applied = rewritten
+                rendered_sql, order = statement.render()
+                plan = (rendered_sql, order, applied)
+        with self._lock:
+            self._physical[key] = plan
+            while len(self._physical) > self.PHYSICAL_CACHE_SIZE:
+                self._physical.popitem(last=False)
+        return plan
+
+    def _apply(self, statement: _Statement,
+               steps: Sequence[Callable[[sqlite3.Connection, _Statement, Callable], List[str]]],
+               bind: Callable[[List[Any]], List[Any]]) -> Optional[Tuple[_Statement, List[str]]]:
+        """Apply each step whose plan is estimated no more expensive; None if none was.
+
+        ``bind`` turns a rendered statement's parameters into the values to
+        EXPLAIN with.
+        """
+        conn = get_database().read_connection()
+
+        def estimate(candidate: _Statement) -> Tuple[float, Plan]:
+            rendered_sql, rendered_params = candidate.render()
+            plan = self.explain(conn, rendered_sql, bind(rendered_params))
+            return self.plan_cost(conn, rendered_sql, plan, self._limits(candidate, bind)), plan
+
+        cost, plan = estimate(statement)
+        cost_before, plan_before = cost, plan
+        applied: List[str] = []
+        for step in steps:
+            candidate = statement.copy()
+            changes = step(conn, candidate, bind)
+            if not changes:
+                continue
+            candidate_cost, candidate_plan = estimate(candidate)
+            if candidate_cost > cost:
+                metrics.increment('rewriter.rejected')
+                logger.info('Query rewrite rejected by plan cost', {
+                    'adjustments': changes,
+                    'costBefore': round(cost, 1),
+                    'costAfter': round(candidate_cost, 1),
+                })
+                continue
+            statement, cost, plan = candidate, candidate_cost, candidate_plan
+            applied.extend(changes)
+        if not applied:
+            return None
+        metrics.increment('rewriter.applied', len(applied))
+        logger.info('Query rewritten', {
+            'adjustments': applied,
+            'planBefore': [detail for _, _, detail in plan_before],
+            'planAfter': [detail for _, _, detail in plan],
+            'costBefore': round(cost_before, 1),
+            'costAfter': round(cost, 1),
+        })
+        return statement, applied
+
+    @staticmethod
+    def _limits(statement: _Statement, bind: Callable[[List[Any]], List[Any]]) -> Dict[str, int]:
+        """Rows the pushed-down items subquery produces at most."""
+        if statement.pushed is None:
+            return {}
+        value = bind(statement.limit.params)[0] if statement.limit.params else statement.limit.text
+        try:
+            return {statement.alias.lower(): int(value)}
+        except (TypeError, ValueError):
+            return {}
+
+    def _enforce_limit(self, sql: str, params: List[Any],
+                       adjustments: List[str]) -> Tuple[str, List[Any], bool]:
+        """Add or lower the outer LIMIT (``LIMIT n``, ``LIMIT n OFFSET m`` or ``LIMIT m, n``).
+
+        Also returns whether the resulting LIMIT is the row cap (added, lowered,
+        or the default or maximum value) rather than one the draft chose.
+        """
+        tokens = _tokenize(sql)
+        if not tokens or tokens[0].upper != 'SELECT':
+            return sql, params, True
+        limits = [index for index, token in enumerate(tokens) if token.depth == 0 and token.upper == 'LIMIT']
+        if not limits:
+            body = sql.rstrip().rstrip(';').rstrip()
+            adjustments.append(f'Added LIMIT {self.DEFAULT_LIMIT} (the query had no row limit)')
+            return f'{body}\nLIMIT {self.DEFAULT_LIMIT}', params, True
+        index = limits[-1] + 1
+        if index + 2 < len(tokens) and tokens[index + 1].text == ',':
+            index += 2
+        if index >= len(tokens):
+            return sql, params, True
+        count = tokens[index]
+        if count.text == '?':
+            position = sum(1 for token in tokens[:index] if token.text == '?')
+            try:
+                value = int(params[position])
+            except (IndexError, TypeError, ValueError):
+                return sql, params, True
+            if value > self.MAX_LIMIT:
+                params = params[:position] + [self.MAX_LIMIT] + params[position + 1:]
+                adjustments.append(f'Lowered LIMIT {value} to the maximum of {self.MAX_LIMIT}')
+                return sql, params, True
+        elif count.text.isdigit():
+            value = int(count.text)
+            if value > self.MAX_LIMIT:
+                adjustments.append(f'Lowered LIMIT {count.text} to the maximum of {self.MAX_LIMIT}')
+                return f'{sql[:count.start]}{self.MAX_LIMIT}{sql[count.end:]}', params, True
+        else:
+            return sql, params, True
+        return sql, params, value in (self.DEFAULT_LIMIT, self.MAX_LIMIT)
+
+    @staticmethod
+    def _inner_joins(conn: sqlite3.Connection, statement: _Statement, bind: Callable) -> List[str]:
+        """LEFT JOIN -> JOIN when a WHERE condition compares the joined table's columns."""
+        applied = []
+        for join in statement.joins:
+            if not join.left:
+                continue
+            alias = join.alias.lower()
+            if any(alias in part.qualifiers() and not {token.upper for token in part.tokens} & _NULL_TOLERANT
+                   for part in statement.where):
+                join.left = False
+                applied.append(f'LEFT JOIN {_source(join.table, join.alias)} became an inner join '
+                               f'(the WHERE clause rejects rows without a match)')
+        return applied
+
+    def _resolve_lookups(self, conn: sqlite3.Connection, statement: _Statement, bind: Callable) -> List[str]:
+        """Replace conditions on an inner-joined lookup table alone with its matching ids.
+
+        The ids are inlined, so conditions binding parameters are left alone
+        (physical plans are shared by every binding of a statement).
+        """
+        applied = []
+        joins = {join.alias.lower(): join for join in statement.joins
+                 if join.foreign_key is not None and not join.left}
+        for position, part in enumerate(statement.where):
+            qualifiers = part.qualifiers()
+            if len(qualifiers) != 1 or part.params or part.bare_names() or part.has_subquery():
+                continue
+            join = joins.get(next(iter(qualifiers)))
+            if join is None:
+                continue
+            try:
+                ids = [row[0] for row in conn.execute(
+                    f'SELECT {join.alias}.id FROM {_source(join.table, join.alias)} WHERE {part.text} '
+                    f'LIMIT {self.MAX_RESOLVED_IDS + 1}'
+                )]
+            except sqlite3.Error:
+                continue
+            if not ids or len(ids) > self.MAX_RESOLVED_IDS:
+                continue
+            if len(ids) == 1:
+                resolved = _Part(f'{join.foreign_key} = {_literal(ids[0])}', [])
+            else:
+                resolved = _Part(f"{join.foreign_key} IN ({', '.join(_literal(value) for value in ids)})", [])
+            statement.where[position] = resolved
+            statement.resolved.add(join.alias.lower())
+            applied.append(f'Resolved {part.text} to {resolved.text}')
+        return applied
+
+    def _prune_joins(self, conn: sqlite3.Connection, statement: _Statement, bind: Callable) -> List[str]:
+        """Drop lookup joins nothing references (LEFT, or inner ones resolved to ids)."""
+        applied = []
+        for join in list(statement.joins):
+            alias = join.alias.lower()
+            if join.foreign_key is None or not (join.left or alias in statement.resolved):
+                continue
+            columns = self._table_columns(conn, join.table)
+            if any(alias in part.qualifiers() or '*' in part.bare_names() or part.bare_names() & columns
+                   for part in statement.parts(exclude=join)):
+                continue
+            statement.joins.remove(join)
+            applied.append(f'Removed unused join {_source(join.table, join.alias)}')
+        return applied
+
+    @staticmethod
+    def _narrow_star(conn: sqlite3.Connection, statement: _Statement, bind: Callable) -> List[str]:
+        """``SELECT *`` across joins -> the items' columns (the lookups' id/name would shadow them)."""
+        if not statement.joins or statement.distinct or statement.group_by is not None:
+            return []
+        for position, item in enumerate(statement.items):
+            if item.text == '*':
+                statement.items[position] = _Part(f'{statement.alias}.*', [])
+                return [f'Narrowed SELECT * to {statement.alias}.*']
+        return []
+
+    @staticmethod
+    def _prune_columns(conn: sqlite3.Connection, statement: _Statement, bind: Callable) -> List[str]:
+        """Drop selected columns the result set does not map and nothing else refers to."""
+        if statement.distinct:
+            return []
+        clauses = [part for part in (statement.group_by, statement.order_by) if part is not None]
+        if any(term.tokens[0].text.isdigit() for part in clauses for term in _split_terms(part)):
+            return []  # Positional references would shift
+        referenced = set()
+        for part in clauses + statement.where:
+            referenced |= part.bare_names()
+        kept, dropped = [], []
+        for item in statement.items:
+            name = _output_name(item)
+            if (name is None or name in _RESULT_COLUMNS or name.lower() in referenced
+                    or _outer_aggregate(item.text)):
+                kept.append(item)
+            else:
+                dropped.append(name)
+        if not dropped or not kept:
+            return []
+        statement.items = kept
+        return [f"Dropped unused columns {', '.join(dropped)}"]
+
+    def _push_down_limit(self, conn: sqlite3.Connection, statement: _Statement, bind: Callable) -> List[str]:
+        """Sort and LIMIT ``inventory_items`` before to-one LEFT joins instead of after them."""
+        if (statement.limit is None or statement.order_by is None or not statement.joins
+                or statement.distinct or statement.group_by is not None
+                or any(not join.left or join.foreign_key is None for join in statement.joins)
+                or any(_outer_aggregate(item.text) for item in statement.items)):
+            return []
+        # Only when the sort needs a temp B-tree; an index order already stops at the LIMIT
+        sql, params = statement.render()
+        if not any(parent == 0 and 'TEMP B-TREE FOR ORDER BY' in detail
+                   for _, parent, detail in self.explain(conn, sql, bind(params))):
+            return []
+        alias = statement.alias.lower()
+        joined = set()
+        for join in statement.joins:
+            joined |= self._table_columns(conn, join.table)
+        joined -= self._table_columns(conn, statement.table)
+
+        def items_only(part: _Part) -> bool:
+            return part.qualifiers() <= {alias} and not part.bare_names() & joined and not part.has_subquery()
+
+        if not all(items_only(part) for part in statement.where):
+            return []
+        # ORDER BY select aliases become their expressions inside the subquery
+        aliases = {}
+        for item in statement.items:
+            if len(item.tokens) >= 3 and item.tokens[-2].upper == 'AS':
+                aliases[_unquote(item.tokens[-1].text).lower()] = item
+        terms = []
+        for term in _split_terms(statement.order_by):
+            direction = ''
+            if term.tokens[-1].upper in ('ASC', 'DESC'):
+                direction = f' {term.tokens[-1].upper}'
+                term = _Part(term.text[:term.tokens[-1].start].rstrip(), term.params)
+            if len(term.tokens) == 1:
+                if term.text.isdigit():
+                    return []
+                item = aliases.get(_unquote(term.text).lower())
+                if item is not None:
+                    term = _Part(item.text[:item.tokens[-2].start].rstrip(), item.params)
+            if not items_only(term):
+                return []
+            terms.append(_Part(term.text + direction, term.params))
+        order_by = _Part(', '.join(term.text for term in terms), [p for term in terms for p in term.params])
+        statement.pushed = (statement.where, order_by)
+        statement.where = []
+        return [f'Pushed ORDER BY and LIMIT {statement.limit.text} into {statement.table} ahead of the joins']
+
+    def _table_columns(self, conn: sqlite3.Connection, table: str) -> Set[str]:
+        key = table.lower()
+        if key not in self._columns:
+            self._columns[key] = {row[1].lower() for row in conn.execute(f'PRAGMA table_info({table})')}
+        return self._columns[key]
+
+    def _table_rows(self, conn: sqlite3.Connection, table: str) -> int:
+        """Row count of ``table`` (cached per data version)."""
+        version = data_version()
+        if version != self._counts_version:
+            self._row_counts = {}
+            self._counts_version = version
+        key = table.lower()
+        if key not in self._row_counts:
+            try:
+                self._row_counts[key] = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+            except sqlite3.Error:
+                self._row_counts[key] = self.UNKNOWN_TABLE_ROWS
+        return self._row_counts[key]
+
+    @staticmethod
+    def explain(conn: sqlite3.Connection, sql: str, params: Sequence[Any]) -> Plan:
+        return [(row[0], row[1], row[3]) for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', list(params))]
+
+    def plan_cost(self, conn: sqlite3.Connection, sql: str, plan: Plan,
+                  subquery_rows: Optional[Dict[str, int]] = None) -> float:
+        """Estimated rows visited by ``plan`` (``sql``'s EXPLAIN QUERY PLAN).
+
+        Nested loops multiply: a SCAN visits every row of its table (or of a
+        subquery, at most ``subquery_rows[alias]``), a SEARCH probes an index
+        once per outer row and matches one row on a primary key or unique
+        index, else ``EQUALITY_SELECTIVITY``/``RANGE_SELECTIVITY`` of the
+        table. Temp B-trees cost n log n of the rows they sort; correlated
+        subqueries run once per outer row.
+        """
+        children: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+        for node, parent, detail in plan:
+            children[parent].append((node, detail))
+        tables = {}
+        for match in _TABLE_REFERENCE.finditer(sql):
+            tables[match.group(1).lower()] = match.group(1)
+            if match.group(2) and match.group(2).upper() not in _KEYWORDS:
+                tables[match.group(2).lower()] = match.group(1)
+        limits = {alias.lower(): rows for alias, rows in (subquery_rows or {}).items()}
+        produced: Dict[str, float] = {}
+
+        def block(parent: int) -> Tuple[float, float]:
+            cost, flow = 0.0, 1.0
+            for node, detail in children.get(parent, ()):
+                words = [word for word in detail.split() if word != 'TABLE']
+                kind = words[0] if words else ''
+                name = words[1].lower() if len(words) > 1 else ''
+                if kind in ('CO-ROUTINE', 'MATERIALIZE'):
+                    inner_cost, inner_rows = block(node)
+                    cost += inner_cost
+                    produced[name] = min(inner_rows, limits.get(name, inner_rows))
+                elif kind == 'SCAN':
+                    rows = produced[name] if name in produced else self._table_rows(conn, tables.get(name, name))
+                    flow *= max(rows, 1)
+                    cost += flow
+                elif kind == 'SEARCH':
+                    rows = self._table_rows(conn, tables.get(name, name))
+                    cost += flow * math.log2(rows + 2)
+                    terms = _SEARCH_TERMS.search(detail)
+                    equality = not terms or not re.search(r'[<>]', terms.group(1))
+                    if equality and ('PRIMARY KEY' in detail or 'sqlite_autoindex' in detail):
+                        matched = 1.0
+                    else:
+                        matched = rows * (self.EQUALITY_SELECTIVITY if equality else self.RANGE_SELECTIVITY)
+                    flow *= max(matched, 1.0)
+                    cost += flow
+                elif 'TEMP B-TREE' in detail:
+                    cost += flow * math.log2(flow + 2)
+                elif 'SUBQUERY' in detail:
+                    inner_cost, _ = block(node)
+                    cost += inner_cost * (flow if kind == 'CORRELATED' else 1)
+                else:
+                    cost += block(node)[0]
+            return cost, flow
+
+        return block(0)[0]
+
+
+# Global instance
+query_rewriter = QueryRewriter()
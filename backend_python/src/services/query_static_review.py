@@ -0,0 +1,131 @@
+"""Local static review of drafted SQL (no LLM round-trip)."""
+import re
+import sqlite3
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+
+from services.db.connection import get_database
+from services.db.result_set import INVENTORY_FIELDS
+from services.inventory_query_executor import inventory_query_executor
+from services.logging.logger import logger_instance as logger
+
+
+class StaticReview:
+    """Outcome of a local static review."""
+    def __init__(self, issues: List[str], safety_checks: Dict[str, bool]):
+        self.issues = issues
+        self.safety_checks = safety_checks
+
+    @property
+    def passed(self) -> bool:
+        return not self.issues
+
+
+class QueryStaticReviewer:
+    """Check drafted SQL against the known schema and the prompt's SQL rules.
+
+    A draft passes when it is SELECT-only, references only tables and columns
+    known to ``schema_provider`` (``{table: {columns}}``), has a LIMIT of at most ``MAX_LIMIT``, selects the required
+    inventory columns and compiles (``EXPLAIN``) on a read-only connection.
+    """
+
+    MAX_LIMIT = 100
+
+    # Columns every draft must return (SQL rule 7 in the prompt)
+    REQUIRED_FIELDS = ('id', 'sku', 'name', 'categoryId', 'locationId',
+                       'currentStock', 'reorderThreshold', 'recentSalesVolume')
+
+    SQL_KEYWORDS = {
+        'where', 'left', 'right', 'inner', 'outer', 'cross', 'join', 'on', 'group',
+        'order', 'limit', 'having', 'union', 'natural', 'using',
+    }
+
+    def __init__(self, schema_provider: Callable[[], Dict[str, Set[str]]]):
+        self.schema_provider = schema_provider
+
+    def review(self, sql: str, params: Optional[Sequence[Any]] = None) -> StaticReview:
+        """Review ``sql`` (with its bound ``params``) and return the issues found."""
+        issues: List[str] = []
+        safety_checks = {'isReadOnly': False, 'hasRowLimit': False, 'hasTimeFilter': False}
+
+        if not sql or not sql.strip():
+            return StaticReview(['Draft SQL is empty'], safety_checks)
+
+        try:
+            inventory_query_executor.validate_read_only(sql)
+            safety_checks['isReadOnly'] = True
+        except ValueError as e:
+            return StaticReview([str(e)], safety_checks)
+
+        sqlite_sql = inventory_query_executor.convert_to_sqlite(sql).strip().rstrip(';').strip()
+        if ';' in sqlite_sql:
+            return StaticReview(['Multiple statements are not allowed'], safety_checks)
+
+        issues.extend(self._check_identifiers(sqlite_sql))
+
+        limits = re.findall(r'\bLIMIT\s+(\d+)', sqlite_sql, re.IGNORECASE)
+        if not limits:
+            issues.append('Query has no LIMIT clause')
+        elif int(limits[-1]) > self.MAX_LIMIT:
+            issues.append(f'LIMIT {limits[-1]} exceeds the maximum of {self.MAX_LIMIT}')
+        else:
+            safety_checks['hasRowLimit'] = True
+
+        where = re.search(r'\bWHERE\b(.*?)(?:\bGROUP\b|\bORDER\b|\bLIMIT\b|$)', sqlite_sql,
+                          re.IGNORECASE | re.DOTALL)
+        safety_checks['hasTimeFilter'] = bool(
+            where and re.search(r'\b(created_at|updated_at|day|week|month)\b', where.group(1), re.IGNORECASE)
+        )
+
+        if not issues:
+            issues.extend(self._check_compiles(sqlite_sql, params or ()))
+
+        return StaticReview(issues, safety_checks)
+
+    def _check_identifiers(self, sql: str) -> List[str]:
+        """Check table and alias-qualified column references against the schema."""
+        issues = []
+        schema = self.schema_provider()
+        aliases: Dict[str, str] = {}
+        # String literals may contain dots and keywords; ignore them
+        sql = re.sub(r"'(?:[^']|'')*'", "''", sql)
+        for match in re.finditer(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', sql, re.IGNORECASE):
+            table = match.group(1).lower()
+            if table not in schema:
+                issues.append(f'Unknown table: {match.group(1)}')
+                continue
+            aliases[table] = table
+            alias = (match.group(2) or '').lower()
+            if alias and alias not in self.SQL_KEYWORDS:
+                aliases[alias] = table
+
+        for match in re.finditer(r'\b([A-Za-z_]\w*)\.([A-Za-z_]\w*)\b', sql):
+            qualifier, column = match.group(1).lower(), match.group(2).lower()
+            table = aliases.get(qualifier)
+            if table is None:
+                issues.append(f'Unknown table alias: {match.group(1)}')
+            elif column not in schema[table]:
+                issues.append(f'Unknown column: {match.group(0)}')
+        return issues
+
+    def _check_compiles(self, sql: str, params: Sequence[Any]) -> List[str]:
+        """Compile the query with EXPLAIN and check the selected columns."""
+        try:
+            # Per review, so snapshot mode compiles against the newest snapshot
+            conn = get_database().read_connection()
+            conn.execute(f'EXPLAIN {sql}', params).fetchall()
+            cursor = conn.execute(f'SELECT * FROM ({sql}) LIMIT 0', params)
+            names = {col[0] for col in cursor.description}
+        except sqlite3.Error as e:
+            return [f'SQLite rejected the query: {e}']
+        except Exception as e:
+            logger.warn('Static review could not compile query', {'error': str(e)})
+            return [f'Static review could not compile the query: {e}']
+
+        snake_names = dict(INVENTORY_FIELDS)
+        missing = [
+            field for field in self.REQUIRED_FIELDS
+            if field not in names and snake_names[field] not in names
+        ]
+        if missing:
+            return [f'Missing required columns: {", ".join(missing)}']
+        return []
@@ -0,0 +1,91 @@
+"""Shared result cache for identical SQL, validated against the data version."""
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Sequence, Tuple
+
+from config import config
+from services.db.result_set import ResultSet
+from services.metrics.registry import metrics
+
+
+def cache_key(sqlite_sql: str, params: Optional[Sequence[Any]] = None) -> Tuple[str, Tuple[Any, ...]]:
+    """Key for ``(normalized SQL, parameters)``; whitespace and a trailing ';' are ignored."""
+    # Keywords and whitespace are insignificant outside quoted text; double quotes
+    # are kept verbatim too, since SQLite reads "..." as a string when no column matches
+    parts = re.split(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""", sqlite_sql)
+    normalized = ''.join(
+        part if i % 2 else re.sub(r'\s+', ' ', part.lower())
+        for i, part in enumerate(parts)
+    )
+    return normalized.strip().rstrip(';').strip(), tuple(params or ())
+
+
+class ResultCache:
+    """LRU cache of result sets bounded by their estimated size in bytes.
+
+    Each entry remembers the data version it was computed at; a lookup is a
+    version comparison plus a dictionary hit, and an entry read at another
+    version is dropped. Results are shared across users and sessions, so
+    cached ``ResultSet`` objects must be treated as read-only.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        # key -> (data version, result set, estimated bytes)
+        self._entries: 'OrderedDict[Hashable, Tuple[str, ResultSet, int]]' = OrderedDict()
+        self._bytes = 0
+        metrics.register_gauge('resultCache.bytes', lambda: self._bytes)
+        metrics.register_gauge('resultCache.entries', lambda: len(self._entries))
+        metrics.register_gauge('resultCache.hitRatio', self.hit_ratio)
+
+    def hit_ratio(self) -> float:
+        """Hits per lookup since start."""
+        hits = metrics.counter('resultCache.hits')
+        lookups = hits + metrics.counter('resultCache.misses')
+        return hits / lookups if lookups else 0.0
+
+    def get(self, key: Hashable, version: str) -> Optional[ResultSet]:
+        """Return the cached result for ``key`` if it was computed at ``version``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                metrics.increment('resultCache.hits')
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+                metrics.increment('resultCache.stale')
+        metrics.increment('resultCache.misses')
+        return None
+
+    def put(self, key: Hashable, version: str, result_set: ResultSet) -> None:
+        """Cache ``result_set`` as computed at ``version`` (evicting LRU entries as needed)."""
+        size = result_set.estimated_bytes()
+        if size > self.max_entry_bytes:
+            metrics.increment('resultCache.tooLarge')
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, result_set, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                metrics.increment('resultCache.evictions')
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+# Global instance
+result_cache = ResultCache(config.RESULT_CACHE_MAX_BYTES, config.RESULT_CACHE_MAX_ENTRY_BYTES)
@@ -0,0 +1,94 @@
+"""Per-session result versions and row-level diffs between them."""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import config
+from services.db.result_set import ResultSet
+
+
+class ResultVersion:
+    """One executed result of a session, with the table state it was read at."""
+    __slots__ = ('token', 'result_set', 'data_version', 'watermark')
+
+    def __init__(self, token: str, result_set: ResultSet, data_version: str,
+                 watermark: Optional[str]):
+        self.token = token
+        self.result_set = result_set
+        self.data_version = data_version
+        # MAX(inventory_items.updated_at) before the query ran
+        self.watermark = watermark
+
+
+class ResultVersionStore:
+    """Recent result versions per session, looked up by token.
+
+    Each session keeps its last ``max_per_session`` versions, so clients
+    polling the same session (another tab, the columnar format) do not
+    invalidate each other's ``since`` tokens. Sessions are evicted LRU
+    beyond ``RESULT_VERSIONS_MAX_SESSIONS``.
+    """
+
+    def __init__(self, max_sessions: int, max_per_session: int = 4):
+        self.max_sessions = max_sessions
+        self.max_per_session = max_per_session
+        self._lock = threading.Lock()
+        self._versions: 'OrderedDict[str, OrderedDict[str, ResultVersion]]' = OrderedDict()
+
+    def get(self, session_id: str, token: str) -> Optional[ResultVersion]:
+        """The session's version ``token``, if it has not aged out."""
+        with self._lock:
+            versions = self._versions.get(session_id)
+            if versions is None:
+                return None
+            self._versions.move_to_end(session_id)
+            version = versions.get(token)
+            if version is not None:
+                versions.move_to_end(token)
+            return version
+
+    def put(self, session_id: str, version: ResultVersion) -> None:
+        with self._lock:
+            versions = self._versions.get(session_id)
+            if versions is None:
+                versions = self._versions[session_id] = OrderedDict()
+            versions[version.token] = version
+            versions.move_to_end(version.token)
+            while len(versions) > self.max_per_session:
+                versions.popitem(last=False)
+            self._versions.move_to_end(session_id)
+            while len(self._versions) > self.max_sessions:
+                self._versions.popitem(last=False)
+
+
+def diff_result_sets(old: ResultSet, new: ResultSet) -> Optional[Dict[str, Any]]:
+    """Row changes from ``old`` to ``new`` keyed by ``id``.
+
+    Returns ``{'inserted': [...], 'updated': [...], 'removed': [ids], 'order': [ids]}``
+    or None when rows are not uniquely identified by ``id`` (callers then
+    send the full table).
+    """
+    if 'id' not in old.columns or 'id' not in new.columns:
+        return None
+    old_ids = old.column('id')
+    new_ids = new.column('id')
+    if None in new_ids or len(set(new_ids)) != len(new_ids) or len(set(old_ids)) != len(old_ids):
+        return None
+
+    columns = new.columns
+    previous = dict(zip(old_ids, old.rows))
+    inserted: List[Dict[str, Any]] = []
+    updated: List[Dict[str, Any]] = []
+    for row_id, row in zip(new_ids, new.rows):
+        before = previous.get(row_id)
+        if before is None:
+            inserted.append(dict(zip(columns, row)))
+        elif before != row:
+            updated.append(dict(zip(columns, row)))
+    current = set(new_ids)
+    removed = [row_id for row_id in old_ids if row_id not in current]
+    return {'inserted': inserted, 'updated': updated, 'removed': removed, 'order': new_ids}
+
+
+# Global instance
+result_versions = ResultVersionStore(config.RESULT_VERSIONS_MAX_SESSIONS, config.RESULT_VERSIONS_PER_SESSION)
@@ -0,0 +1,287 @@
+"""Streaming exports of complete query results (CSV, Parquet, Arrow IPC)."""
+import csv
+import importlib.util
+import io
+import re
+import sqlite3
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+from config import config
+from services.db.connection import get_database
+from services.inventory_query_executor import inventory_query_executor
+from services.logging.logger import logger_instance as logger
+from services.metrics.registry import metrics
+
+
+# format -> (media type, file extension, needs pyarrow)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv', False),
+    'parquet': ('application/vnd.apache.parquet', 'parquet', True),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows', True),
+}
+
+# Trailing outer LIMIT (optionally a placeholder) without OFFSET
+TRAILING_LIMIT = re.compile(r'\s+LIMIT\s+(\d+|\?)\s*;?\s*$', re.IGNORECASE)
+
+
+# pyarrow is imported on first use (about 40 ms), not at startup
+_pa: Any = None
+
+
+def _pyarrow() -> Optional[Any]:
+    """The ``pyarrow`` module, imported on the first columnar export (None if not installed)."""
+    global _pa
+    if _pa is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:  # pragma: no cover - optional dependency
+            return None
+        _pa = pyarrow
+    return _pa
+
+
+def available_formats() -> List[str]:
+    """Export formats usable with the installed packages (checked without importing them)."""
+    has_arrow = importlib.util.find_spec('pyarrow') is not None
+    return [name for name, (_, _, needs_arrow) in EXPORT_FORMATS.items()
+            if not needs_arrow or has_arrow]
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after every batch."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ResultExporter:
+    """Stream a query's complete result from a SQLite cursor into a file format.
+
+    Rows are fetched ``EXPORT_BATCH_ROWS`` at a time and written straight to
+    the output as tuples, so memory stays constant regardless of row count.
+    """
+
+    def __init__(self, batch_rows: int):
+        self.batch_rows = batch_rows
+
+    def uncapped(self, sql: str, params: Sequence[Any], limit_requested: bool) -> Tuple[str, List[Any]]:
+        """Drop the outer row cap from ``sql``.
+
+        A LIMIT the question asked for ("top 5 sellers", recorded on the
+        session as ``rowLimitRequested``) is kept; otherwise a trailing LIMIT
+        is the table row cap.
+        """
+        params = list(params or [])
+        match = TRAILING_LIMIT.search(sql)
+        placeholder = match is not None and match.group(1) == '?'
+        if limit_requested or match is None or (placeholder and not params):
+            return sql, params
+        return sql[:match.start()], params[:-1] if placeholder else params
+
+    def open_cursor(self, sql: str, params: Sequence[Any]) -> sqlite3.Cursor:
+        """Validate and execute ``sql`` on a private read-only connection.
+
+        Run before the response starts, so SQL errors still produce an error
+        status rather than a truncated download.
+        """
+        inventory_query_executor.validate_read_only(sql)
+        sqlite_sql = inventory_query_executor.convert_to_sqlite(sql)
+        conn = get_database().connect_read_only()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(sqlite_sql, list(params or []))
+        except Exception:
+            self._close(conn)
+            raise
+        return cursor
+
+    def stream(self, cursor: sqlite3.Cursor, export_format: str) -> Iterator[bytes]:
+        """Yield the encoded result chunk by chunk; closes the cursor's connection."""
+        writers = {'csv': self._csv, 'parquet': self._parquet, 'arrow': self._arrow}
+        columns = [col[0] for col in cursor.description or []]
+        rows = 0
+        try:
+            for chunk, batch_rows in writers[export_format](cursor, columns):
+                rows += batch_rows
+                if chunk:
+                    yield chunk
+        finally:
+            self._close(cursor.connection)
+            metrics.increment('export.rows', rows)
+            logger.info('Query result exported', {'format': export_format, 'rowCount': rows})
+
+    def _batches(self, cursor: sqlite3.Cursor) -> Iterator[List[Tuple[Any, ...]]]:
+        while True:
+            batch = cursor.fetchmany(self.batch_rows)
+            if not batch:
+                return
+            yield batch
+
+    def _csv(self, cursor: sqlite3.Cursor, columns: List[str]) -> Iterator[Tuple[bytes, int]]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for batch in self._batches(cursor):
+            writer.writerows(batch)
+            yield buffer.getvalue().encode('utf-8'), len(batch)
+            buffer.seek(0)
+            buffer.truncate()
+        # Header only, for empty results
+        yield buffer.getvalue().encode('utf-8'), 0
+
+    def _arrow(self, cursor: sqlite3.Cursor, columns: List[str]) -> Iterator[Tuple[bytes, int]]:
+        pa = _pyarrow()
+        sink = _ChunkSink()
+        writer = None
+        for batch in self._batches(cursor):
+            if writer is None:
+                schema = self._schema(columns, batch)
+                writer = pa.ipc.new_stream(sink, schema)
+            writer.write_batch(self._record_batch(schema, batch))
+            yield sink.drain(), len(batch)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, self._schema(columns, []))
+        writer.close()
+        yield sink.drain(), 0
+
+    def _parquet(self, cursor: sqlite3.Cursor, columns: List[str]) -> Iterator[Tuple[bytes, int]]:
+        pa = _pyarrow()
+        # Every batch becomes one row group
+        sink = _ChunkSink()
+        writer = None
+        for batch in self._batches(cursor):
+            if writer is None:
+                schema = self._schema(columns, batch)
+                writer = pa.parquet.ParquetWriter(sink, schema)
+            writer.write_batch(self._record_batch(schema, batch))
+            yield sink.drain(), len(batch)
+        if writer is None:
+            writer = pa.parquet.ParquetWriter(sink, self._schema(columns, []))
+        writer.close()
+        yield sink.drain(), 0
+
+    def _schema(self, columns: List[str], batch: List[Tuple[Any, ...]]) -> 'pyarrow.Schema':
+        """Arrow schema inferred from the first batch (SQLite columns are untyped).
+
+        Later batches are coerced to it by ``_record_batch``.
+        """
+        pa = _pyarrow()
+        fields = []
+        for index, name in enumerate(columns):
+            kinds = {type(row[index]) for row in batch if row[index] is not None}
+            if kinds and kinds <= {int}:
+                arrow_type = pa.int64()
+            elif kinds and kinds <= {int, float}:
+                arrow_type = pa.float64()
+            elif kinds == {bytes}:
+                arrow_type = pa.binary()
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(name, arrow_type))
+        return pa.schema(fields)
+
+    def _record_batch(self, schema: 'pyarrow.Schema', batch: List[Tuple[Any, ...]]) -> 'pyarrow.RecordBatch':
+        """Encode ``batch`` with the stream's schema, coercing values it does not fit.
+
+        The schema is fixed by the first batch and the response has already
+        started, so a later float in an int64 column (or text in a numeric
+        one) must not raise: values that cannot be converted are written as
+        null and counted in ``export.coercedValues``.
+        """
+        pa = _pyarrow()
+        arrays = []
+        for index, field in enumerate(schema):
+            values = [row[index] for row in batch]
+            if pa.types.is_string(field.type):
+                values = [None if value is None else str(value) for value in values]
+            elif pa.types.is_integer(field.type) and any(
+                    type(value) is not int for value in values if value is not None):
+                # pa.array would silently truncate floats (2.5 -> 2)
+                arrays.append(self._coerced_array(field, values))
+                continue
+            try:
+                arrays.append(pa.array(values, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+                arrays.append(self._coerced_array(field, values))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def _coerced_array(self, field: 'pyarrow.Field', values: List[Any]) -> 'pyarrow.Array':
+        pa = _pyarrow()
+        if pa.types.is_integer(field.type):
+            convert = _to_int
+        elif pa.types.is_floating(field.type):
+            convert = float
+        else:
+            convert = _to_bytes
+        coerced = []
+        dropped = 0
+        for value in values:
+            if value is not None:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError, OverflowError):
+                    value = None
+                    dropped += 1
+            coerced.append(value)
+        try:
+            array = pa.array(coerced, type=field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            # Integers beyond int64
+            dropped += sum(value is not None for value in coerced)
+            array = pa.nulls(len(coerced), type=field.type)
+        if dropped:
+            metrics.increment('export.coercedValues', dropped)
+            logger.warn('Export values did not fit the column type', {
+                'column': field.name,
+                'type': str(field.type),
+                'nulled': dropped,
+            })
+        return array
+
+    def _close(self, conn: sqlite3.Connection) -> None:
+        if conn is not get_database().conn:
+            conn.close()
+
+
+def _to_int(value: Any) -> int:
+    """``value`` as an int when that is exact (3.0 -> 3); raises ValueError otherwise."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, int):
+        return value
+    raise ValueError(value)
+
+
+def _to_bytes(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    return str(value).encode('utf-8')
+
+
+# Global instance
+result_exporter = ResultExporter(config.EXPORT_BATCH_ROWS)
@@ -0,0 +1,277 @@
+"""Table and chart views of query results (shared by sessions and saved queries).
+
+Charts are first described as specs computed on the result columns: the
+indices of the rows they plot, in plot order, and how each data key derives
+from the table columns. ``build_charts`` materializes specs into row objects;
+the columnar format sends them as they are (see ``columnar_payload``).
+
+Every chart stays within the point budget of its type (``CHART_*_POINTS``):
+line/area series are downsampled with LTTB, bar/pie charts keep their top
+rows and fold the rest into one "Other" point.
+"""
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+from services.chart_downsampling import lttb, point_budget, top_k_with_other
+from services.db.result_set import ResultSet
+
+# Row ids of period series: 'YYYY-MM-DD' days/weeks or 'YYYY-MM' months
+_PERIOD = re.compile(r'^\d{4}-\d{2}(?:-\d{2})?$')
+
+
+def table_columns(result_set: Optional[ResultSet]) -> List[Dict[str, str]]:
+    """Column descriptors for the results table."""
+    if result_set is None or len(result_set) == 0:
+        return []
+    return [
+        {
+            'id': key,
+            'label': _label(key),
+            'type': 'string',
+        }
+        for key in result_set.columns
+    ]
+
+
+def _label(key: str) -> str:
+    return key[0].upper() + re.sub(r'([A-Z])', r' \1', key[1:])
+
+
+def _name_field(max_length: int) -> Dict[str, Any]:
+    """Display name: ``name``, else ``sku``, else 'Unknown', truncated."""
+    return {'column': 'name', 'fallback': 'sku', 'default': 'Unknown', 'maxLength': max_length}
+
+
+def chart_specs(result_set: Optional[ResultSet]) -> List[Dict[str, Any]]:
+    """Describe the result charts as row indices plus field derivations.
+
+    Each spec has the chart's ``type``, ``title``, ``xAxisKey`` and
+    ``dataKeys``, the plotted row indices in ``rows`` and, in ``fields``,
+    each data key as ``{'column', 'fallback', 'default', 'maxLength',
+    'scale', 'subtract', 'min'}`` (all but ``column`` optional). Bar and pie
+    charts over budget also carry an ``other`` point, plotted after ``rows``.
+    """
+    # Generate multiple meaningful charts based on available data
+    specs: List[Dict[str, Any]] = []
+    if result_set is None or len(result_set) == 0:
+        return specs
+
+    stock = result_set.column('currentStock')
+    threshold = result_set.column('reorderThreshold')
+    sales = result_set.column('recentSalesVolume')
+    indices = range(len(result_set))
+
+    # Period series (history trends): one row per day/week/month, plotted in row order
+    if all(isinstance(value, str) and _PERIOD.match(value) for value in result_set.column('id')):
+        specs.append({
+            'type': 'line',
+            'title': 'Sales and Stock Over Time',
+            'xAxisKey': 'name',
+            'rows': list(indices),
+            'fields': {
+                'name': {'column': 'name'},
+                'sales': {'column': 'recentSalesVolume'},
+                'stock': {'column': 'currentStock'},
+            },
+            'dataKeys': [
+                {'key': 'sales', 'name': 'Units Sold', 'color': '#10b981'},
+                {'key': 'stock', 'name': 'Closing Stock', 'color': '#6366f1'},
+            ],
+        })
+
+    # Chart 1: Stock Levels (Bar Chart)
+    if any(value is not None for value in stock):
+        specs.append({
+            'type': 'bar',
+            'title': 'Current Stock Levels',
+            'xAxisKey': 'name',
+            'rows': sorted(indices, key=stock.__getitem__, reverse=True),
+            'fields': {
+                'name': _name_field(20),
+                'stock': {'column': 'currentStock'},
+                'threshold': {'column': 'reorderThreshold'},
+            },
+            'dataKeys': [
+                {'key': 'stock', 'name': 'Current Stock', 'color': '#6366f1'},
+                {'key': 'threshold', 'name': 'Reorder Threshold', 'color': '#ef4444'},
+            ],
+        })
+
+    selling = [i for i in indices if sales[i] > 0]
+
+    # Chart 2: Sales Volume (Area Chart)
+    if any(value is not None for value in sales):
+        specs.append({
+            'type': 'area',
+            'title': 'Recent Sales Volume',
+            'xAxisKey': 'name',
+            'rows': sorted(selling, key=sales.__getitem__, reverse=True),
+            'fields': {
+                'name': _name_field(20),
+                'sales': {'column': 'recentSalesVolume'},
+            },
+            'dataKeys': [{'key': 'sales', 'name': 'Sales Volume', 'color': '#10b981'}],
+        })
+
+    # Chart 3: Stock vs Sales Comparison (Line Chart)
+    if any(s is not None and v is not None for s, v in zip(stock, sales)):
+        max_stock = max(stock, default=1)
+        max_sales = max(sales, default=1)
+        scale_factor = max_stock / max_sales if max_sales > 0 else 1
+
+        specs.append({
+            'type': 'line',
+            'title': 'Stock vs Sales Comparison',
+            'xAxisKey': 'name',
+            'rows': sorted(indices, key=stock.__getitem__, reverse=True),
+            'fields': {
+                'name': _name_field(15),
+                'stock': {'column': 'currentStock'},
+                'sales': {'column': 'recentSalesVolume', 'scale': scale_factor},
+                'salesOriginal': {'column': 'recentSalesVolume'},
+            },
+            'dataKeys': [
+                {'key': 'stock', 'name': 'Current Stock', 'color': '#6366f1'},
+                {'key': 'sales', 'name': 'Sales Volume (scaled)', 'color': '#10b981'},
+            ],
+        })
+
+    # Chart 4: Low Stock Alert
+    low_stock = [i for i in indices if threshold[i] > 0 and stock[i] <= threshold[i]]
+    if low_stock:
+        specs.append({
+            'type': 'bar',
+            'title': 'Low Stock Alert - Items Below Reorder Threshold',
+            'xAxisKey': 'name',
+            'rows': sorted(low_stock, key=stock.__getitem__),
+            'fields': {
+                'name': _name_field(20),
+                'stock': {'column': 'currentStock'},
+                'threshold': {'column': 'reorderThreshold'},
+                'deficit': {'column': 'reorderThreshold', 'subtract': 'currentStock', 'min': 0},
+            },
+            'dataKeys': [
+                {'key': 'stock', 'name': 'Current Stock', 'color': '#ef4444'},
+                {'key': 'threshold', 'name': 'Reorder Threshold', 'color': '#f59e0b'},
+                {'key': 'deficit', 'name': 'Stock Deficit', 'color': '#dc2626'},
+            ],
+        })
+
+    # Chart 5: Top Performers Pie Chart
+    if selling:
+        specs.append({
+            'type': 'pie',
+            'title': 'Top Selling Products Distribution',
+            'rows': sorted(selling, key=sales.__getitem__, reverse=True),
+            'fields': {
+                'name': _name_field(20),
+                'value': {'column': 'recentSalesVolume'},
+            },
+            'dataKeys': [{'key': 'value', 'name': 'Sales Volume', 'color': '#6366f1'}],
+        })
+
+    # Default chart if none created
+    if not specs:
+        specs.append({
+            'type': 'bar',
+            'title': 'Inventory Overview',
+            'xAxisKey': 'name',
+            'rows': list(indices),
+            'fields': {
+                'name': _name_field(20),
+                'value': {'column': 'currentStock', 'fallback': 'recentSalesVolume', 'default': 0},
+            },
+            'dataKeys': [{'key': 'value', 'name': 'Value', 'color': '#6366f1'}],
+        })
+
+    for spec in specs:
+        _apply_budget(result_set, spec)
+    return specs
+
+
+def _apply_budget(result_set: ResultSet, spec: Dict[str, Any]) -> None:
+    """Reduce ``spec['rows']`` (in plot order) to the point budget of the chart type."""
+    budget = point_budget(spec['type'])
+    rows = spec['rows']
+    if len(rows) <= budget:
+        return
+    if spec['type'] in ('line', 'area'):
+        # Downsample along the first plotted series
+        series = _field_values(result_set, spec['fields'][spec['dataKeys'][0]['key']], rows)
+        spec['rows'] = [rows[position] for position in lttb(series, budget)]
+        return
+
+    kept, rest = top_k_with_other(rows, budget)
+    spec['rows'] = kept
+    label_key = spec.get('xAxisKey', 'name')
+    spec['other'] = {
+        key: f'Other ({len(rest)} items)' if key == label_key
+        else sum(_field_values(result_set, field, rest))
+        for key, field in spec['fields'].items()
+    }
+
+
+def _field_values(result_set: ResultSet, spec: Dict[str, Any], rows: Sequence[int]) -> List[Any]:
+    """Evaluate one field spec for the given row indices."""
+    column = result_set.column(spec['column'])
+    values = [column[i] for i in rows]
+    if 'fallback' in spec:
+        fallback = result_set.column(spec['fallback'])
+        values = [value or fallback[i] for value, i in zip(values, rows)]
+    if 'default' in spec:
+        values = [value or spec['default'] for value in values]
+    if 'maxLength' in spec:
+        values = [value[:spec['maxLength']] for value in values]
+    if 'subtract' in spec:
+        subtrahend = result_set.column(spec['subtract'])
+        values = [value - subtrahend[i] for value, i in zip(values, rows)]
+    if 'min' in spec:
+        values = [max(spec['min'], value) for value in values]
+    if 'scale' in spec:
+        values = [value * spec['scale'] for value in values]
+    return values
+
+
+def build_charts(result_set: Optional[ResultSet]) -> List[Dict[str, Any]]:
+    """Generate the result charts (with row objects) from ``result_set``."""
+    charts = []
+    for spec in chart_specs(result_set):
+        keys = list(spec['fields'])
+        columns = [_field_values(result_set, spec['fields'][key], spec['rows']) for key in keys]
+        chart = {key: value for key, value in spec.items() if key not in ('rows', 'fields')}
+        chart['data'] = [dict(zip(keys, values)) for values in zip(*columns)]
+        if 'other' in chart:
+            chart['data'].append(chart.pop('other'))
+        charts.append(chart)
+    return charts
+
+
+def _column_type(values: Sequence[Any]) -> str:
+    kinds = {type(value) for value in values if value is not None}
+    if kinds and kinds <= {int}:
+        return 'integer'
+    if kinds and kinds <= {int, float}:
+        return 'number'
+    return 'string'
+
+
+def columnar_payload(result_set: Optional[ResultSet]) -> Dict[str, Any]:
+    """Compact table + charts: typed column headers once, one value array per column.
+
+    Charts carry row indices and field specs (see ``chart_specs``) instead
+    of copies of the plotted rows.
+    """
+    if result_set is None or len(result_set) == 0:
+        return {'table': {'columns': [], 'rowCount': 0, 'values': []}, 'charts': []}
+    values = [list(column) for column in zip(*result_set.rows)]
+    return {
+        'table': {
+            'columns': [
+                {'id': key, 'label': _label(key), 'type': _column_type(column)}
+                for key, column in zip(result_set.columns, values)
+            ],
+            'rowCount': len(result_set),
+            'values': values,
+        },
+        'charts': chart_specs(result_set),
+    }
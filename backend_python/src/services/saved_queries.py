@@ -0,0 +1,219 @@
+"""Saved queries: named final SQL with precomputed, periodically refreshed results."""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import config
+from models.saved_query import SavedQuery
+from services.admission import SCHEDULED, AdmissionRejected, admission_controller
+from services.db.connection import data_version, get_database
+from services.db.result_set import ResultSet
+from services.inventory_query_executor import inventory_query_executor
+from services.logging.logger import logger_instance as logger
+from services.metrics.registry import metrics
+from services.results_view import build_charts, table_columns
+
+
+class SavedQueryStore:
+    """Persist saved queries in the ``saved_queries`` table."""
+
+    COLUMNS = ('id, user_id, name, natural_language_query, final_query, query_params, '
+               'refresh_interval_seconds, created_at, updated_at')
+
+    def create(self, user_id: str, name: str, natural_language_query: str, final_query: str,
+               query_params: List[Any], refresh_interval_seconds: int) -> SavedQuery:
+        """Save ``final_query`` under ``name``; raises ValueError unless it is read-only."""
+        inventory_query_executor.validate_read_only(final_query)
+        now = datetime.now()
+        saved = SavedQuery(
+            id=str(uuid.uuid4()),
+            userId=user_id,
+            name=name,
+            naturalLanguageQuery=natural_language_query,
+            finalQuery=final_query,
+            queryParams=list(query_params or []),
+            refreshIntervalSeconds=refresh_interval_seconds,
+            createdAt=now,
+            updatedAt=now,
+        )
+        conn = get_database().connect()
+        conn.execute(
+            f'INSERT INTO saved_queries ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (saved.id, saved.userId, saved.name, saved.naturalLanguageQuery, saved.finalQuery,
+             json.dumps(saved.queryParams), saved.refreshIntervalSeconds,
+             now.isoformat(), now.isoformat()),
+        )
+        conn.commit()
+        logger.info('Saved query created', {'savedQueryId': saved.id, 'userId': user_id, 'name': name})
+        return saved
+
+    def get(self, saved_query_id: str) -> Optional[SavedQuery]:
+        """Return one saved query, or None."""
+        row = get_database().connect().execute(
+            f'SELECT {self.COLUMNS} FROM saved_queries WHERE id = ?', (saved_query_id,)
+        ).fetchone()
+        return self._from_row(row) if row else None
+
+    def list(self, user_id: Optional[str] = None) -> List[SavedQuery]:
+        """Saved queries of ``user_id`` (all users when None), oldest first."""
+        conn = get_database().connect()
+        if user_id is None:
+            rows = conn.execute(f'SELECT {self.COLUMNS} FROM saved_queries ORDER BY created_at')
+        else:
+            rows = conn.execute(
+                f'SELECT {self.COLUMNS} FROM saved_queries WHERE user_id = ? ORDER BY created_at',
+                (user_id,),
+            )
+        return [self._from_row(row) for row in rows.fetchall()]
+
+    def delete(self, saved_query_id: str) -> bool:
+        """Delete a saved query; returns False when it did not exist."""
+        conn = get_database().connect()
+        cursor = conn.execute('DELETE FROM saved_queries WHERE id = ?', (saved_query_id,))
+        conn.commit()
+        return cursor.rowcount > 0
+
+    def _from_row(self, row) -> SavedQuery:
+        return SavedQuery(
+            id=row[0],
+            userId=row[1],
+            name=row[2],
+            naturalLanguageQuery=row[3],
+            finalQuery=row[4],
+            queryParams=json.loads(row[5] or '[]'),
+            refreshIntervalSeconds=row[6],
+            createdAt=row[7],
+            updatedAt=row[8],
+        )
+
+
+class PrecomputedResult:
+    """Table and charts of a saved query as of its last refresh."""
+    __slots__ = ('result_set', 'columns', 'charts', 'rows_json', 'data_version',
+                 'refreshed_at', 'execution_time_ms')
+
+    def __init__(self, result_set: ResultSet, data_version: str, execution_time_ms: int):
+        self.result_set = result_set
+        self.columns = table_columns(result_set)
+        self.charts = build_charts(result_set)
+        # Serialized once per refresh, not per request
+        self.rows_json = result_set.to_json()
+        self.data_version = data_version
+        self.refreshed_at = time.time()
+        self.execution_time_ms = execution_time_ms
+
+
+class SavedQueryRefresher:
+    """Background scheduler keeping saved query results precomputed.
+
+    Every ``SAVED_QUERY_TICK_SECONDS`` it refreshes the saved queries whose
+    refresh interval has elapsed, or whose data changed (data version) and
+    that were last refreshed at least ``SAVED_QUERY_MIN_REFRESH_SECONDS``
+    ago. Queries due in the same tick run together on one read snapshot.
+    """
+
+    def __init__(self, store: SavedQueryStore):
+        self.store = store
+        self._results: Dict[str, PrecomputedResult] = {}
+        metrics.register_gauge('savedQueries.precomputed', lambda: len(self._results))
+
+    def get(self, saved_query_id: str) -> Optional[PrecomputedResult]:
+        """Last precomputed result, if any."""
+        return self._results.get(saved_query_id)
+
+    def forget(self, saved_query_id: str) -> None:
+        """Drop the precomputed result of a deleted query."""
+        self._results.pop(saved_query_id, None)
+
+    def is_due(self, saved: SavedQuery, version: str, now: float) -> bool:
+        """True when ``saved`` needs a refresh at data version ``version``."""
+        result = self._results.get(saved.id)
+        if result is None:
+            return True
+        age = now - result.refreshed_at
+        if age >= saved.refreshIntervalSeconds:
+            return True
+        return result.data_version != version and age >= config.SAVED_QUERY_MIN_REFRESH_SECONDS
+
+    def freshness(self, saved: SavedQuery, result: Optional[PrecomputedResult]) -> Dict[str, Any]:
+        """Freshness metadata for API responses."""
+        if result is None:
+            return {'refreshedAt': None, 'ageSeconds': None, 'stale': True, 'nextRefreshAt': None}
+        return {
+            'refreshedAt': datetime.fromtimestamp(result.refreshed_at).isoformat(),
+            'ageSeconds': round(time.time() - result.refreshed_at, 1),
+            'dataVersion': result.data_version,
+            'stale': result.data_version != data_version(),
+            'nextRefreshAt': datetime.fromtimestamp(
+                result.refreshed_at + saved.refreshIntervalSeconds
+            ).isoformat(),
+            'executionTimeMs': result.execution_time_ms,
+        }
+
+    async def refresh(self, queries: List[SavedQuery]) -> None:
+        """Re-run ``queries`` on one snapshot and replace their precomputed results."""
+        if not queries:
+            return
+        # Read the version first so a write during the refresh triggers another one
+        version = data_version()
+        outcomes = await inventory_query_executor.execute_snapshot(
+            [(saved.finalQuery, saved.queryParams) for saved in queries]
+        )
+        for saved, outcome in zip(queries, outcomes):
+            if isinstance(outcome, Exception):
+                metrics.increment('savedQueries.refreshFailures')
+                logger.error('Saved query refresh failed', {
+                    'savedQueryId': saved.id,
+                    'error': str(outcome),
+                })
+                continue
+            self._results[saved.id] = PrecomputedResult(
+                outcome.result_set, version, outcome.execution_time_ms
+            )
+            metrics.increment('savedQueries.refreshes')
+
+    async def ensure(self, saved: SavedQuery) -> Optional[PrecomputedResult]:
+        """Return the precomputed result, computing it now if there is none yet."""
+        if saved.id not in self._results:
+            await self.refresh([saved])
+        return self._results.get(saved.id)
+
+    async def tick(self) -> None:
+        """Refresh every due saved query."""
+        queries = self.store.list()
+        known = {saved.id for saved in queries}
+        for saved_query_id in [key for key in self._results if key not in known]:
+            self.forget(saved_query_id)
+
+        version = data_version()
+        now = time.time()
+        due = [saved for saved in queries if self.is_due(saved, version, now)]
+        if not due:
+            return
+        # Queued behind interactive runs; not rate limited (the schedule bounds it)
+        try:
+            async with admission_controller.admit('saved-query-refresher', 'System', SCHEDULED,
+                                                  sql_executions=0):
+                await self.refresh(due)
+        except AdmissionRejected:
+            metrics.increment('savedQueries.deferredRefreshes')
+
+    async def run(self) -> None:
+        """Scheduler loop; runs until cancelled (see the app lifespan)."""
+        logger.info('Saved query scheduler started', {
+            'tickSeconds': config.SAVED_QUERY_TICK_SECONDS,
+        })
+        while True:
+            await asyncio.sleep(config.SAVED_QUERY_TICK_SECONDS)
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error('Saved query scheduler tick failed', {'error': str(e)})
+
+
+# Global instances
+saved_query_store = SavedQueryStore()
+saved_query_refresher = SavedQueryRefresher(saved_query_store)
@@ -0,0 +1,203 @@
+"""Compact schema prompt generated from the live database."""
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import config
+from services.db.connection import get_database
+from services.logging.logger import logger_instance as logger
+
+
+class TableInfo:
+    """Introspected table: columns, primary key and low-cardinality samples."""
+    def __init__(self, name: str, columns: List[Tuple[str, str, bool]]):
+        self.name = name
+        # (column name, declared type, is primary key)
+        self.columns = columns
+        self.samples: Dict[str, List[str]] = {}
+
+    @property
+    def column_names(self) -> Set[str]:
+        return {column for column, _, _ in self.columns}
+
+
+class SchemaPromptBuilder:
+    """Build the schema part of the LLM prompts from ``sqlite_master``/``PRAGMA table_info``.
+
+    Distinct values of low-cardinality text columns in the dimension tables
+    (category names, location names, ...) are sampled and cached; the cache is rebuilt when the
+    database data version changes, at most every ``SCHEMA_REFRESH_SECONDS``.
+    ``render`` emits only the tables relevant to a question, trimmed to a
+    token budget.
+    """
+
+    # Tables exposed to the LLM, with the aliases the SQL rules use
+    TABLE_ALIASES = {
+        'inventory_items': 'i',
+        'product_categories': 'c',
+        'locations': 'l',
+        'inventory_history_daily': 'hd',
+        'inventory_history_weekly': 'hw',
+        'inventory_history_monthly': 'hm',
+    }
+
+    # Always sent; other tables only when the question (or SQL) needs them
+    CORE_TABLES = ('inventory_items',)
+
+    # Words that make a table relevant, in addition to its sampled values
+    TABLE_KEYWORDS = {
+        'product_categories': ('category', 'categories', 'type of product', 'department'),
+        'locations': ('location', 'warehouse', 'store', 'site', 'branch'),
+        'inventory_history_daily': ('last', 'past', 'days', 'daily', 'per day', 'trend', 'history', 'over time'),
+        'inventory_history_weekly': ('weeks', 'weekly', 'per week', 'trend', 'history', 'over time'),
+        'inventory_history_monthly': ('months', 'monthly', 'per month', 'year', 'trend', 'history', 'over time'),
+    }
+
+    # Meaning that cannot be introspected (SQLite tables declare no foreign keys)
+    COLUMN_NOTES = {
+        ('inventory_items', 'sku'): 'stock keeping unit',
+        ('inventory_items', 'category_id'): '-> product_categories.id',
+        ('inventory_items', 'location_id'): '-> locations.id',
+        ('inventory_items', 'current_stock'): 'units on hand',
+        ('inventory_items', 'reorder_threshold'): 'reorder when stock <= this',
+        ('inventory_items', 'recent_sales_volume'): 'units sold recently',
+        ('product_categories', 'parent_category_id'): '-> product_categories.id',
+        ('locations', 'parent_location_id'): '-> locations.id',
+        ('inventory_history_daily', 'item_id'): '-> inventory_items.id',
+        ('inventory_history_daily', 'day'): "days since 1970-01-01 UTC; today is CAST(julianday('now') - 2440587.5 AS INTEGER)",
+        ('inventory_history_daily', 'units_sold'): 'units sold that day',
+        ('inventory_history_daily', 'closing_stock'): 'units on hand at end of day',
+        ('inventory_history_weekly', 'item_id'): '-> inventory_items.id',
+        ('inventory_history_weekly', 'week'): 'day number of the Monday starting the week',
+        ('inventory_history_weekly', 'closing_stock'): 'units on hand at end of the week',
+        ('inventory_history_monthly', 'item_id'): '-> inventory_items.id',
+        ('inventory_history_monthly', 'month'): 'yyyymm, e.g. 202401',
+        ('inventory_history_monthly', 'closing_stock'): 'units on hand at end of the month',
+    }
+
+    SAMPLE_MAX_DISTINCT = 12
+
+    SQL_RULES = """Rules (SQLite):
+1. SELECT only; no modifications.
+2. Aliases: i=inventory_items, c=product_categories, l=locations. LEFT JOIN optional relations.
+3. camelCase column aliases, e.g. i.current_stock as currentStock.
+4. Always select: i.id, i.sku, i.name, i.category_id as categoryId, i.location_id as locationId, i.current_stock as currentStock, i.reorder_threshold as reorderThreshold, i.recent_sales_volume as recentSalesVolume
+5. Default LIMIT 50, maximum LIMIT 100.
+6. Filter by names via joins, e.g. WHERE c.name = 'Electronics'.
+7. Sales over a period come from history tables (finest grain covering it), e.g. (SELECT SUM(hd.units_sold) FROM inventory_history_daily hd WHERE hd.item_id = i.id AND hd.day > CAST(julianday('now', '-30 days') - 2440587.5 AS INTEGER)).
+
+Example:
+SELECT i.id, i.sku, i.name, i.category_id as categoryId, i.current_stock as currentStock
+FROM inventory_items i
+LEFT JOIN product_categories c ON i.category_id = c.id
+WHERE c.name = 'Electronics'
+ORDER BY i.recent_sales_volume DESC
+LIMIT 10;"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Optional[Dict[str, TableInfo]] = None
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+
+    def tables(self) -> Dict[str, TableInfo]:
+        """Return introspected tables, refreshing them when the data changed."""
+        with self._lock:
+            now = time.monotonic()
+            if self._tables is None or now - self._checked_at >= config.SCHEMA_REFRESH_SECONDS:
+                self._checked_at = now
+                db = get_database()
+                version = db.data_version()
+                if self._tables is None or version != self._version:
+                    self._tables = self._introspect(db.connect())
+                    self._version = db.data_version()
+            return self._tables
+
+    def columns_by_table(self) -> Dict[str, Set[str]]:
+        """``{table: {columns}}`` for the tables exposed to the LLM."""
+        return {name: info.column_names for name, info in self.tables().items()}
+
+    def _introspect(self, conn) -> Dict[str, TableInfo]:
+        existing = {
+            row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            )
+        }
+        tables: Dict[str, TableInfo] = {}
+        for name in self.TABLE_ALIASES:
+            if name not in existing:
+                continue
+            columns = [
+                (row[1], (row[2] or '').upper(), bool(row[5]))
+                for row in conn.execute(f'PRAGMA table_info({name})')
+            ]
+            info = TableInfo(name, columns)
+            if name in self.CORE_TABLES:
+                # Fact table values (SKUs, product names) are not low-cardinality
+                tables[name] = info
+                continue
+            for column, col_type, is_pk in columns:
+                if is_pk or col_type != 'TEXT' or column.endswith('_id') or column.endswith('_at'):
+                    continue
+                values = [
+                    row[0] for row in conn.execute(
+                        f'SELECT DISTINCT {column} FROM {name} WHERE {column} IS NOT NULL '
+                        f'LIMIT {self.SAMPLE_MAX_DISTINCT + 1}'
+                    )
+                ]
+                if values and len(values) <= self.SAMPLE_MAX_DISTINCT:
+                    info.samples[column] = sorted(str(v) for v in values)
+            tables[name] = info
+        logger.info('Schema prompt introspected', {
+            'tables': list(tables),
+            'sampledColumns': sum(len(t.samples) for t in tables.values()),
+        })
+        return tables
+
+    def relevant_tables(self, question: str, sql: Optional[str] = None) -> List[str]:
+        """Tables needed for ``question`` (and any table ``sql`` already references)."""
+        text = question.lower()
+        referenced = set(re.findall(r'\b(\w+)\b', sql.lower())) if sql else set()
+        relevant = []
+        for name, info in self.tables().items():
+            if name in self.CORE_TABLES or name in referenced:
+                relevant.append(name)
+                continue
+            words = list(self.TABLE_KEYWORDS.get(name, ()))
+            words.extend(v.lower() for values in info.samples.values() for v in values)
+            if any(word in text for word in words):
+                relevant.append(name)
+        return relevant
+
+    def _render_table(self, info: TableInfo, with_notes: bool, with_samples: bool) -> str:
+        parts = []
+        for column, col_type, is_pk in info.columns:
+            part = f'{column} {col_type or "ANY"}'
+            if is_pk:
+                part += ' PK'
+            note = self.COLUMN_NOTES.get((info.name, column))
+            if with_notes and note:
+                part += f' ({note})'
+            if with_samples and column in info.samples:
+                part += ' in [' + ', '.join("'" + v.replace("'", "''") + "'" for v in info.samples[column]) + ']'
+            parts.append(part)
+        return f'{info.name} {self.TABLE_ALIASES[info.name]}({", ".join(parts)})'
+
+    def render(self, question: str, sql: Optional[str] = None) -> str:
+        """Schema + rules text for the prompt, limited to relevant tables and the token budget."""
+        tables = self.tables()
+        names = self.relevant_tables(question, sql)
+        budget_chars = config.SCHEMA_PROMPT_TOKEN_BUDGET * 4  # ~4 characters per token
+
+        # Degrade gracefully: drop samples first, then column notes
+        for with_notes, with_samples in ((True, True), (True, False), (False, False)):
+            lines = [self._render_table(tables[name], with_notes, with_samples) for name in names]
+            text = 'Tables:\n' + '\n'.join(lines) + '\n\n' + self.SQL_RULES
+            if len(text) <= budget_chars:
+                break
+        return text
+
+
+# Global instance
+schema_prompt_builder = SchemaPromptBuilder()
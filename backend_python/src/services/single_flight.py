@@ -0,0 +1,43 @@
+"""Single-flight request coalescing for concurrent identical work."""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from services.metrics.registry import metrics
+
+
+class SingleFlight:
+    """Run at most one in-flight call per key; concurrent callers share its result.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same future. Nothing is cached once the call
+    completes. Exports ``singleFlight.<name>.calls``/``.executions`` counters
+    and a ``singleFlight.<name>.fanInRatio`` gauge (callers per execution).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._calls_metric = f'singleFlight.{name}.calls'
+        self._executions_metric = f'singleFlight.{name}.executions'
+        metrics.register_gauge(f'singleFlight.{name}.fanInRatio', self.fan_in_ratio)
+        metrics.register_gauge(f'singleFlight.{name}.inFlight', lambda: len(self._inflight))
+
+    def fan_in_ratio(self) -> float:
+        """Callers served per underlying execution."""
+        executions = metrics.counter(self._executions_metric)
+        return metrics.counter(self._calls_metric) / executions if executions else 0.0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return ``await fn()``, sharing the call with concurrent callers of ``key``."""
+        metrics.increment(self._calls_metric)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            # Shield so one caller's cancellation does not cancel the shared work
+            return await asyncio.shield(future)
+
+        metrics.increment(self._executions_metric)
+        future = asyncio.ensure_future(fn())
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
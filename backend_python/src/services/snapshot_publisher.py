@@ -0,0 +1,38 @@
+"""Background publishing of immutable read snapshots (see ``services.db.snapshots``)."""
+import asyncio
+
+from config import config
+from services.db.connection import get_database
+from services.logging.logger import logger_instance as logger
+
+
+class SnapshotPublisher:
+    """Publish a new snapshot every ``interval_seconds`` when the data changed.
+
+    Runs in the process that owns ingestion; read-only workers set
+    ``SNAPSHOT_PUBLISH=false`` and pick up what it publishes.
+    """
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+
+    async def publish(self) -> None:
+        """Publish once if the data changed; VACUUM INTO runs off the event loop."""
+        db = await asyncio.to_thread(get_database)
+        await asyncio.to_thread(db.publish_snapshot)
+
+    async def run(self) -> None:
+        """Publisher loop; runs until cancelled (see the app lifespan)."""
+        logger.info('Snapshot publisher started', {
+            'intervalSeconds': self.interval_seconds,
+        })
+        while True:
+            try:
+                await self.publish()
+            except Exception as e:
+                logger.error('Snapshot publish failed', {'error': str(e)})
+            await asyncio.sleep(self.interval_seconds)
+
+
+# Global instance
+snapshot_publisher = SnapshotPublisher(config.SNAPSHOT_INTERVAL_S)
@@ -0,0 +1,12 @@
+"""Shared test setup: import from ``src`` against a throwaway seeded database."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Before any app import: config is read once, at import time
+os.environ['DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='inventory-tests-'), 'inventory.db')
+os.environ['OPENAI_ENABLED'] = 'false'
+os.environ.setdefault('LOG_LEVEL', 'warning')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
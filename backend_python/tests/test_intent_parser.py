@@ -0,0 +1,77 @@
+"""Rule-based parses of count and "which <location>" questions."""
+import pytest
+
+from config import config
+from services.db.connection import get_database
+from services.intent_parser import intent_parser
+
+
+def run(parsed):
+    return [tuple(row) for row in get_database().connect().execute(parsed.sql, parsed.params)]
+
+
+@pytest.mark.parametrize('question', [
+    'how many electronics are there',
+    'how many items are low on stock',
+    'number of items out of stock',
+])
+def test_count_questions_count_items(question):
+    parsed = intent_parser.parse(question)
+    assert parsed.intent == 'count_items'
+    assert 'COUNT(*)' in parsed.sql
+    assert len(run(parsed)) == 1
+
+
+def test_count_matches_item_count():
+    parsed = intent_parser.parse('how many electronics are there')
+    expected = get_database().connect().execute(
+        "SELECT COUNT(*) FROM inventory_items WHERE category_id = 'cat-1'"
+    ).fetchone()[0]
+    assert run(parsed)[0][2] == f'{expected} matching items'
+
+
+def test_count_per_group():
+    parsed = intent_parser.parse('how many items per location')
+    assert parsed.intent == 'count_by_location'
+    counts = dict(get_database().connect().execute(
+        'SELECT location_id, COUNT(*) FROM inventory_items GROUP BY location_id'
+    ).fetchall())
+    for row in run(parsed):
+        assert row[2].endswith(f'({counts[row[0]]} items)')
+
+
+def test_how_many_of_a_quantity_is_a_total():
+    parsed = intent_parser.parse('how many units of electronics')
+    assert parsed.intent == 'aggregate_total'
+    assert 'SUM(i.current_stock)' in parsed.sql
+
+
+def test_which_store_has_the_most_stock():
+    parsed = intent_parser.parse('which store has the most stock')
+    assert parsed.intent == 'aggregate_by_location'
+    assert parsed.params == ['store']
+    assert parsed.limit_requested
+    rows = run(parsed)
+    best = get_database().connect().execute(
+        "SELECT i.location_id FROM inventory_items i JOIN locations l ON i.location_id = l.id "
+        "WHERE l.type = 'store' GROUP BY i.location_id ORDER BY SUM(i.current_stock) DESC LIMIT 1"
+    ).fetchone()[0]
+    assert [row[0] for row in rows] == [best]
+
+
+def test_which_location_groups_without_type_filter():
+    parsed = intent_parser.parse('which location has the least stock')
+    assert parsed.intent == 'aggregate_by_location'
+    assert parsed.params == []
+    assert len(run(parsed)) == 1
+
+
+def test_unexplained_how_question_falls_through_to_llm():
+    parsed = intent_parser.parse('how is electronics doing')
+    assert parsed.confidence < config.INTENT_CONFIDENCE_THRESHOLD
+
+
+def test_plain_listing_unchanged():
+    parsed = intent_parser.parse('show electronics')
+    assert parsed.intent == 'list_items'
+    assert parsed.confidence == 1.0
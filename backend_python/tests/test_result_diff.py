@@ -0,0 +1,29 @@
+from services.result_diff import ResultVersion, ResultVersionStore
+
+
+def _version(token):
+    return ResultVersion(token, None, 'v1', None)
+
+
+def test_each_token_stays_valid_until_it_ages_out():
+    store = ResultVersionStore(max_sessions=10, max_per_session=2)
+    store.put('s1', _version('rows'))
+    store.put('s1', _version('columnar'))
+
+    assert store.get('s1', 'columnar').token == 'columnar'
+    assert store.get('s1', 'rows').token == 'rows'
+
+    store.put('s1', _version('third'))
+    # 'rows' was read last, so 'columnar' is the one that ages out
+    assert store.get('s1', 'columnar') is None
+    assert store.get('s1', 'rows').token == 'rows'
+
+
+def test_unknown_token_or_session():
+    store = ResultVersionStore(max_sessions=1)
+    store.put('s1', _version('a'))
+    assert store.get('s1', 'b') is None
+
+    store.put('s2', _version('a'))
+    assert store.get('s1', 'a') is None
+    assert store.get('s2', 'a').token == 'a'
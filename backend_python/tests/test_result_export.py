@@ -0,0 +1,55 @@
+import io
+import sqlite3
+
+import pytest
+
+from services.metrics.registry import metrics
+from services.result_export import ResultExporter
+
+pa = pytest.importorskip('pyarrow')
+pytest.importorskip('pyarrow.parquet')
+
+
+def _cursor(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE t (id, qty, label)')
+    conn.executemany('INSERT INTO t VALUES (?, ?, ?)', rows)
+    return conn.execute('SELECT id, qty, label FROM t ORDER BY rowid')
+
+
+# The first batch (2 rows) fixes qty as int64; later batches drift
+ROWS = [
+    (1, 10, 'a'),
+    (2, 20, 'b'),
+    (3, 30.0, 7),
+    (4, 2.5, None),
+    (5, 'n/a', b'x'),
+]
+
+
+def _read(export_format, data):
+    if export_format == 'arrow':
+        return pa.ipc.open_stream(io.BytesIO(data)).read_all()
+    return pa.parquet.read_table(io.BytesIO(data))
+
+
+@pytest.mark.parametrize('export_format', ['arrow', 'parquet'])
+def test_later_batches_that_do_not_fit_the_schema_are_coerced(export_format):
+    exporter = ResultExporter(batch_rows=2)
+    before = metrics.counter('export.coercedValues')
+
+    data = b''.join(exporter.stream(_cursor(ROWS), export_format))
+
+    table = _read(export_format, data)
+    assert table.schema.field('qty').type == pa.int64()
+    assert table.column('id').to_pylist() == [1, 2, 3, 4, 5]
+    assert table.column('qty').to_pylist() == [10, 20, 30, None, None]
+    assert table.column('label').to_pylist() == ['a', 'b', '7', None, "b'x'"]
+    assert metrics.counter('export.coercedValues') - before == 2
+
+
+def test_empty_result_still_writes_a_schema():
+    exporter = ResultExporter(batch_rows=2)
+    table = _read('arrow', b''.join(exporter.stream(_cursor([]), 'arrow')))
+    assert table.num_rows == 0
+    assert table.column_names == ['id', 'qty', 'label']
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from config import config
+from services.db.connection import Database
+from services.db.shard_executor import shard_executor
+
+# Same answers from the parallel shard plan as from the attached view
+QUERIES = [
+    ('SELECT c.name AS category, SUM(i.current_stock) AS total FROM inventory_items i '
+     'LEFT JOIN product_categories c ON i.category_id = c.id GROUP BY c.name ORDER BY total DESC', []),
+    ('SELECT c.name, SUM(i.current_stock) AS total FROM inventory_items i '
+     'LEFT JOIN product_categories c ON i.category_id = c.id GROUP BY 1 ORDER BY 2 DESC', []),
+    ('SELECT c.name AS category, SUM(i.current_stock) AS total FROM inventory_items i '
+     'LEFT JOIN product_categories c ON i.category_id = c.id GROUP BY category ORDER BY total DESC', []),
+    ('SELECT AVG(i.current_stock) AS average, i.location_id, COUNT(*) AS items FROM inventory_items i '
+     'GROUP BY 2 ORDER BY 2', []),
+    ('SELECT i.current_stock > ? AS high, COUNT(*) AS items FROM inventory_items i GROUP BY 1 ORDER BY 1', [20]),
+    ('SELECT ROUND(AVG(i.current_stock), 2) AS average FROM inventory_items i', []),
+]
+
+
+@pytest.fixture(params=['location', 'hash'])
+def partitioned_db(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'PARTITION_MODE', request.param)
+    monkeypatch.setattr(config, 'PARTITION_DIR', '')
+    db = Database(str(tmp_path / 'inventory.db'))
+    conn = db.connect()
+    for n in range(60):
+        item_id = f'extra-{n}'
+        location_id = f'loc-{n % 3 + 1}'
+        conn.execute(
+            f'INSERT INTO {db.partitions.table_for(item_id, location_id)} '
+            '(id, sku, name, category_id, location_id, current_stock) VALUES (?, ?, ?, ?, ?, ?)',
+            (item_id, f'X-{n}', f'Extra {n}', f'cat-{n % 3 + 1}', location_id, n * 7 % 45))
+    conn.commit()
+    yield db
+    db.close()
+
+
+@pytest.mark.parametrize('sql, params', QUERIES)
+def test_shard_plan_matches_attached_view(partitioned_db, sql, params):
+    layout = partitioned_db.partitions.layout
+    plan = shard_executor.plan(layout, sql, params)
+    assert plan is not None and len(plan.shards) > 1
+
+    result = asyncio.run(shard_executor.run(layout, partitioned_db.db_path, plan))
+    expected = partitioned_db.query_result_set(sql, params)
+
+    assert result.rows == expected.rows
+    assert result.columns == expected.columns
+
+
+def test_group_by_aggregate_alias_is_not_planned(partitioned_db):
+    layout = partitioned_db.partitions.layout
+    sql = 'SELECT SUM(i.current_stock) AS total, i.location_id FROM inventory_items i GROUP BY total'
+    assert shard_executor.plan(layout, sql, []) is None
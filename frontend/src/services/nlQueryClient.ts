@@ -15,6 +15,9 @@ export interface NLQueryResponse {
 export interface QueryResult {
   sessionId: string;
   status: string;
+  mode?: 'full';
+  // Pass back as `since` to fetch only the changes (see refreshResults)
+  version?: string | null;
   reviewSummary: Record<string, unknown>;
   table: {
     columns: Array<{ id: string; label: string; type: string }>;
@@ -28,9 +31,126 @@ export interface QueryResult {
   message: string;
 }
 
+export interface QueryResultDiff {
+  sessionId: string;
+  status: string;
+  mode: 'diff';
+  baseVersion: string;
+  version: string;
+  incremental: boolean;
+  rowCount: number;
+  changes: {
+    inserted: Array<Record<string, unknown>>;
+    updated: Array<Record<string, unknown>>;
+    removed: unknown[];
+    // Row ids in result order after the changes
+    order: unknown[];
+  };
+  charts: QueryResult['charts'];
+  message: string;
+}
+
+// How a chart data key derives from the table columns of a columnar result
+export interface ColumnarFieldSpec {
+  column: string;
+  fallback?: string;
+  default?: unknown;
+  maxLength?: number;
+  subtract?: string;
+  min?: number;
+  scale?: number;
+}
+
+export interface ColumnarChart {
+  type: string;
+  title: string;
+  xAxisKey?: string;
+  dataKeys?: Array<{ key: string; name: string; color: string }>;
+  // Indices into the table columns, in plot order
+  rows: number[];
+  fields: Record<string, ColumnarFieldSpec>;
+  // Aggregate of the rows left out of a bar/pie chart's point budget
+  other?: Record<string, unknown>;
+}
+
+export interface ColumnarQueryResult {
+  sessionId: string;
+  status: string;
+  mode: 'full';
+  format: 'columnar';
+  version?: string | null;
+  reviewSummary: Record<string, unknown>;
+  table: {
+    columns: Array<{ id: string; label: string; type: string }>;
+    rowCount: number;
+    // One array per column, in `columns` order
+    values: unknown[][];
+  };
+  charts: ColumnarChart[];
+  message: string;
+}
+
+export interface NLQueryBatchItem {
+  query: string;
+  sessionId?: string;
+  status: string;
+  message: string;
+  results?: QueryResult;
+}
+
+export interface NLQueryBatchResponse {
+  items: NLQueryBatchItem[];
+  uniqueQueries: number;
+}
+
+export interface SessionSummary {
+  sessionId: string;
+  createdAt: string;
+  status: string;
+  naturalLanguageQuery: string;
+}
+
+export interface SessionList {
+  sessions: SessionSummary[];
+}
+
+export interface Freshness {
+  refreshedAt: string | null;
+  ageSeconds: number | null;
+  stale: boolean;
+  nextRefreshAt: string | null;
+  dataVersion?: string;
+  executionTimeMs?: number;
+}
+
+export interface SavedQuery {
+  id: string;
+  name: string;
+  naturalLanguageQuery: string;
+  finalQuery: string;
+  refreshIntervalSeconds: number;
+  createdAt: string;
+  updatedAt: string;
+  freshness?: Freshness;
+}
+
+export interface SavedQueryResult {
+  savedQuery: SavedQuery;
+  freshness: Freshness;
+  table: QueryResult['table'];
+  charts: QueryResult['charts'];
+}
+
+interface CachedResponse {
+  etag: string;
+  data: unknown;
+}
+
 export class NLQueryClient {
   private baseUrl: string;
   private authToken: string;
+  // Last ETag and body per URL, replayed on 304 Not Modified
+  private validators = new Map<string, CachedResponse>();
 
   constructor(authToken: string = 'mock-token') {
     this.baseUrl = config.apiUrl;
@@ -51,18 +171,107 @@ export class NLQueryClient {
     return response.data;
   }
 
-  async getResults(sessionId: string): Promise<QueryResult> {
-    const response = await axios.get<QueryResult>(
-      `${this.baseUrl}/api/nl-queries/${sessionId}`,
+  // Submit several questions at once (e.g. dashboard tiles); results come from one snapshot
+  async submitBatch(queries: string[], includeResults: boolean = true): Promise<NLQueryBatchResponse> {
+    const response = await axios.post<NLQueryBatchResponse>(
+      `${this.baseUrl}/api/nl-queries/batch`,
+      { queries, includeResults },
+      {
+        headers: {
+          Authorization: `Bearer ${this.authToken}`,
+          'Content-Type': 'application/json',
+        },
+      }
+    );
+    return response.data;
+  }
+
+  async saveQuery(sessionId: string, name: string, refreshIntervalSeconds?: number): Promise<SavedQuery> {
+    const response = await axios.post<SavedQuery>(
+      `${this.baseUrl}/api/saved-queries`,
+      { sessionId, name, refreshIntervalSeconds },
       {
         headers: {
           Authorization: `Bearer ${this.authToken}`,
+          'Content-Type': 'application/json',
         },
       }
     );
     return response.data;
   }
 
+  async listSavedQueries(): Promise<{ savedQueries: SavedQuery[] }> {
+    return this.getWithValidators<{ savedQueries: SavedQuery[] }>(`${this.baseUrl}/api/saved-queries`);
+  }
+
+  // Precomputed by the server's scheduler; see `freshness` for its age
+  async getSavedQuery(savedQueryId: string): Promise<SavedQueryResult> {
+    return this.getWithValidators<SavedQueryResult>(`${this.baseUrl}/api/saved-queries/${savedQueryId}`);
+  }
+
+  async getResults(sessionId: string): Promise<QueryResult> {
+    return this.getWithValidators<QueryResult>(`${this.baseUrl}/api/nl-queries/${sessionId}`);
+  }
+
+  // Compact payload: column headers once, per-column arrays, charts as row indices
+  async getColumnarResults(sessionId: string): Promise<ColumnarQueryResult> {
+    return this.getWithValidators<ColumnarQueryResult>(
+      `${this.baseUrl}/api/nl-queries/${sessionId}?format=columnar`
+    );
+  }
+
+  // Fetch the changes since `current.version` and patch `current.table.rows` in place
+  async refreshResults(current: QueryResult): Promise<QueryResult> {
+    if (!current.version) {
+      return this.getResults(current.sessionId);
+    }
+    const response = await axios.get<QueryResult | QueryResultDiff>(
+      `${this.baseUrl}/api/nl-queries/${current.sessionId}`,
+      {
+        params: { since: current.version },
+        // Background refresh: queued behind interactive requests when the server is busy
+        headers: { Authorization: `Bearer ${this.authToken}`, 'X-Request-Priority': 'scheduled' },
+      }
+    );
+    const body = response.data;
+    if (body.mode !== 'diff') {
+      return body;
+    }
+    applyResultDiff(current, body);
+    return current;
+  }
+
+  async listSessions(): Promise<SessionList> {
+    return this.getWithValidators<SessionList>(`${this.baseUrl}/api/nl-queries`);
+  }
+
+  private async getWithValidators<T>(url: string): Promise<T> {
+    const cached = this.validators.get(url);
+    const headers: Record<string, string> = {
+      Authorization: `Bearer ${this.authToken}`,
+    };
+    if (cached) {
+      headers['If-None-Match'] = cached.etag;
+    }
+
+    const response = await axios.get<T>(url, {
+      headers,
+      validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+    });
+
+    if (response.status === 304 && cached) {
+      return cached.data as T;
+    }
+
+    const etag = response.headers['etag'];
+    if (typeof etag === 'string') {
+      this.validators.set(url, { etag, data: response.data });
+    } else {
+      this.validators.delete(url);
+    }
+    return response.data;
+  }
+
   async pollResults(
     sessionId: string,
     maxAttempts: number = 10,
@@ -79,5 +288,79 @@ export class NLQueryClient {
   }
 }
 
+export function columnarRows(table: ColumnarQueryResult['table']): Array<Record<string, unknown>> {
+  const rows: Array<Record<string, unknown>> = [];
+  for (let i = 0; i < table.rowCount; i++) {
+    const row: Record<string, unknown> = {};
+    table.columns.forEach((column, c) => {
+      row[column.id] = table.values[c][i];
+    });
+    rows.push(row);
+  }
+  return rows;
+}
+
+export function columnarChartData(
+  table: ColumnarQueryResult['table'],
+  chart: ColumnarChart
+): Array<Record<string, unknown>> {
+  const index = new Map(table.columns.map((column, c) => [column.id, c]));
+  const values = (column: string) => table.values[index.get(column) ?? -1] ?? [];
+  const derive = (spec: ColumnarFieldSpec, i: number): unknown => {
+    let value = values(spec.column)[i];
+    if (spec.fallback !== undefined) value = value || values(spec.fallback)[i];
+    if (spec.default !== undefined) value = value || spec.default;
+    if (spec.maxLength !== undefined) value = String(value).slice(0, spec.maxLength);
+    if (spec.subtract !== undefined) value = Number(value) - Number(values(spec.subtract)[i]);
+    if (spec.min !== undefined) value = Math.max(spec.min, Number(value));
+    if (spec.scale !== undefined) value = Number(value) * spec.scale;
+    return value;
+  };
+  const data = chart.rows.map((i) => {
+    const point: Record<string, unknown> = {};
+    for (const [key, spec] of Object.entries(chart.fields)) {
+      point[key] = derive(spec, i);
+    }
+    return point;
+  });
+  if (chart.other) {
+    data.push(chart.other);
+  }
+  return data;
+}
+
+export function applyResultDiff(result: QueryResult, diff: QueryResultDiff): void {
+  const byId = new Map<unknown, Record<string, unknown>>();
+  for (const row of result.table.rows) {
+    byId.set(row.id, row);
+  }
+  for (const id of diff.changes.removed) {
+    byId.delete(id);
+  }
+  for (const row of diff.changes.updated) {
+    const existing = byId.get(row.id);
+    if (existing) {
+      Object.assign(existing, row);
+    } else {
+      byId.set(row.id, row);
+    }
+  }
+  for (const row of diff.changes.inserted) {
+    byId.set(row.id, row);
+  }
+
+  const rows = result.table.rows;
+  rows.length = 0;
+  for (const id of diff.changes.order) {
+    const row = byId.get(id);
+    if (row) {
+      rows.push(row);
+    }
+  }
+  result.charts = diff.charts;
+  result.status = diff.status;
+  result.version = diff.version;
+}
+
 export const nlQueryClient = new NLQueryClient();
 